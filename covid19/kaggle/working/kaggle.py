@@ -48,7 +48,8 @@ dataset used:
 covid-19 open research dataset (cord-19) initially released by the white house and its coalition of leading research groups that comprised of 13,202 scientific papers broken down into 4 subsets by source type -
 biorxiv_medrxiv, comm_use_subset, noncomm_use_subset and pmc_custom_license.
 
-$ python3 /mnt/g/Users/pie/Downloads/nih/covid19/kaggle.py
+$ python3 /mnt/g/Users/pie/Downloads/nih/covid19/kaggle.py papers answers --papers /mnt/g/Users/pie/Downloads/nih/covid19/CORD-19-research-challenge
+$ python3 /mnt/g/Users/pie/Downloads/nih/covid19/kaggle.py --help
 $ python3 -m trace --trace --ignore-dir=$(python -c 'import sys ; print(":".join(sys.path)[1:])') /mnt/g/Users/pie/Downloads/nih/covid19/kaggle.py
 '''
 
@@ -61,23 +62,54 @@ $ python3 -m trace --trace --ignore-dir=$(python -c 'import sys ; print(":".join
 # idf measures how important a word is to a doc in a collection of docs.
 # tf–idf increases with the # of times a word appears in a doc.
 # tf-idf decreases with the # of docs in the collection that contain the word.
-from sklearn.feature_extraction.text import CountVectorizer # convert collection of txt docs to matrix of token counts
-from sklearn.metrics.pairwise import euclidean_distances # compute distance matrix between each pair of vectors
+# numpy + scipy.sparse (~0.5 s) are imported with this module, since every scoring stage, incl. query, needs them, see fct_run_benchmarks() cold_start_query.
+# heavier packages - sklearn (~2 s), psutil - are only imported by the stages that need them, see fct_main().
+# from sklearn.feature_extraction.text import CountVectorizer # convert collection of txt docs to matrix of token counts
+# from sklearn.feature_extraction.text import HashingVectorizer # token counts in a fixed-width hashed space, without a vocabulary, see fct_create_paper_context_from_paragraphs()
+# from sklearn.metrics.pairwise import euclidean_distances # compute distance matrix between each pair of vectors
+# from sklearn.random_projection import SparseRandomProjection # project n-gram counts to a few dense dims, see fct_build_ann()
+# from sklearn.cluster import MiniBatchKMeans # coarse cells of the projections, see fct_build_ann()
 from datetime import datetime # timestamps
 
 import numpy as np # linear algebra
-import pandas as pd # data processing, csv file i/o (e.g. pd.read_csv)
+from scipy import sparse # sparse matrices, e.g. csr_matrix
+# import pandas as pd # data processing, csv file i/o (e.g. pd.read_csv)
 import os # misc os interfaces
 import json # json encoder + decoder
+import hashlib # secure hashes, e.g. sha1
+import zlib # crc32
+import gzip # compressed answer log, see fct_open_answer_log()
+import random # pseudo-random numbers, e.g. synthetic papers
+import shutil # high-level file operations
+import tempfile # temporary dirs
+import subprocess # e.g. the cold start of the cli, see fct_run_benchmarks()
+import contextlib # e.g. redirect_stdout
+import platform # machine info
 # import jsonstreams # writes json as stream
 import sys # for constants, functions and methods of py interpreter
+import time # perf_counter
+import tracemalloc # trace memory blocks allocated by python
 import re # regex
+import urllib.parse # url parsing
+import io # in-memory streams
+import functools # higher-order functions, e.g. lru_cache
+import numbers # numeric abstract base classes, e.g. numbers.Integral
+from collections import Counter, OrderedDict # dict subclasses for counting hashable obj + in lru order
+from array import array # compact arrays of numbers, e.g. array('i')
 import pprint # pretty print
 # import jsbeautifier # beautify, unpack or deobfuscate js
 # import threading # i/o operations
 import concurrent.futures # asynchronously execute callables with threads or processes
 import multiprocessing # cpu-heavy operations
-import psutil # process and system monitoring
+import asyncio # event loop, e.g. fct_serve()
+import signal # e.g. SIGTERM
+# import psutil # process and system monitoring, see fct_get_process()
+import argparse # command-line interface, see fct_main()
+import warnings # e.g. deprecated calls
+try:
+    import resource # peak rss on linux
+except ImportError: # windows, see psutil peak_wset
+    resource = None
 # import logging # event logging for apps and libs
 
 ### collect tasks' QUESTIONS ###
@@ -280,48 +312,231 @@ questions_9_specific = [
 ###
 questions_specific = [questions_0_specific, questions_1_specific, questions_2_specific, questions_3_specific, questions_4_specific, questions_5_specific, questions_6_specific, questions_7_specific, questions_8_specific, questions_9_specific]
 
+### working dir + subsets ###
+# answer files follow the same storage structure as the input data, under the working dir.
+path_of_working = os.path.dirname(os.path.abspath(__file__)) # e.g. /mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working, see fct_main() --working
+subsets_of_papers = ('biorxiv_medrxiv', 'comm_use_subset', 'noncomm_use_subset', 'pmc_custom_license')
+
+### function 0: fct_start_telemetry() ###
+# record each stage of the pipeline - discovery, extraction, vectorization, distance, selection, write, merge - as JSON lines, see fct_measure_stage().
+# every process appends to the same file, incl. pool workers, which inherit the telemetry settings.
+# input_live=True also prints a summary of the process' stages to stderr, every input_interval s.
+# v. print('*** fct_... ' + str(datetime.now()) + ' ***') in hot functions.
+def fct_start_telemetry(input_path_of_telemetry=path_of_working + '/telemetry.jsonl', input_live=False, input_interval=5.0):
+    if input_path_of_telemetry is not None:
+        os.makedirs(os.path.dirname(os.path.abspath(input_path_of_telemetry)), exist_ok=True) # e.g. a new --working, before any stage creates it
+    telemetry.update({"path": input_path_of_telemetry, "live": input_live, "interval": input_interval, "stages": {}, "printed": time.perf_counter(), "file": None, "pid": None})
+telemetry = {"path": None, "live": False, "interval": 5.0, "stages": {}, "printed": 0.0, "file": None, "pid": None}
+# fct_start_telemetry(input_path_of_telemetry='/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/telemetry.jsonl', input_live=True) # test
+
+### function 0.1: fct_measure_stage() ###
+# measure 1 run of a stage, e.g. 1 paper, as 1 JSON line -
+# { "stage": "vectorization", "paper": "...", "pid": 1234, "wall": 0.012, "cpu": 0.011, "papers": 1, "paragraphs": 42, "papers_per_s": 83.3, "paragraphs_per_s": 3500.0, "vocabulary": 5321, "rss": 123456789, "peak_rss": 234567890, "time": "..." }
+# the stage sets its counts on the record it is given, e.g. record['paragraphs'] = len(paper).
+# without fct_start_telemetry(), nothing is measured.
+@contextlib.contextmanager
+def fct_measure_stage(input_stage, input_paper=None):
+    if telemetry['path'] is None and not telemetry['live']:
+        yield {}
+        return
+    record = {"stage": input_stage, "paper": input_paper, "pid": os.getpid(), "papers": 0, "paragraphs": 0}
+    wall, cpu = time.perf_counter(), time.process_time()
+    yield record
+    record['wall'] = time.perf_counter() - wall
+    record['cpu'] = time.process_time() - cpu
+    record['papers_per_s'] = record['papers'] / record['wall'] if record['wall'] else None
+    record['paragraphs_per_s'] = record['paragraphs'] / record['wall'] if record['wall'] else None
+    process = fct_get_process(record['pid'])
+    record['rss'] = process.memory_info().rss
+    record['peak_rss'] = max(record['rss'], fct_get_peak_rss(process))
+    record['time'] = str(datetime.now())
+    if telemetry['pid'] != record['pid']: # 1st stage of this process, e.g. a pool worker: own file handle + own summary
+        telemetry['file'] = open(telemetry['path'], 'a') if telemetry['path'] is not None else None
+        telemetry['pid'] = record['pid']
+        telemetry['stages'] = {}
+    ### json lines ###
+    if telemetry['file'] is not None:
+        telemetry['file'].write(json.dumps(record) + '\n')
+        telemetry['file'].flush()
+    ### live summary ###
+    stage = telemetry['stages'].setdefault(input_stage, {"calls": 0, "wall": 0.0, "cpu": 0.0, "papers": 0, "paragraphs": 0})
+    stage['calls'] += 1
+    for key in ('wall', 'cpu', 'papers', 'paragraphs'):
+        stage[key] += record[key]
+    if telemetry['live'] and time.perf_counter() - telemetry['printed'] >= telemetry['interval']:
+        telemetry['printed'] = time.perf_counter()
+        summary = ', '.join(f"{name} {stage['wall']:.1f} s ({stage['papers'] / stage['wall'] if stage['wall'] else 0:.1f} papers/s, {stage['paragraphs'] / stage['wall'] if stage['wall'] else 0:.0f} paragraphs/s)" for name, stage in telemetry['stages'].items())
+        print(f"*** telemetry {record['pid']}: {summary}, peak rss {record['peak_rss'] / 2 ** 20:.0f} mb ***", file=sys.stderr, flush=True)
+
+### function 0.2: fct_get_process() ###
+# the psutil process of this process, once per pid. v. other processes, e.g. workers, whose pid can be reused, see fct_run_in_budget().
+@functools.lru_cache(maxsize=None)
+def fct_get_process(input_pid):
+    import psutil # process and system monitoring
+    return psutil.Process(input_pid)
+
+### function 0.3: fct_get_peak_rss() ###
+# the peak rss (bytes) of a process: peak_wset on windows, ru_maxrss (kb) on linux, or the current rss.
+def fct_get_peak_rss(input_process):
+    memory_info = input_process.memory_info()
+    if hasattr(memory_info, 'peak_wset'):
+        return memory_info.peak_wset
+    if resource is not None and input_process.pid == os.getpid():
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return memory_info.rss
+
+### function 0.4: fct_summarize_telemetry() ###
+# summarize a telemetry file by stage, and find the slowest papers (sum of their stages' wall time), e.g. to size machines.
+# this returns { "stages": { "stage": { "calls", "wall", "cpu", "papers", "paragraphs", "papers_per_s", "paragraphs_per_s", "max_vocabulary" } }, "peak_rss": { pid: bytes }, "slowest_papers": [[paper, wall], ...] }
+def fct_summarize_telemetry(input_path_of_telemetry=path_of_working + '/telemetry.jsonl', input_top=10):
+    stages, peak_rss, wall_of_paper = {}, {}, Counter()
+    with open(input_path_of_telemetry) as open_file:
+        for line in open_file:
+            record = json.loads(line)
+            stage = stages.setdefault(record['stage'], {"calls": 0, "wall": 0.0, "cpu": 0.0, "papers": 0, "paragraphs": 0, "max_vocabulary": None})
+            stage['calls'] += 1
+            for key in ('wall', 'cpu', 'papers', 'paragraphs'):
+                stage[key] += record[key]
+            if record.get('vocabulary') is not None:
+                stage['max_vocabulary'] = max(stage['max_vocabulary'] or 0, record['vocabulary'])
+            peak_rss[record['pid']] = max(peak_rss.get(record['pid'], 0), record['peak_rss'])
+            if record['paper'] is not None:
+                wall_of_paper[record['paper']] += record['wall']
+    for stage in stages.values():
+        stage['papers_per_s'] = stage['papers'] / stage['wall'] if stage['wall'] else None
+        stage['paragraphs_per_s'] = stage['paragraphs'] / stage['wall'] if stage['wall'] else None
+    summary = {"stages": stages, "peak_rss": peak_rss, "slowest_papers": wall_of_paper.most_common(input_top)}
+    # pprint.PrettyPrinter().pprint(summary) # test
+    return summary
+# pprint.PrettyPrinter().pprint(fct_summarize_telemetry('/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/telemetry.jsonl')) # test
+
 ### function 1: fct_create_dict_of_papers() ###
 # walk given path for papers. if conditions are met, then write paper paths to a main papers file.
+# the tree is scanned once for all subsets, with os.scandir() on a pool of threads (1 dir per call, so network storage is read in parallel).
+# v. 1 os.walk() of the whole tree per subset.
 # this creates - papers.biorxiv_medrxiv.json, papers.comm_use_subset.json, papers.noncomm_use_subset.json, papers.pmc_custom_license.json.
 # see https://github.com/gisblog/nih-covid19/tree/master/covid19/kaggle/working.
-# e.g. papers.biorxiv_medrxiv.json -
-# { "paper": [ "/kaggle/input/CORD-19-research-challenge/biorxiv_medrxiv/biorxiv_medrxiv/pdf_json/4602afcb8d95ebd9da583124384fd74299d20f5b.json",... ] }
-def fct_create_dict_of_papers(input_dir, input_path_of_papers, input_type_of_papers='json'): # see glob
-    dict_of_papers = {}
-    dict_of_papers['paper'] = []
-    dict_file = '/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/papers.' + input_dir + '.json' # todo: f-string
-    os.makedirs(os.path.dirname(dict_file), exist_ok=True)
-    with open(dict_file, 'w') as open_file:
-        for dirname, _, filenames in os.walk(input_path_of_papers):
-            for filename in filenames:
-                dir_file = os.path.join(dirname, filename)
-                if (filename).endswith(input_type_of_papers) and re.search('^(?=.*[0-9])(?=.*[a-z])([a-z0-9]+)$', filename.split('.')[0]) and ('/' + input_dir) in dirname: # comm/noncomm # regex: 860ffcab2771f1935ac5a59e986d416a603b3de3
-                    dict_of_papers['paper'].extend([dir_file])
-                break # test for kaggle
-        json.dump(dict_of_papers, open_file, indent=2, separators=(',', ': '))
+# e.g. papers.biorxiv_medrxiv.json - with the size (bytes) and mtime (s) of each paper, e.g. to balance work by size -
+# { "paper": [ "/kaggle/input/CORD-19-research-challenge/biorxiv_medrxiv/biorxiv_medrxiv/pdf_json/4602afcb8d95ebd9da583124384fd74299d20f5b.json",... ], "size": [ 123456,... ], "mtime": [ 1584057600.0,... ] }
+# the old call of 1 subset, fct_create_dict_of_papers(input_dir, input_path_of_papers, input_type_of_papers), or with input_dir=..., still works, but is deprecated:
+#   use fct_create_dict_of_papers(input_path_of_papers, input_type_of_papers, input_dirs=[input_dir]), or all subsets in 1 scan.
+def fct_create_dict_of_papers(input_path_of_papers, input_type_of_papers='json', input_dirs=subsets_of_papers, input_workers=32, input_path_of_working=path_of_working, input_dir=None): # see glob
+    if input_path_of_papers in subsets_of_papers and os.path.isdir(input_type_of_papers): # old order: input_dir, input_path_of_papers, input_type_of_papers
+        input_dir, input_path_of_papers, input_type_of_papers = input_path_of_papers, input_type_of_papers, input_dirs if isinstance(input_dirs, str) else 'json'
+    if input_dir is not None:
+        warnings.warn('fct_create_dict_of_papers(input_dir, input_path_of_papers, ...) is deprecated, use fct_create_dict_of_papers(input_path_of_papers, ..., input_dirs=[input_dir])', DeprecationWarning, stacklevel=2)
+        input_dirs = [input_dir]
+    dict_of_papers = {input_dir: {"paper": [], "size": [], "mtime": []} for input_dir in input_dirs}
+    with fct_measure_stage('discovery') as record:
+        for dir_file, size, mtime in fct_scan_tree_of_papers(input_path_of_papers, input_type_of_papers, input_workers):
+            input_dir = fct_get_subset_of_paper(dir_file, input_path_of_papers, input_dirs)
+            if input_dir is not None:
+                dict_of_papers[input_dir]['paper'].append(dir_file)
+                dict_of_papers[input_dir]['size'].append(size)
+                dict_of_papers[input_dir]['mtime'].append(mtime)
+        record['papers'] = sum(len(dict_of_papers[input_dir]['paper']) for input_dir in input_dirs)
+    os.makedirs(input_path_of_working, exist_ok=True)
+    for input_dir in input_dirs:
+        with open(f'{input_path_of_working}/papers.{input_dir}.json', 'w') as open_file:
+            json.dump(dict_of_papers[input_dir], open_file, indent=2, separators=(',', ': '))
     print('*** fct_create_dict_of_papers ' + str(datetime.now()) + ' ***')
     # return dict_of_papers # test
 # fct_create_dict_of_papers(input_path_of_papers='/mnt/g/Users/pie/Downloads/nih/covid19/CORD-19-research-challenge', input_type_of_papers='json') # test: req parameters before default parameters
 
-### multiprocessing by dir - biorxiv_medrxiv, comm_use_subset, noncomm_use_subset, pmc_custom_license: v. multithreading ###
-# print('parent process id: ', os.getppid())
-# print('child process id: ', os.getpid())
-process_0_create_dict_of_papers = multiprocessing.Process(target=fct_create_dict_of_papers, args=('biorxiv_medrxiv', '/mnt/g/Users/pie/Downloads/nih/covid19/CORD-19-research-challenge', 'json')) # args=(,) so it is a tuple if there is only 1 args
-# process_1_create_dict_of_papers = multiprocessing.Process(target=fct_create_dict_of_papers, args=('comm_use_subset', '/mnt/g/Users/pie/Downloads/nih/covid19/CORD-19-research-challenge', 'json'))
-# process_2_create_dict_of_papers = multiprocessing.Process(target=fct_create_dict_of_papers, args=('noncomm_use_subset', '/mnt/g/Users/pie/Downloads/nih/covid19/CORD-19-research-challenge', 'json'))
-# process_3_create_dict_of_papers = multiprocessing.Process(target=fct_create_dict_of_papers, args=('pmc_custom_license', '/mnt/g/Users/pie/Downloads/nih/covid19/CORD-19-research-challenge', 'json'))
-
-### execute processes in parallel ###
-process_0_create_dict_of_papers.start()
-# process_1_create_dict_of_papers.start()
-# process_2_create_dict_of_papers.start()
-# process_3_create_dict_of_papers.start()
-
-### join processes back to the parent process (this) ###
-process_0_create_dict_of_papers.join()
-# process_1_create_dict_of_papers.join()
-# process_2_create_dict_of_papers.join()
-# process_3_create_dict_of_papers.join()
+### function 1.1: fct_scan_tree_of_papers() ###
+# scan given path for papers, with os.scandir() on a pool of threads, 1 dir per call.
+# this returns the papers (path, size, mtime), sorted by path.
+def fct_scan_tree_of_papers(input_path_of_papers, input_type_of_papers='json', input_workers=32):
+    papers = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=input_workers) as executor:
+        pending = {executor.submit(fct_scan_dir_of_papers, input_path_of_papers, input_type_of_papers)}
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                papers_of_dir, dirs = future.result()
+                papers.extend(papers_of_dir)
+                pending.update(executor.submit(fct_scan_dir_of_papers, dirname, input_type_of_papers) for dirname in dirs)
+    return sorted(papers)
+
+### function 1.2: fct_get_subset_of_paper() ###
+# the 1st dir of the path under given path that is a subset, e.g. comm_use_subset but not noncomm_use_subset.
+# this returns the subset, or None.
+def fct_get_subset_of_paper(input_path_to_paper, input_path_of_papers, input_dirs=subsets_of_papers):
+    return next((dirname for dirname in os.path.relpath(input_path_to_paper, input_path_of_papers).split(os.sep)[:-1] if dirname in input_dirs), None)
+
+### function 1.3: fct_scan_dir_of_papers() ###
+# 1 dir of fct_scan_tree_of_papers(), without recursion.
+# the size and mtime come from the scandir entry, i.e. no extra stat call on windows, and 1 per paper elsewhere.
+# this returns the papers (path, size, mtime) and the sub-dirs.
+def fct_scan_dir_of_papers(input_path, input_type_of_papers='json'):
+    papers, dirs = [], []
+    with os.scandir(input_path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                dirs.append(entry.path)
+            elif entry.name.endswith(input_type_of_papers) and name_of_paper.fullmatch(entry.name.split('.')[0]): # regex: 860ffcab2771f1935ac5a59e986d416a603b3de3
+                stat = entry.stat()
+                papers.append((entry.path, stat.st_size, stat.st_mtime))
+    return papers, dirs
+name_of_paper = re.compile('[a-z0-9]*(?:[0-9][a-z]|[a-z][0-9])[a-z0-9]*') # v. '^(?=.*[0-9])(?=.*[a-z])([a-z0-9]+)$': lowercase + digits, with at least 1 of each
+
+### function 2.0: fct_get_paragraphs_from_paper() ###
+# collect the relevant elements from a paper, in the order they are evaluated, see fct_extract_paragraphs().
+# this returns the paper id and its elements.
+def fct_get_paragraphs_from_paper(input_path_to_paper):
+    paper_json = fct_extract_paper(input_path_to_paper)
+    paper = [text for paper_id, section, text in fct_extract_paragraphs(paper_json)]
+    return paper_json['paper_id'], paper
+
+### function 2.0.1: fct_extract_paper() ###
+# parse only the relevant elements of a paper.
+# v. json.load(), which builds the bibliography etc. of every paper only to drop them.
+#    {
+#        "paper_id": "...", *
+#        "metadata": {...},
+#        "abstract": [...], *
+#        "body_text": [...], *
+#        "bib_entries": {...},
+#        "ref_entries": {...},
+#        "back_matter": [...]
+#    }
+# the top-level values are decoded 1 by 1, and decoding stops once paper_id, abstract and body_text are found, i.e. before bib_entries in CORD-19 papers.
+# this returns { "paper_id": "...", "abstract": [...], "body_text": [...] }, with [] for a missing abstract or body_text.
+def fct_extract_paper(input_path_to_paper):
+    with fct_measure_stage('extraction', input_path_to_paper) as record:
+        with open(input_path_to_paper) as open_file:
+            paper_file = open_file.read()
+        paper_json = {}
+        index = json_whitespace.match(paper_file, paper_file.index('{') + 1).end()
+        while paper_file[index] != '}' and len(paper_json) < len(sections_of_paper) + 1:
+            key, index = json_decoder.raw_decode(paper_file, index)
+            index = json_whitespace.match(paper_file, json_whitespace.match(paper_file, index).end() + 1).end() # :
+            value, index = json_decoder.raw_decode(paper_file, index)
+            if key == 'paper_id' or key in sections_of_paper:
+                paper_json[key] = value
+            index = json_whitespace.match(paper_file, index).end()
+            if paper_file[index] == ',':
+                index = json_whitespace.match(paper_file, index + 1).end()
+        for section in sections_of_paper:
+            paper_json.setdefault(section, [])
+        record['paper'] = paper_json.get('paper_id', input_path_to_paper)
+        record['papers'] = 1
+        record['paragraphs'] = sum(len(paper_json[section]) for section in sections_of_paper)
+    return paper_json
+json_decoder = json.JSONDecoder()
+json_whitespace = re.compile(r'[ \t\n\r]*')
+sections_of_paper = ('abstract', 'body_text')
+# fct_extract_paper('/mnt/g/Users/pie/Downloads/nih/covid19/CORD-19-research-challenge/2020-03-13/biorxiv_medrxiv/biorxiv_medrxiv/0015023cc06b5362d332b3baf348d11567ca2fbb.json') # test
+
+### function 2.0.2: fct_extract_paragraphs() ###
+# the elements of a paper as a stream of records, each paragraph exactly once: abstract, then body_text.
+# v. the body_text loop nested in the abstract loop, which appended the body once per abstract paragraph, and not at all without an abstract.
+# this yields (paper_id, section, text).
+def fct_extract_paragraphs(input_paper):
+    paper_json = input_paper if isinstance(input_paper, dict) else fct_extract_paper(input_paper) # path to paper
+    for section in sections_of_paper:
+        for paragraph in paper_json[section]:
+            yield paper_json['paper_id'], section, paragraph['text']
 
 ### function 2: fct_get_matches_from_papers ###
 # given a list of papers in the main file, write the top unique answers to a task's QUESTIONS by evaluating the papers.
@@ -329,45 +544,12 @@ process_0_create_dict_of_papers.join()
 #. collect each QUESTION and relevant elements from the paper.
 #. convert the collection of words to vectors.
 #. calculate euclidean distances from the QUESTIONS to the paper elements, and sort by similarity/distance.
-# this returns matches.
-def fct_get_matches_from_papers(input_path_to_paper, input_question, input_min_df=0.1, input_max_df=0.9): # see DataFrame
+# this returns matches, sorted by distance. if input_top is given, only the top matches.
+def fct_get_matches_from_papers(input_path_to_paper, input_question, input_min_df=0.1, input_max_df=0.9, input_top=None): # see DataFrame
     pp = pprint.PrettyPrinter()
-    paper = []
-    '''
-    each paper/item has the following structure:
-    {
-        "paper_id": "...", *
-        "metadata": {...}, *
-        "abstract": [...], *
-        "body_text": [...], *
-        "bib_entries": {...},
-        "ref_entries": {...},
-        "back_matter": [...]
-    }
-    '''
-    with open(input_path_to_paper) as paper_item: # todo: KeyError
-        # v. json.loads() doesn't take the file path, but the file contents as a string
-        paper_item_json_load = json.load(paper_item)
-        ### question: append [1, 2, 3, [4, 5]] v. extend [1, 2, 3, 4, 5] ###
-        paper.extend([input_question])
-        ### id ###
-        paper_id = paper_item_json_load['paper_id']
-        ### title, authors ###
-        metadata = paper_item_json_load['metadata']
-        ### abstract, citation/reference spans ###
-        abstract = paper_item_json_load['abstract']
-        for index, item in enumerate(abstract):
-            paper.extend([abstract[index]['text']])
-            ### text, citation/reference spans ###
-            body_text = paper_item_json_load['body_text']
-            for index, item in enumerate(body_text):
-                paper.extend([body_text[index]['text']])
-                ### bibliography ###
-                # bib_entries = paper_item_json_load['bib_entries']
-                ### findings ###
-                # ref_entries = paper_item_json_load['ref_entries']
-                ### funding, conflict of interest ###
-                # back_matter = paper_item_json_load['back_matter']
+    ### question: append [1, 2, 3, [4, 5]] v. extend [1, 2, 3, 4, 5] ###
+    paper = [input_question]
+    paper.extend(fct_get_paragraphs_from_paper(input_path_to_paper)[1])
     # pp.pprint(paper) # test: ['WHAT HAVE WE LEARNED ABOUT INFECTION PREVENTION AND CONTROL?',...]
     '''
     ### scikit-learn ml lib ###
@@ -403,39 +585,549 @@ def fct_get_matches_from_papers(input_path_to_paper, input_question, input_min_d
     # stop_words: if 'None', max_df used. if 'english', built-in stop word list used. if analyzer='word', [list] used.
     # - stop_words_ attribute can get large and increase the model size when pickling ie converting obj (list, dict) to character stream.
     '''
-    paper_match = []
+    from sklearn.feature_extraction.text import CountVectorizer # convert collection of txt docs to matrix of token counts
     try:
         ### min_df, max_df and ngram_range ###
         vectorizer = CountVectorizer(vocabulary=None, min_df=input_min_df, max_df=input_max_df, analyzer='word', ngram_range=(2, 3), stop_words=None)
-        ### learn vocabulary dict and return term-document matrix ###    
-        features = vectorizer.fit_transform(paper).todense() # todense() returns matrix v. toarray() returns ndarray
+        ### learn vocabulary dict and return term-document matrix ###
+        features = vectorizer.fit_transform(paper) # stays sparse (csr) v. todense() returns matrix
         # print(vectorizer.vocabulary_) # test: {'dock8 deficient': 2,...}
-        ### for feature in features ###
-        for index, item in enumerate(features):
-            # print(euclidean_distances(features[0], features[i]), paper[i]) # test: [[0.]] WHAT HAVE WE LEARNED ABOUT INFECTION PREVENTION AND CONTROL?
-            paper_match.append([euclidean_distances(features[0], features[index])[0][0], paper[index]])
-        # print(paper_match) # test: [[0.0, 'WHAT HAVE WE LEARNED ABOUT INFECTION PREVENTION AND CONTROL?'],...]
     except ValueError: # eg papers may req diff min_df or max_df
         ### min_df, max_df and ngram_range ###
         vectorizer = CountVectorizer(vocabulary=None, min_df=0.0, max_df=1.0, analyzer='word', ngram_range=(2, 3), stop_words=None)
-        ### learn vocabulary dict and return term-document matrix ###    
-        features = vectorizer.fit_transform(paper).todense()
-        ### for feature in features ###
-        for index, item in enumerate(features):
-            paper_match.append([euclidean_distances(features[0], features[index])[0][0], paper[index]])
-    print('*** fct_get_matches_from_papers ' + str(datetime.now()) + ' ***')
-    return sorted(paper_match, key=lambda k: k[0]) # returned vars don't get garbaged + remain accessible after the fct()
+        ### learn vocabulary dict and return term-document matrix ###
+        features = vectorizer.fit_transform(paper)
+    ### all distances from the question (row 0) at once, then the top matches ###
+    paper_match = fct_get_top_matches(fct_get_distances_from_features(features), paper, input_top)
+    # print(paper_match) # test: [[0.0, 'WHAT HAVE WE LEARNED ABOUT INFECTION PREVENTION AND CONTROL?'],...]
+    return paper_match # returned vars don't get garbaged + remain accessible after the fct()
 # print(fct_get_matches_from_papers(input_path_to_paper='/mnt/g/Users/pie/Downloads/nih/covid19/CORD-19-research-challenge/2020-03-13/biorxiv_medrxiv/biorxiv_medrxiv/28b107243576723248ad4053261000311a22f134.json', input_question='WHAT IS KNOWN ABOUT TRANSMISSION, INCUBATION, AND ENVIRONMENTAL STABILITY?', input_min_df=0.1, input_max_df=0.9)) # test
 
+### function 2.1: fct_create_paper_context() ###
+# parse a paper and build its paragraph n-gram matrix once, so that every QUESTION of a task can be scored against it.
+# fct_get_matches_from_papers() refits CountVectorizer on [QUESTION] + paper for every QUESTION (and every rank).
+# here, the paper's n-grams are counted once without min_df/max_df, and each QUESTION only adds its own n-grams -
+# min_df/max_df are then applied per QUESTION as a column filter on the same document-frequencies CountVectorizer would see.
+# this returns a paper context, incl. a memo of matches by QUESTION.
+def fct_create_paper_context(input_path_to_paper, input_min_df=0.1, input_max_df=0.9, input_features='count'):
+    paper_id, paper = fct_get_paragraphs_from_paper(input_path_to_paper)
+    return fct_create_paper_context_from_paragraphs(paper_id, paper, input_min_df, input_max_df, input_features)
+# print(fct_create_paper_context(input_path_to_paper='/mnt/g/Users/pie/Downloads/nih/covid19/CORD-19-research-challenge/2020-03-13/biorxiv_medrxiv/biorxiv_medrxiv/28b107243576723248ad4053261000311a22f134.json', input_min_df=0.1, input_max_df=0.9)['features'].shape) # test
+
+### function 2.1.1: fct_create_paper_context_from_paragraphs() ###
+# same as fct_create_paper_context(), but from paragraphs already extracted, e.g. from a paragraph store.
+# input_features selects the feature space -
+#   'count': the paper's own vocabulary, the same n-grams + counts as CountVectorizer in fct_get_matches_from_papers(), see fct_get_ngrams_of_text().
+#   'hashing': HashingVectorizer, i.e. a fixed-width hashed (2,3)-gram space shared by every paper and worker, without a fit.
+#       QUESTION vectors are hashed once per process, see fct_get_hashed_question(), and paragraphs can be transformed as a stream.
+#       n-grams whose hashes collide share a column, so distances (and min_df/max_df) are approximate, see fct_compare_features().
+#       not faster than 'count': HashingVectorizer's analyzer is slower than fct_get_ngrams_of_text(), and the paper's hashed columns are
+#       still mapped to its own columns (np.unique), so that df and the filters stay paper-sized v. 2^20 wide. measured on 150 CORD-19 papers,
+#       vectorize + score: 0.87x-0.97x the speed of 'count'. what it buys is a feature space without a vocabulary, shared by every paper + worker.
+# input_ngrams: the n-gram counts of each paragraph, e.g. counted once for paragraphs shared by many papers, see fct_get_ngrams_of_paragraph().
+#   'count' only. the paper's columns are in order of first n-gram, v. sorted by CountVectorizer, which changes no distance.
+def fct_create_paper_context_from_paragraphs(input_paper_id, input_paper, input_min_df=0.1, input_max_df=0.9, input_features='count', input_ngrams=None):
+    with fct_measure_stage('vectorization', input_paper_id) as record:
+        columns = None
+        if input_features == 'hashing':
+            hashing_vectorizer = fct_get_hashing_vectorizer()
+            hashed = hashing_vectorizer.transform(input_paper).tocsr() if input_paper else sparse.csr_matrix((0, hashing_vectorizer.n_features))
+            hashed.sum_duplicates()
+            ### the paper's hashed columns -> its own columns, as for an index, see fct_create_paper_context_from_index() ###
+            columns, paper_columns = np.unique(hashed.indices, return_inverse=True)
+            features = sparse.csr_matrix((hashed.data.astype(np.int64), paper_columns.reshape(-1), hashed.indptr), shape=(len(input_paper), columns.shape[0]))
+            vocabulary = None
+        elif input_features == 'count':
+            if input_ngrams is None: # same n-grams as CountVectorizer, without importing sklearn
+                input_ngrams = [Counter(fct_get_ngrams_of_text(paragraph)) for paragraph in input_paper]
+            vocabulary = {}
+            data, indices, indptr = array('q'), array('i'), array('q', [0])
+            for ngrams in input_ngrams:
+                for ngram, count in ngrams.items():
+                    indices.append(vocabulary.setdefault(ngram, len(vocabulary)))
+                    data.append(count)
+                indptr.append(len(indices))
+            features = sparse.csr_matrix((np.frombuffer(data, dtype=np.int64), np.frombuffer(indices, dtype=np.int32), np.frombuffer(indptr, dtype=np.int64)), shape=(len(input_paper), len(vocabulary)))
+        else:
+            raise ValueError(f'input_features must be count or hashing, not {input_features}')
+        record['papers'] = 1
+        record['paragraphs'] = len(input_paper)
+        record['vocabulary'] = features.shape[1]
+    paper_context = {
+        "paper_id": input_paper_id,
+        "paper": input_paper,
+        "vocabulary": vocabulary, # None for hashing
+        "features": features,
+        "df": np.bincount(features.indices, minlength=features.shape[1]), # document-frequency by n-gram
+        "min_df": input_min_df,
+        "max_df": input_max_df,
+        "matches": {} # memo: QUESTION -> matches
+    }
+    if columns is not None:
+        paper_context['columns'] = columns # paper column -> hashed column
+    return paper_context
+
+### function 2.1.2: fct_get_hashing_vectorizer() ###
+# the HashingVectorizer of 'hashing', once per process, on first use.
+@functools.lru_cache(maxsize=None)
+def fct_get_hashing_vectorizer():
+    from sklearn.feature_extraction.text import HashingVectorizer # token counts in a fixed-width hashed space, without a vocabulary
+    return HashingVectorizer(analyzer='word', ngram_range=(2, 3), stop_words=None, n_features=2 ** 20, alternate_sign=False, norm=None, dtype=np.float64) # counts, as float64 is exact up to 2^53
+
+### function 2.1.3: fct_get_ngrams_of_text() ###
+# the (2,3)-grams of a text, the same as CountVectorizer(analyzer='word', ngram_range=(2, 3), stop_words=None).build_analyzer() -
+# lowercase, tokens of 2+ word characters, then all 2-grams, then all 3-grams. v. importing sklearn for its analyzer.
+def fct_get_ngrams_of_text(input_text):
+    tokens = token_pattern.findall(input_text.lower())
+    return [' '.join(tokens[index:index + n]) for n in (2, 3) for index in range(len(tokens) - n + 1)]
+token_pattern = re.compile(r'(?u)\b\w\w+\b') # CountVectorizer's default token_pattern
+
+### function 2.2: fct_limit_features() ###
+# keep the n-grams whose document-frequency is within min_df and max_df, as CountVectorizer does.
+# if float, min_df/max_df represent a proportion of docs. if integer, absolute counts.
+def fct_limit_features(input_df, input_n_doc, input_min_df, input_max_df):
+    max_doc_count = input_max_df if isinstance(input_max_df, numbers.Integral) else input_max_df * input_n_doc
+    min_doc_count = input_min_df if isinstance(input_min_df, numbers.Integral) else input_min_df * input_n_doc
+    if (max_doc_count < min_doc_count):
+        raise ValueError('max_df corresponds to < documents than min_df')
+    return (input_df <= max_doc_count) & (input_df >= min_doc_count)
+
+### function 2.3: fct_get_ngrams_of_question() ###
+# a QUESTION's n-grams only depend on the QUESTION, so they are counted once per process and reused for every paper.
+@functools.lru_cache(maxsize=None)
+def fct_get_ngrams_of_question(input_question):
+    return Counter(fct_get_ngrams_of_text(input_question))
+
+### function 2.3.0: fct_get_hashed_question() ###
+# a QUESTION's hashed n-grams, once per process, see fct_create_paper_context_from_paragraphs().
+# this returns the hashed columns (sorted) and their counts.
+@functools.lru_cache(maxsize=None)
+def fct_get_hashed_question(input_question):
+    hashed = fct_get_hashing_vectorizer().transform([input_question]).tocsr()
+    hashed.sum_duplicates()
+    return hashed.indices.astype(np.int64), hashed.data.astype(np.int64)
+
+### function 2.3.1: fct_get_columns_of_question() ###
+# a QUESTION's n-grams in the paper's vocabulary (columns) v. only in the QUESTION.
+# for a paper context from an index, see fct_create_paper_context_from_index(), corpus columns are mapped to the paper's columns.
+# for a hashing paper context, the QUESTION's hashed columns are mapped to the paper's columns.
+# this returns the columns and counts of the n-grams in the paper's vocabulary, and the counts of the n-grams only in the QUESTION.
+def fct_get_columns_of_question(input_context, input_question):
+    if input_context['vocabulary'] is None: # hashing
+        hashed_columns, hashed_counts = fct_get_hashed_question(input_question)
+        positions = np.minimum(np.searchsorted(input_context['columns'], hashed_columns), max(input_context['columns'].shape[0] - 1, 0))
+        found = (input_context['columns'][positions] == hashed_columns) if input_context['columns'].shape[0] else np.zeros(hashed_columns.shape[0], dtype=bool)
+        return positions[found], hashed_counts[found], hashed_counts[~found]
+    columns, counts, question_only = [], [], []
+    for ngram, count in fct_get_ngrams_of_question(input_question).items():
+        column = input_context['vocabulary'].get(ngram)
+        if (column is not None) and ('columns' in input_context):
+            position = np.searchsorted(input_context['columns'], column)
+            column = position if (position < input_context['columns'].shape[0]) and (input_context['columns'][position] == column) else None
+        if column is None:
+            question_only.append(count)
+        else:
+            columns.append(column)
+            counts.append(count)
+    return np.array(columns, dtype=np.int64), np.array(counts, dtype=np.int64), np.array(question_only, dtype=np.int64)
+
+### function 2.4: fct_get_distances_from_context() ###
+# score a stack of QUESTIONS against a paper context with 1 sparse product.
+# each QUESTION keeps its own min_df/max_df column filter. the n-grams kept for a QUESTION are -
+#   the paper's n-grams within min_df/max_df (base), except for the QUESTION's own n-grams, whose df also counts the QUESTION.
+# so, with X = paper counts, w = QUESTION counts on its kept n-grams and c = (kept for the QUESTION - base) on its n-grams:
+#   distance^2 = |X on base|^2 + X^2 @ c - 2 X @ w + |w|^2
+# c and w are stacked for all QUESTIONS, so every paragraph is ranked for every QUESTION at once, with the same distances as fct_get_matches_from_papers().
+# for a block of a paper, see fct_create_paper_context_in_blocks(), df and n_paragraphs are the whole paper's.
+# the QUESTIONS that fell back to min_df=0.0, max_df=1.0 are recorded in the context's 'fallbacks', if any, see fct_sweep_parameters().
+# this returns a (1 + # paragraphs) x (# QUESTIONS) array of distances, where row 0 is each QUESTION against itself.
+def fct_get_distances_from_context(input_context, input_questions):
+    distances, fallbacks = fct_get_distances_of_limits(input_context, input_questions, [(input_context['min_df'], input_context['max_df'])])
+    if 'fallbacks' in input_context:
+        input_context['fallbacks'].update(zip(input_questions, fallbacks[0].tolist()))
+    return distances[0]
+
+### function 2.4.1: fct_get_distances_of_limits() ###
+# same as fct_get_distances_from_context(), for each (min_df, max_df) of input_limits, still with 1 sparse product -
+#   only w, c and the base depend on the limits, so they are stacked for all limits x QUESTIONS.
+# the QUESTIONS' n-grams are looked up once, and their column filters are vectorized over all QUESTIONS, v. 1 QUESTION at a time.
+# a QUESTION falls back to min_df=0.0, max_df=1.0 if no n-grams remain, or if max_df corresponds to < documents than min_df.
+# if even then the paper + a QUESTION have no n-grams, its paragraphs are at an infinite distance, i.e. not matches, see fct_get_top_matches(),
+#   and only if every QUESTION has an empty vocabulary, ValueError.
+# this returns, for each limits, a (1 + # paragraphs) x (# QUESTIONS) array of distances and a mask of the QUESTIONS that fell back.
+def fct_get_distances_of_limits(input_context, input_questions, input_limits):
+    features = input_context['features']
+    df = input_context['df']
+    n_doc = input_context.get('n_paragraphs', features.shape[0]) + 1 # paragraphs + QUESTION
+    n_questions = len(input_questions)
+    present = df > 0
+    ### all QUESTIONS' n-grams: columns + counts in the paper, counts only in the QUESTION, and the QUESTION # of each ###
+    columns_of_questions = [fct_get_columns_of_question(input_context, question) for question in input_questions]
+    columns, counts, question_only = [np.concatenate([np.zeros(0, dtype=np.int64)] + [item[part] for item in columns_of_questions]) for part in range(3)]
+    owners = np.repeat(np.arange(n_questions), [item[0].shape[0] for item in columns_of_questions])
+    question_only_owners = np.repeat(np.arange(n_questions), [item[2].shape[0] for item in columns_of_questions])
+    def fct_sum_by_question(input_owners, input_values): # integers, so exact
+        return np.bincount(input_owners, weights=input_values.astype(np.float64), minlength=n_questions).astype(np.int64)
+    weights_rows, weights_columns, weights_data = [], [], []
+    corrections_rows, corrections_columns, corrections_data = [], [], []
+    bases, fallbacks, empties, question_norms = [], [], [], []
+    for index, (min_df, max_df) in enumerate(input_limits):
+        try:
+            ### min_df, max_df ###
+            base = fct_limit_features(df, n_doc, min_df, max_df) & present
+            keep = fct_limit_features(df[columns] + 1, n_doc, min_df, max_df)
+            keep_question_only = fct_limit_features(np.ones_like(question_only), n_doc, min_df, max_df)
+            ### After pruning, no terms remain. Try a lower min_df or a higher max_df. ###
+            fallback = (base.sum() - fct_sum_by_question(owners, base[columns]) + fct_sum_by_question(owners, keep) + fct_sum_by_question(question_only_owners, keep_question_only)) == 0
+        except ValueError: # eg papers may req diff min_df or max_df
+            base = np.zeros(df.shape[0], dtype=bool)
+            keep = np.ones(columns.shape[0], dtype=bool)
+            keep_question_only = np.ones(question_only.shape[0], dtype=bool)
+            fallback = np.ones(n_questions, dtype=bool)
+        ### min_df=0.0, max_df=1.0 keeps every n-gram, but a paper without n-grams + a QUESTION without n-grams: an empty vocabulary ###
+        empty = np.zeros(n_questions, dtype=bool)
+        if fallback.any() and not present.any():
+            empty = fallback & ((fct_sum_by_question(owners, np.ones_like(columns)) + fct_sum_by_question(question_only_owners, np.ones_like(question_only))) == 0)
+            if empty.all(): # v. only the QUESTIONS without n-grams, see below
+                raise ValueError('empty vocabulary; perhaps the documents only contain stop words')
+        corrected = ~fallback[owners]
+        keep = keep | fallback[owners]
+        keep_question_only = keep_question_only | fallback[question_only_owners]
+        corrections_rows.append(columns[corrected])
+        corrections_columns.append(owners[corrected] + index * n_questions)
+        corrections_data.append(keep[corrected].astype(np.int64) - base[columns[corrected]])
+        weights_rows.append(columns[keep])
+        weights_columns.append(owners[keep] + index * n_questions)
+        weights_data.append(counts[keep])
+        question_norms.append(fct_sum_by_question(owners[keep], counts[keep] ** 2) + fct_sum_by_question(question_only_owners[keep_question_only], question_only[keep_question_only] ** 2))
+        bases.append(base)
+        fallbacks.append(fallback)
+        empties.append(empty)
+    ### stack limits x QUESTIONS ###
+    shape = (features.shape[1], len(input_limits) * n_questions)
+    weights = sparse.csr_matrix((np.concatenate(weights_data), (np.concatenate(weights_rows), np.concatenate(weights_columns))), shape=shape)
+    corrections = sparse.csr_matrix((np.concatenate(corrections_data), (np.concatenate(corrections_rows), np.concatenate(corrections_columns))), shape=shape)
+    squares = features.multiply(features).tocsr()
+    ### 1 sparse product: -2 X @ w + X^2 @ c ###
+    products = (sparse.hstack([features, squares]).tocsr() @ sparse.vstack([-2 * weights, corrections]).tocsr()).toarray()
+    ### |X on base|^2 of each limits or, for fallback QUESTIONS, |X|^2 (last) ###
+    norms = np.asarray(squares @ np.column_stack(bases + [np.ones(shape[0], dtype=bool)]).astype(np.int64))
+    distances = []
+    for index, fallback in enumerate(fallbacks):
+        squared = products[:, index * n_questions:(index + 1) * n_questions] + norms[:, np.where(fallback, len(input_limits), index)] + question_norms[index]
+        ### counts are integers, so distance^2 is exact and the same as euclidean_distances() ###
+        distances.append(np.vstack([np.zeros((1, n_questions)), np.sqrt(np.maximum(squared, 0).astype(np.float64))]))
+        ### a QUESTION with an empty vocabulary has no match, as its own CountVectorizer fit would fail, v. the whole stack ###
+        distances[-1][1:, empties[index]] = np.inf
+    return distances, fallbacks
+
+### function 2.5: fct_add_matches_to_context() ###
+# add the matches of every QUESTION not yet in a paper context's memo, from 1 call to fct_get_distances_from_context().
+# if input_top is given, only the top matches are kept.
+def fct_add_matches_to_context(input_context, input_questions, input_top=None):
+    input_questions = [question for question in dict.fromkeys(input_questions) if question not in input_context['matches']]
+    if input_questions:
+        with fct_measure_stage('distance', input_context['paper_id']) as record:
+            distances = fct_get_distances_from_context(input_context, input_questions)
+            record['papers'] = 1
+            record['paragraphs'] = len(input_context['paper'])
+            record['questions'] = len(input_questions)
+        with fct_measure_stage('selection', input_context['paper_id']) as record:
+            for index, question in enumerate(input_questions):
+                input_context['matches'][question] = fct_get_top_matches(distances[:, index], [question] + input_context['paper'], input_top)
+            record['papers'] = 1
+            record['paragraphs'] = len(input_context['paper'])
+            record['questions'] = len(input_questions)
+    return input_context
+
+### function 2.6: fct_get_matches_from_context() ###
+# same as fct_get_matches_from_papers(), but from a paper context. repeated lookups, e.g. by rank, return the memo.
+def fct_get_matches_from_context(input_context, input_question):
+    if (input_question not in input_context['matches']):
+        fct_add_matches_to_context(input_context, [input_question])
+    return input_context['matches'][input_question]
+
+### function 2.7: fct_get_distances_from_features() ###
+# euclidean distances from row 0 (QUESTION) to every row of a sparse term-document matrix, in 1 vectorized operation.
+# v. todense() + euclidean_distances() per row - the matrix stays in csr, and with precomputed row norms:
+#   distance^2 = |x|^2 - 2 x @ q + |q|^2
+# counts are integers, so distance^2 is exact and the distances are the same as euclidean_distances().
+def fct_get_distances_from_features(input_features):
+    features = sparse.csr_matrix(input_features, dtype=np.int64)
+    norms = np.asarray(features.multiply(features).sum(axis=1)).ravel()
+    products = (features @ features[0].T).toarray().ravel()
+    return np.sqrt(np.maximum(norms - 2 * products + norms[0], 0).astype(np.float64))
+
+### function 2.8: fct_get_top_matches() ###
+# the first input_top matches of sorted(paper_match, key=lambda k: k[0]), without a full sort.
+# np.partition() finds the distance of the last top match in O(n). only the candidates up to that distance are sorted,
+# stable, so ties keep the paper's order, as with sorted().
+# texts at an infinite distance are not matches, see fct_get_distances_of_limits().
+# this returns [[distance, text], ...], or all matches if input_top is None.
+def fct_get_top_matches(input_distances, input_paper, input_top=None):
+    if (input_top is None) or (input_top >= input_distances.shape[0]):
+        order = np.argsort(input_distances, kind='stable')
+    elif (input_top <= 0):
+        order = []
+    else:
+        kth = np.partition(input_distances, input_top - 1)[input_top - 1]
+        candidates = np.flatnonzero(input_distances <= kth)
+        order = candidates[np.argsort(input_distances[candidates], kind='stable')][:input_top]
+    return [[input_distances[index], input_paper[index]] for index in order if input_distances[index] < np.inf]
+
+### function 2.9: fct_benchmark_matches() ###
+# compare fct_get_matches_from_papers() with the dense matrix + euclidean_distances() per row it replaced.
+# both run on the same paper and QUESTION, and must return the same matches.
+# this returns the best time of input_repeat runs and the peak memory (tracemalloc) of each.
+def fct_benchmark_matches(input_path_to_paper, input_question, input_min_df=0.1, input_max_df=0.9, input_top=4, input_repeat=3):
+    from sklearn.feature_extraction.text import CountVectorizer # convert collection of txt docs to matrix of token counts
+    from sklearn.metrics.pairwise import euclidean_distances # compute distance matrix between each pair of vectors
+    def fct_get_matches_dense():
+        paper = [input_question] + fct_get_paragraphs_from_paper(input_path_to_paper)[1]
+        try:
+            features = np.asarray(CountVectorizer(min_df=input_min_df, max_df=input_max_df, analyzer='word', ngram_range=(2, 3)).fit_transform(paper).todense())
+        except ValueError:
+            features = np.asarray(CountVectorizer(min_df=0.0, max_df=1.0, analyzer='word', ngram_range=(2, 3)).fit_transform(paper).todense())
+        paper_match = [[euclidean_distances(features[0:1], features[index:index + 1])[0][0], paper[index]] for index in range(features.shape[0])]
+        return sorted(paper_match, key=lambda k: k[0])[:input_top]
+    def fct_get_matches_sparse():
+        return fct_get_matches_from_papers(input_path_to_paper, input_question, input_min_df, input_max_df, input_top)
+    benchmark = {"paper": input_path_to_paper, "question": input_question}
+    matches = {}
+    for name, fct in [("dense", fct_get_matches_dense), ("sparse", fct_get_matches_sparse)]:
+        seconds = []
+        for repeat in range(input_repeat):
+            start = time.perf_counter()
+            matches[name] = fct()
+            seconds.append(time.perf_counter() - start)
+        tracemalloc.start()
+        fct()
+        benchmark[name] = {"seconds": min(seconds), "peak_bytes": tracemalloc.get_traced_memory()[1]}
+        tracemalloc.stop()
+    benchmark["same_matches"] = (matches["dense"] == matches["sparse"])
+    benchmark["speedup"] = benchmark["dense"]["seconds"] / benchmark["sparse"]["seconds"]
+    print('*** fct_benchmark_matches ' + str(datetime.now()) + ' ***')
+    return benchmark
+# print(fct_benchmark_matches(input_path_to_paper='/mnt/g/Users/pie/Downloads/nih/covid19/CORD-19-research-challenge/2020-03-13/biorxiv_medrxiv/biorxiv_medrxiv/28b107243576723248ad4053261000311a22f134.json', input_question='WHAT IS KNOWN ABOUT TRANSMISSION, INCUBATION, AND ENVIRONMENTAL STABILITY?')) # test
+
+### function 2.10: fct_compare_features() ###
+# compare the hashing feature space with count, see fct_create_paper_context_from_paragraphs(), on the same papers + all QUESTIONS of the tasks.
+# quality: the share of QUESTIONS with the same top matches, and the mean overlap of the top matches' paragraphs.
+# speed: the time to vectorize + score the papers (after extraction, which is the same for both). speedup = count / hashing, i.e. < 1 if hashing is slower, as measured so far.
+# this returns { "papers", "questions", "same_matches", "overlap", "count": s, "hashing": s, "speedup" }.
+def fct_compare_features(input_paths_to_papers, input_tasks=range(len(questions)), input_min_df=0.1, input_max_df=0.9, input_top=4):
+    questions_of_tasks = list(dict.fromkeys(question for task in input_tasks for question in fct_get_questions_of_task(task)))
+    for question in questions_of_tasks: # once per process in both modes
+        fct_get_ngrams_of_question(question)
+        fct_get_hashed_question(question)
+    seconds = {"count": 0.0, "hashing": 0.0}
+    same, overlap, n_questions = 0, 0.0, 0
+    for item in input_paths_to_papers:
+        paper_id, paper = fct_get_paragraphs_from_paper(item)
+        matches = {}
+        for features in seconds:
+            start = time.perf_counter()
+            try:
+                matches[features] = fct_add_matches_to_context(fct_create_paper_context_from_paragraphs(paper_id, paper, input_min_df, input_max_df, features), questions_of_tasks, input_top)['matches']
+            except ValueError: # empty vocabulary
+                matches[features] = None
+            seconds[features] += time.perf_counter() - start
+        if matches['count'] is None or matches['hashing'] is None:
+            continue
+        for question in questions_of_tasks:
+            count_texts = [text for distance, text in matches['count'][question]]
+            hashing_texts = [text for distance, text in matches['hashing'][question]]
+            same += (count_texts == hashing_texts)
+            overlap += len(set(count_texts) & set(hashing_texts)) / max(len(count_texts), 1)
+            n_questions += 1
+    comparison = {
+        "papers": len(input_paths_to_papers),
+        "questions": n_questions,
+        "same_matches": same / n_questions if n_questions else None,
+        "overlap": overlap / n_questions if n_questions else None,
+        "count": seconds['count'],
+        "hashing": seconds['hashing'],
+        "speedup": seconds['count'] / seconds['hashing'] if seconds['hashing'] else None
+    }
+    print('*** fct_compare_features ' + str(datetime.now()) + ' ***')
+    return comparison
+# print(fct_compare_features(json.load(open('/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/papers.biorxiv_medrxiv.json'))['paper'][:100])) # test
+
+### function 2.11: fct_create_paper_context_in_blocks() ###
+# same as fct_create_paper_context() + fct_add_matches_to_context(), but for oversized papers, in bounded memory, 'count' only.
+# 1st pass: the paper's vocabulary + document-frequencies, 1 paragraph at a time. 2nd pass: blocks of input_block paragraphs,
+# each scored as a paper context with the whole paper's df, see fct_get_distances_from_context(), into a running top of matches by QUESTION.
+# so only 1 block is ever vectorized, v. the whole paper's matrix + its squares + distances, and the matches are the same, incl. ties (paper order).
+# this returns a paper context with the matches of input_questions, and no features.
+def fct_create_paper_context_in_blocks(input_path_to_paper, input_questions, input_min_df=0.1, input_max_df=0.9, input_top=4, input_block=1024):
+    paper_id, paper = fct_get_paragraphs_from_paper(input_path_to_paper)
+    input_questions = list(dict.fromkeys(input_questions))
+    with fct_measure_stage('vectorization', paper_id) as record:
+        vocabulary, df = {}, array('q')
+        for paragraph in paper:
+            for ngram in set(fct_get_ngrams_of_text(paragraph)):
+                column = vocabulary.setdefault(ngram, len(vocabulary))
+                if column == len(df):
+                    df.append(0)
+                df[column] += 1
+        df = np.frombuffer(df, dtype=np.int64)
+        record['papers'] = 1
+        record['paragraphs'] = len(paper)
+        record['vocabulary'] = len(vocabulary)
+    if not len(vocabulary) and not any(fct_get_ngrams_of_question(question) for question in input_questions):
+        raise ValueError('empty vocabulary; perhaps the documents only contain stop words')
+    matches = {question: fct_get_top_matches(np.zeros(1), [question], input_top) for question in input_questions} # row 0: the QUESTION itself
+    for start in range(0, len(paper), input_block):
+        block = paper[start:start + input_block]
+        data, indices, indptr = array('q'), array('i'), array('q', [0])
+        for paragraph in block:
+            for ngram, count in Counter(fct_get_ngrams_of_text(paragraph)).items():
+                indices.append(vocabulary[ngram])
+                data.append(count)
+            indptr.append(len(indices))
+        block_context = {
+            "paper_id": paper_id,
+            "paper": block,
+            "vocabulary": vocabulary,
+            "features": sparse.csr_matrix((np.frombuffer(data, dtype=np.int64), np.frombuffer(indices, dtype=np.int32), np.frombuffer(indptr, dtype=np.int64)), shape=(len(block), len(vocabulary))),
+            "df": df,
+            "n_paragraphs": len(paper),
+            "min_df": input_min_df,
+            "max_df": input_max_df,
+            "matches": {}
+        }
+        with fct_measure_stage('distance', paper_id) as record:
+            distances = fct_get_distances_from_context(block_context, input_questions)[1:]
+            record['paragraphs'] = len(block)
+            record['questions'] = len(input_questions)
+        with fct_measure_stage('selection', paper_id) as record:
+            for index, question in enumerate(input_questions):
+                ### running top: the top so far (earlier paragraphs first) + the block's top ###
+                candidates = matches[question] + fct_get_top_matches(distances[:, index], block, input_top)
+                matches[question] = fct_get_top_matches(np.array([distance for distance, text in candidates]), [text for distance, text in candidates], input_top)
+            record['paragraphs'] = len(block)
+            record['questions'] = len(input_questions)
+    paper_context = {
+        "paper_id": paper_id,
+        "paper": paper,
+        "vocabulary": vocabulary,
+        "features": None, # see the blocks
+        "df": df,
+        "min_df": input_min_df,
+        "max_df": input_max_df,
+        "matches": matches
+    }
+    return paper_context
+
+### function 2.12: fct_sweep_parameters() ###
+# score every (min_df, max_df, top) of input_configurations on the same papers + all QUESTIONS of the tasks, in 1 pass.
+# each paper is tokenized + counted once, see fct_create_paper_context(). min_df/max_df are only a column filter on its df,
+# so all (min_df, max_df) are scored in 1 call to fct_get_distances_of_limits() on the same features, and each top is a prefix of the largest top.
+# the n-grams, ngram_range=(2, 3), are the same in every configuration, see fct_get_ngrams_of_text().
+# quality, v. the 1st configuration: the share of QUESTIONS with the same top matches, and the mean overlap of the top matches' paragraphs,
+#   both on the common top, i.e. the first min(top, top of the 1st configuration) matches, so configurations that only differ by top rank the same.
+#   same_matches, overlap and fallback_rate are None if no QUESTION was scored, e.g. no papers or only empty vocabularies.
+# fallback_rate: the share of QUESTIONS whose min_df/max_df left no n-grams, i.e. scored with min_df=0.0, max_df=1.0 instead.
+# seconds: the time to select (s), + the shared time to score split between configurations, summed over workers. tokenize: the shared time to parse + count.
+# this returns { "papers", "questions", "tokenize": s, "wall": s, "configurations": [{ "min_df", "max_df", "top", "same_matches", "overlap", "fallback_rate", "seconds" }, ...] }.
+def fct_sweep_parameters(input_paths_to_papers, input_configurations, input_tasks=range(len(questions)), input_workers=None, input_chunksize=8):
+    input_configurations = [tuple(configuration) for configuration in input_configurations]
+    questions_of_tasks = list(dict.fromkeys(question for task in input_tasks for question in fct_get_questions_of_task(task)))
+    chunks = [input_paths_to_papers[index:index + input_chunksize] for index in range(0, len(input_paths_to_papers), input_chunksize)]
+    totals = {"papers": 0, "questions": 0, "tokenize": 0.0, "same": [0] * len(input_configurations), "overlap": [0.0] * len(input_configurations), "fallbacks": [0] * len(input_configurations), "seconds": [0.0] * len(input_configurations)}
+    start = time.perf_counter()
+    with multiprocessing.Pool(processes=input_workers or os.cpu_count()) as pool:
+        for totals_of_chunk in pool.imap_unordered(functools.partial(fct_sweep_papers, input_questions=questions_of_tasks, input_configurations=input_configurations), chunks):
+            for key, value in totals_of_chunk.items():
+                totals[key] = [total + item for total, item in zip(totals[key], value)] if isinstance(value, list) else totals[key] + value
+    sweep = {
+        "papers": totals['papers'],
+        "questions": totals['questions'],
+        "tokenize": totals['tokenize'],
+        "wall": time.perf_counter() - start,
+        "configurations": [{
+            "min_df": min_df,
+            "max_df": max_df,
+            "top": top,
+            "same_matches": totals['same'][index] / totals['questions'] if totals['questions'] else None,
+            "overlap": totals['overlap'][index] / totals['questions'] if totals['questions'] else None,
+            "fallback_rate": totals['fallbacks'][index] / totals['questions'] if totals['questions'] else None,
+            "seconds": totals['seconds'][index]
+        } for index, (min_df, max_df, top) in enumerate(input_configurations)]
+    }
+    def fct_format_rate(input_rate): # None if no QUESTION was scored, e.g. no papers
+        return 'n/a' if input_rate is None else f'{input_rate:.3f}'
+    for configuration in sweep['configurations']:
+        print(f"*** fct_sweep_parameters min_df {configuration['min_df']}, max_df {configuration['max_df']}, top {configuration['top']}: same {fct_format_rate(configuration['same_matches'])}, overlap {fct_format_rate(configuration['overlap'])}, fallback {fct_format_rate(configuration['fallback_rate'])}, {configuration['seconds']:.2f} s ***")
+    print(f"*** fct_sweep_parameters {sweep['papers']} papers, {len(input_configurations)} configurations, tokenize {sweep['tokenize']:.2f} s, wall {sweep['wall']:.2f} s ***")
+    print('*** fct_sweep_parameters ' + str(datetime.now()) + ' ***')
+    return sweep
+# print(fct_sweep_parameters(json.load(open('/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/papers.biorxiv_medrxiv.json'))['paper'][:100], [(min_df, max_df, top) for min_df in (0.0, 0.05, 0.1, 0.2) for max_df in (0.5, 0.9) for top in (4, 8)])) # test
+
+### function 2.12.1: fct_sweep_papers() ###
+# the sweep of 1 chunk of papers, in a worker, see fct_sweep_parameters(). papers with an empty vocabulary are skipped.
+# this returns the chunk's totals, with 1 item per configuration for same, overlap, fallbacks and seconds.
+def fct_sweep_papers(input_paths_to_papers, input_questions, input_configurations):
+    limits = list(dict.fromkeys((min_df, max_df) for min_df, max_df, top in input_configurations))
+    top = max(top for min_df, max_df, top in input_configurations)
+    totals = {"papers": 0, "questions": 0, "tokenize": 0.0, "same": [0] * len(input_configurations), "overlap": [0.0] * len(input_configurations), "fallbacks": [0] * len(input_configurations), "seconds": [0.0] * len(input_configurations)}
+    for item in input_paths_to_papers:
+        start = time.perf_counter()
+        try:
+            paper_context = fct_create_paper_context(item)
+        except ValueError: # empty vocabulary
+            continue
+        totals['tokenize'] += time.perf_counter() - start
+        ### score all (min_df, max_df) at once, on the same features ###
+        start = time.perf_counter()
+        try:
+            distances, fallbacks = fct_get_distances_of_limits(paper_context, input_questions, limits)
+        except ValueError: # empty vocabulary
+            continue
+        seconds = (time.perf_counter() - start) / len(input_configurations)
+        ### texts as #s, so that the top matches of all QUESTIONS are compared at once. row 0: the QUESTION itself ###
+        ids_of_texts = {}
+        texts = np.array([-1] + [ids_of_texts.setdefault(text, len(ids_of_texts)) for text in paper_context['paper']])
+        ### the largest top of each (min_df, max_df), stable, as fct_get_top_matches(), and each top: a prefix ###
+        orders = {}
+        reference = None
+        for index, (min_df, max_df, top_of_configuration) in enumerate(input_configurations):
+            start = time.perf_counter()
+            limit = limits.index((min_df, max_df))
+            if limit not in orders:
+                orders[limit] = np.argsort(distances[limit], axis=0, kind='stable')[:top]
+            matches = texts[orders[limit][:top_of_configuration]] # top x QUESTIONS
+            reference = matches if reference is None else reference
+            common = min(matches.shape[0], reference.shape[0]) # the common top
+            totals['same'][index] += int((matches[:common] == reference[:common]).all(axis=0).sum())
+            ### overlap of the sets of texts: each text once ###
+            repeated = ((matches[:common, None, :] == matches[None, :common, :]) & np.tri(common, k=-1, dtype=bool)[:, :, None]).any(axis=1)
+            totals['overlap'][index] += float(((matches[:common, None, :] == reference[None, :common, :]).any(axis=1) & ~repeated).sum() / max(common, 1))
+            totals['fallbacks'][index] += int(fallbacks[limit].sum())
+            totals['seconds'][index] += seconds + time.perf_counter() - start
+        totals['papers'] += 1
+        totals['questions'] += len(input_questions)
+    return totals
+
 ### function 3: fct_get_answer_from_matches() ###
 # from the sorting, remove the original QUESTIONS and return the top unique answers.
-def fct_get_answer_from_matches(input_path_to_paper, input_min_df, input_max_df, input_task=0, input_top=4):
+def fct_get_answer_from_matches(input_path_to_paper, input_min_df, input_max_df, input_task=0, input_top=4, input_features='count'):
+    ### parse + vectorize the paper once per task, and rank its paragraphs for all the task's QUESTIONS at once ###
+    paper_context = fct_create_paper_context(input_path_to_paper, input_min_df, input_max_df, input_features)
+    fct_add_matches_to_context(paper_context, fct_get_questions_of_task(input_task), input_top)
+    answer_unique = fct_get_answer_from_context(paper_context, input_task, input_top)
+    return answer_unique
+# print(fct_get_answer_from_matches('/mnt/g/Users/pie/Downloads/nih/covid19/CORD-19-research-challenge/2020-03-13/biorxiv_medrxiv/biorxiv_medrxiv/28b107243576723248ad4053261000311a22f134.json', input_min_df=0.1, input_max_df=0.9, input_task=0, input_top=4)) # test
+
+### function 3.1: fct_get_answer_from_context() ###
+# same as fct_get_answer_from_matches(), but from a paper context.
+def fct_get_answer_from_context(input_context, input_task=0, input_top=4):
     pp = pprint.PrettyPrinter()
     answer = []
     for index in range(input_top):
         try:
-            if (fct_get_matches_from_papers(input_path_to_paper, questions[input_task], input_min_df, input_max_df)[index][0] != 0.0): # remove original question (+ no perfect answer with score = 0.0?)
-                answer.append(fct_get_matches_from_papers(input_path_to_paper, questions[input_task], input_min_df, input_max_df)[index][1]) # (question)[row(distance, answer)][answer]
+            if (fct_get_matches_from_context(input_context, questions[input_task])[index][0] != 0.0): # remove original question (+ no perfect answer with score = 0.0?)
+                answer.append(fct_get_matches_from_context(input_context, questions[input_task])[index][1]) # (question)[row(distance, answer)][answer]
         except IndexError:
             pass
     for question in questions_detail[input_task]:
@@ -443,23 +1135,38 @@ def fct_get_answer_from_matches(input_path_to_paper, input_min_df, input_max_df,
         # print(question) # test: WHAT IS KNOWN ABOUT TRANSMISSION, INCUBATION, AND ENVIRONMENTAL STABILITY?
         for index in range(input_top):
             try:
-                if (fct_get_matches_from_papers(input_path_to_paper, question, input_min_df, input_max_df)[index][0] != 0.0):
-                    answer.append(fct_get_matches_from_papers(input_path_to_paper, question, input_min_df, input_max_df)[index][1])
+                if (fct_get_matches_from_context(input_context, question)[index][0] != 0.0):
+                    answer.append(fct_get_matches_from_context(input_context, question)[index][1])
             except IndexError:
                 pass
     for question in questions_specific[input_task]:
         ### get paper/text ###
         for index in range(input_top):
             try:
-                if (fct_get_matches_from_papers(input_path_to_paper, question, input_min_df, input_max_df)[index][0] != 0.0):
-                    answer.append(fct_get_matches_from_papers(input_path_to_paper, question, input_min_df, input_max_df)[index][1])
+                if (fct_get_matches_from_context(input_context, question)[index][0] != 0.0):
+                    answer.append(fct_get_matches_from_context(input_context, question)[index][1])
             except IndexError:
                 pass
     answer_unique = list(dict.fromkeys(answer)) # also remove duplicate distances
     # pp.pprint(answer_unique) # test
-    print('*** fct_get_answer_from_matches ' + str(datetime.now()) + ' ***')
     return answer_unique
-# print(fct_get_answer_from_matches('/mnt/g/Users/pie/Downloads/nih/covid19/CORD-19-research-challenge/2020-03-13/biorxiv_medrxiv/biorxiv_medrxiv/28b107243576723248ad4053261000311a22f134.json', input_min_df=0.1, input_max_df=0.9, input_task=0, input_top=4)) # test
+
+### function 3.2: fct_get_questions_of_task() ###
+# a task's QUESTIONS, detailed-QUESTIONS and specific-QUESTIONS, in the order they are answered.
+def fct_get_questions_of_task(input_task):
+    return [questions[input_task]] + questions_detail[input_task] + questions_specific[input_task]
+
+### function 3.3: fct_get_answers_of_tasks() ###
+# the answers to all tasks' QUESTIONS from a paper context, ranking its paragraphs for all tasks at once.
+# this returns 1 answer per task, see fct_write_answers_all_tasks().
+def fct_get_answers_of_tasks(input_context, input_tasks=range(len(questions)), input_top=4):
+    fct_add_matches_to_context(input_context, [question for task in input_tasks for question in fct_get_questions_of_task(task)], input_top)
+    return [{
+        "paper_id": input_context['paper_id'],
+        "task": task,
+        "abstract": questions[task],
+        "body_text": fct_get_answer_from_context(input_context, task, input_top)
+    } for task in input_tasks]
 
 ### function 4: fct_write_answers() ###
 # write the answers to an answer file.
@@ -467,11 +1174,17 @@ def fct_get_answer_from_matches(input_path_to_paper, input_min_df, input_max_df,
 # see https://github.com/gisblog/nih-covid19/tree/master/covid19/kaggle/working/CORD-19-research-challenge/2020-03-13.
 # e.g. 3c70c99afc7a38df3c4807857856ea258d378429.json -
 # { "paper_id": "3c70c99afc7a38df3c4807857856ea258d378429", "task": 0, "abstract": "WHAT IS KNOWN ABOUT TRANSMISSION, INCUBATION, AND ENVIRONMENTAL STABILITY?", "body_text": [ "...", ... ] }
-def fct_write_answers(input_path_of_papers, input_min_df, input_max_df, input_task, input_top):
+# papers whose answers are still valid in the answers manifest are skipped, see fct_load_manifest().
+def fct_write_answers(input_path_of_papers, input_min_df, input_max_df, input_task, input_top, input_path_of_working=path_of_working, input_features='count'):
+    manifest = fct_load_manifest(input_path_of_working)
+    parameters = fct_get_parameters_of_answers(input_task, input_min_df, input_max_df, input_top, input_features)
     with open(input_path_of_papers) as open_file:
         json_file = json.load(open_file)
         for index, item in enumerate(json_file['paper']):
-            print('*** ' + item + ' ' + str(datetime.now()) + ' ***')
+            ### skip unchanged papers ###
+            hash_of_paper = fct_get_hash_of_file(item)
+            if fct_get_answer_from_manifest(manifest, item, hash_of_paper, parameters, input_path_of_working) is not None:
+                continue
             ### id ###
             paper_file = item.split('/')[-1]
             paper_id = paper_file.split('.')[0]
@@ -481,32 +1194,476 @@ def fct_write_answers(input_path_of_papers, input_min_df, input_max_df, input_ta
                 "paper_id": paper_id,
                 "task": input_task,
                 "abstract": questions[input_task],
-                "body_text": fct_get_answer_from_matches(item, input_min_df, input_max_df, input_task, input_top) # item = input_path_to_paper
+                "body_text": fct_get_answer_from_matches(item, input_min_df, input_max_df, input_task, input_top, input_features) # item = input_path_to_paper
             }
-            output_answer_file = '/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working' + item # todo: f-string
-            os.makedirs(os.path.dirname(output_answer_file), exist_ok=True)
-            with open(output_answer_file, 'w') as open_answer:
-                json.dump(answer_json, open_answer, indent=2, separators=(',', ': '))
+            with fct_measure_stage('write', paper_id) as record:
+                output_answer_file = input_path_of_working + item
+                os.makedirs(os.path.dirname(output_answer_file), exist_ok=True)
+                with open(output_answer_file, 'w') as open_answer:
+                    json.dump(answer_json, open_answer, indent=2, separators=(',', ': '))
+                record['papers'] = 1
+            fct_add_to_manifest(manifest, {item: hash_of_paper}, parameters, input_path_of_working)
     print('*** fct_write_answers ' + str(datetime.now()) + ' ***')
 # fct_write_answers(input_path_of_papers='/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/papers.biorxiv_medrxiv.json', input_min_df=0.1, input_max_df=0.9, input_task=0, input_top=4) # test
 
-### multiprocessing ###
-process_0_write_answers = multiprocessing.Process(target=fct_write_answers, args=('/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/papers.biorxiv_medrxiv.json', 0.1, 0.9, 0, 4))
-# process_1_write_answers = multiprocessing.Process(target=fct_write_answers, args=('/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/papers.comm_use_subset.json', 0.1, 0.9, 0, 4))
-# process_2_write_answers = multiprocessing.Process(target=fct_write_answers, args=('/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/papers.noncomm_use_subset.json', 0.1, 0.9, 0, 4))
-# process_3_write_answers = multiprocessing.Process(target=fct_write_answers, args=('/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/papers.pmc_custom_license.json', 0.1, 0.9, 0, 4))
+### function 4.1: fct_write_answers_all_tasks() ###
+# write the answers to all tasks' QUESTIONS to an answer file, loading and vectorizing each paper once.
+# the QUESTIONS of all tasks are stacked, so 1 sparse product per paper ranks the paragraphs for every task.
+# this creates all the answer files, following the same storage structure as the input data, with 1 answer per task.
+# e.g. 3c70c99afc7a38df3c4807857856ea258d378429.json -
+# [ { "paper_id": "3c70c99afc7a38df3c4807857856ea258d378429", "task": 0, "abstract": "WHAT IS KNOWN ABOUT TRANSMISSION, INCUBATION, AND ENVIRONMENTAL STABILITY?", "body_text": [ "...", ... ] }, { ..., "task": 1, ... }, ... ]
+# papers whose answers are still valid in the answers manifest are skipped, see fct_load_manifest().
+def fct_write_answers_all_tasks(input_path_of_papers, input_min_df, input_max_df, input_top, input_tasks=range(len(questions)), input_path_of_working=path_of_working, input_features='count'):
+    manifest = fct_load_manifest(input_path_of_working)
+    parameters = fct_get_parameters_of_answers(list(input_tasks), input_min_df, input_max_df, input_top, input_features)
+    with open(input_path_of_papers) as open_file:
+        json_file = json.load(open_file)
+        for index, item in enumerate(json_file['paper']):
+            ### skip unchanged papers ###
+            hash_of_paper = fct_get_hash_of_file(item)
+            if fct_get_answer_from_manifest(manifest, item, hash_of_paper, parameters, input_path_of_working) is not None:
+                continue
+            fct_write_answer_of_paper(item, input_min_df, input_max_df, input_top, input_tasks, input_path_of_working, input_features)
+            fct_add_to_manifest(manifest, {item: hash_of_paper}, parameters, input_path_of_working)
+    print('*** fct_write_answers_all_tasks ' + str(datetime.now()) + ' ***')
+# fct_write_answers_all_tasks(input_path_of_papers='/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/papers.biorxiv_medrxiv.json', input_min_df=0.1, input_max_df=0.9, input_top=4) # test
+
+### function 4.2: fct_write_answer_of_paper() ###
+# write the answers to all tasks' QUESTIONS for 1 paper, see fct_write_answers_all_tasks().
+# this returns the answers, 1 per task.
+# input_max_paper_size: papers larger than this (bytes) are scored in blocks, see fct_create_paper_context_in_blocks(), 'count' only.
+# input_path_of_working=None writes no answer file, e.g. for the answer log, see fct_open_answer_log().
+def fct_write_answer_of_paper(input_path_to_paper, input_min_df, input_max_df, input_top, input_tasks=range(len(questions)), input_path_of_working=path_of_working, input_features='count', input_max_paper_size=None):
+    ### id ###
+    paper_file = input_path_to_paper.split('/')[-1]
+    paper_id = paper_file.split('.')[0]
+    ### parse + vectorize the paper once, and rank its paragraphs for all tasks at once ###
+    questions_of_tasks = [question for task in input_tasks for question in fct_get_questions_of_task(task)]
+    if (input_max_paper_size is not None) and (input_features == 'count') and (os.path.getsize(input_path_to_paper) > input_max_paper_size):
+        paper_context = fct_create_paper_context_in_blocks(input_path_to_paper, questions_of_tasks, input_min_df, input_max_df, input_top)
+    else:
+        paper_context = fct_add_matches_to_context(fct_create_paper_context(input_path_to_paper, input_min_df, input_max_df, input_features), questions_of_tasks, input_top)
+    ### json ###
+    answer_json = [{
+        "paper_id": paper_id,
+        "task": task,
+        "abstract": questions[task],
+        "body_text": fct_get_answer_from_context(paper_context, task, input_top)
+    } for task in input_tasks]
+    if input_path_of_working is None:
+        return answer_json
+    with fct_measure_stage('write', paper_id) as record:
+        output_answer_file = input_path_of_working + input_path_to_paper
+        os.makedirs(os.path.dirname(output_answer_file), exist_ok=True)
+        with open(output_answer_file, 'w') as open_answer:
+            json.dump(answer_json, open_answer, indent=2, separators=(',', ': '))
+        record['papers'] = 1
+    return answer_json
+
+### function 4.3: fct_write_answers_of_papers() ###
+# a chunk of papers for 1 worker of fct_schedule_answers().
+# this returns the answers by paper.
+def fct_write_answers_of_papers(input_paths_to_papers, input_min_df, input_max_df, input_top, input_tasks=range(len(questions)), input_path_of_working=path_of_working, input_features='count', input_max_paper_size=None):
+    return {item: fct_write_answer_of_paper(item, input_min_df, input_max_df, input_top, input_tasks, input_path_of_working, input_features, input_max_paper_size) for item in input_paths_to_papers}
+
+### function 4.4: fct_schedule_answers() ###
+# write the answers to all tasks' QUESTIONS for the papers of all main papers files, on 1 pool of workers sized to the machine.
+# v. 1 process per subset, where 1 core does comm_use_subset (9,003 papers) and the others idle after biorxiv_medrxiv (806 papers).
+# papers are sent to the workers in chunks, largest first (by file size, from the main papers files), and the workers take the next chunk as soon as they are done.
+# papers whose answers are still valid in the answers manifest are not sent, and the manifest is updated as each chunk is done, so a rerun resumes.
+# then, the per-subset answer files are rebuilt from the answers, in the order of the main papers files.
+# input_memory_budget: the max rss (bytes) of all workers, see fct_run_in_budget(), v. 1 unbounded pool. papers larger than
+#   input_max_paper_size (bytes, default: 1/64 of a worker's share of the budget) are then scored in blocks, see fct_create_paper_context_in_blocks().
+# input_backend='log' appends the answers to the answer log in --working/answers.log, see fct_open_answer_log(), v. 1 answer file per paper + the manifest.
+# input_shard=(index, count) only answers the papers of shard index of count, see fct_get_shard_of_paper(), e.g. on 1 of count nodes, with the log backend.
+#   the shards' logs are then merged into answers.task.N.<subset>.json, see fct_merge_answers_from_log(), v. per shard.
+# this creates the per-paper answer files, see fct_write_answers_all_tasks(), or answer log segments, and answers.task.N.<subset>.json for each task.
+def fct_schedule_answers(input_paths_of_papers, input_min_df, input_max_df, input_top, input_tasks=range(len(questions)), input_workers=None, input_chunksize=8, input_path_of_working=path_of_working, input_features='count', input_memory_budget=None, input_max_paper_size=None, input_backend='files', input_shards=4, input_compress=True, input_shard=None):
+    input_tasks = list(input_tasks)
+    if (input_shard is not None) and (input_backend != 'log'):
+        raise ValueError('a shard of the papers requires the answer log backend, see fct_merge_answers_from_log()')
+    parameters = fct_get_parameters_of_answers(input_tasks, input_min_df, input_max_df, input_top, input_features)
+    if input_backend == 'log':
+        path_of_log = os.path.join(input_path_of_working, 'answers.log')
+        manifest = fct_load_answer_log(path_of_log)
+    else:
+        manifest = fct_load_manifest(input_path_of_working)
+    papers_of_subset = {}
+    size_of_paper = {}
+    for path_of_papers in input_paths_of_papers:
+        with open(path_of_papers) as open_file:
+            json_file = json.load(open_file)
+        papers_of_subset[path_of_papers] = json_file['paper']
+        size_of_paper.update(zip(json_file['paper'], json_file.get('size', []))) # see fct_create_dict_of_papers()
+    ### skip unchanged papers ###
+    answers = {}
+    hash_of_paper = {}
+    for item in dict.fromkeys(item for items_of_subset in papers_of_subset.values() for item in items_of_subset):
+        if (input_shard is not None) and (fct_get_shard_of_paper(item, input_shard[1]) != input_shard[0]):
+            continue
+        hash_of_paper[item] = fct_get_hash_of_file(item)
+        if input_backend == 'log':
+            continue
+        answer_json = fct_get_answer_from_manifest(manifest, item, hash_of_paper[item], parameters, input_path_of_working)
+        if answer_json is not None:
+            answers[item] = answer_json
+    copies = {}
+    if input_backend == 'log':
+        ### the record of the same path, or of the same content at another path, e.g. in a new drop ###
+        entry_of_hash = {(entry['hash'], entry['parameters']): entry for entry in manifest.values()}
+        entries = {}
+        for item, hash_of_item in hash_of_paper.items():
+            entry = manifest.get((item, json.dumps(parameters))) # json, so 2 (count) != 2.0 (proportion)
+            if entry is None or entry['hash'] != hash_of_item:
+                entry = entry_of_hash.get((hash_of_item, json.dumps(parameters)))
+            if entry is not None:
+                entries[item] = entry
+        answers_of_entries = fct_read_answer_log(entries.values())
+        answers = {item: answers_of_entries[(entry['log'], entry['segment'], entry['start'])] for item, entry in entries.items()}
+        copies = {item: answers[item] for item, entry in entries.items() if entry['paper'] != item} # logged again at their path
+    ### balance by paper size: largest first ###
+    items = sorted(hash_of_paper.keys() - answers.keys(), key=lambda item: size_of_paper.get(item) or os.path.getsize(item), reverse=True)
+    chunks = [items[index:index + input_chunksize] for index in range(0, len(items), input_chunksize)]
+    print(f'*** fct_schedule_answers {len(answers)} unchanged, {len(items)} new or changed papers ***')
+    done = 0
+    start = time.perf_counter()
+    workers = input_workers or os.cpu_count()
+    if (input_memory_budget is not None) and (input_max_paper_size is None):
+        input_max_paper_size = input_memory_budget // (workers * 64)
+    function = functools.partial(fct_write_answers_of_papers, input_min_df=input_min_df, input_max_df=input_max_df, input_top=input_top, input_tasks=input_tasks, input_path_of_working=input_path_of_working if input_backend != 'log' else None, input_features=input_features, input_max_paper_size=input_max_paper_size)
+    with contextlib.ExitStack() as stack:
+        if input_memory_budget is None:
+            results = stack.enter_context(multiprocessing.Pool(processes=workers)).imap_unordered(function, chunks)
+        else:
+            results = fct_run_in_budget(function, chunks, workers, input_memory_budget)
+        if input_backend == 'log':
+            answer_log = fct_open_answer_log(path_of_log, parameters, input_shards, input_compress)
+            stack.callback(fct_close_answer_log, answer_log) # sealed, also on an interruption
+            for item, answer_json in copies.items():
+                fct_add_to_answer_log(answer_log, item, hash_of_paper[item], answer_json)
+        for answers_of_chunk in results:
+            answers.update(answers_of_chunk)
+            if input_backend == 'log':
+                for item, answer_json in answers_of_chunk.items():
+                    fct_add_to_answer_log(answer_log, item, hash_of_paper[item], answer_json)
+            else:
+                fct_add_to_manifest(manifest, {item: hash_of_paper[item] for item in answers_of_chunk}, parameters, input_path_of_working)
+            ### progress ###
+            done += len(answers_of_chunk)
+            print(f'\r*** fct_schedule_answers {done}/{len(items)} papers, {done / (time.perf_counter() - start):.1f} papers/s ***', end='' if done < len(items) else '\n', flush=True) # the newline when done, before e.g. fct_run_in_budget()'s last print
+    if input_shard is not None:
+        print(f'*** fct_schedule_answers shard {input_shard[0]}/{input_shard[1]}: {len(answers)} papers in {path_of_log} ***')
+        return
+    ### rebuild the per-subset answer files ###
+    for path_of_papers, items_of_subset in papers_of_subset.items():
+        input_dir = os.path.basename(path_of_papers)[len('papers.'):-len('.json')] # papers.<subset>.json
+        for position, task in enumerate(input_tasks):
+            fct_write_answers_file(f'{input_path_of_working}/answers.task.{task}.{input_dir}.json', (answers[item][position] for item in items_of_subset))
+    print('*** fct_schedule_answers ' + str(datetime.now()) + ' ***')
+# fct_schedule_answers(input_paths_of_papers=['/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/papers.biorxiv_medrxiv.json', '/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/papers.comm_use_subset.json'], input_min_df=0.1, input_max_df=0.9, input_top=4) # test
+
+### function 4.4.1: fct_run_in_budget() ###
+# run input_function over input_chunks on input_workers processes, within a memory budget (bytes) for the rss of all workers.
+# backpressure: a chunk is only dispatched to an idle worker while the workers' rss is under the budget, or if none is busy.
+# recycling: a worker whose rss grows over its share of the budget exits after its chunk, and a fresh one takes its place.
+# a worker killed mid-chunk, e.g. by the oom killer, is replaced, and its chunk is retried once.
+# each worker gets its chunks over its own pipe, so the chunk of a killed worker is always known, and sends its results over its own pipe too,
+#   v. 1 queue shared by all workers, whose lock or feeder a worker killed mid-write can leave held or its stream corrupt, for every worker.
+#   a result cut short by a kill is an EOFError on the pipe of that worker only. the pipes of dead workers are read before their deaths are handled.
+# the parent waits on the result pipes + the sentinels of the workers at once, see multiprocessing.connection.wait(), so a death is seen without polling.
+# a chunk can still be retried after its result was written, e.g. by a process that outlives its worker: each chunk is done, and yielded, once.
+# this yields the results, as the chunks are done.
+def fct_run_in_budget(input_function, input_chunks, input_workers=None, input_memory_budget=2 ** 32, input_interval=0.5):
+    import psutil # process and system monitoring
+    import multiprocessing.connection # wait() on pipes + sentinels
+    input_workers = input_workers or os.cpu_count()
+    workers, busy, retries = {}, {}, Counter() # pid -> (process, chunk pipe, result pipe, psutil process), pid -> chunk #, chunk # -> retries
+    pending = list(range(len(input_chunks)))[::-1] # next chunk last
+    def fct_start_worker():
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        results, results_sender = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.Process(target=fct_work_in_budget, args=(input_function, receiver, results_sender, input_memory_budget / input_workers), daemon=True)
+        process.start()
+        receiver.close()
+        results_sender.close() # the worker's end only, so its death is an EOFError
+        try: # with the worker, v. cached by pid, so a reused pid is never a stale process
+            monitored = psutil.Process(process.pid)
+        except psutil.Error: # already dead, see below
+            monitored = None
+        workers[process.pid] = (process, sender, results, monitored)
+    def fct_stop_worker(pid):
+        process, sender, results, monitored = workers.pop(pid)
+        sender.close()
+        results.close()
+        return process
+    def fct_receive(results): # all the results of a worker so far, v. blocking
+        messages = []
+        with contextlib.suppress(EOFError, OSError): # exited, or killed mid-write
+            while results.poll():
+                messages.append(results.recv())
+        return messages
+    def fct_get_rss():
+        rss = 0
+        for process, sender, results, monitored in workers.values():
+            with contextlib.suppress(psutil.Error, AttributeError): # exited since, or None
+                rss += monitored.memory_info().rss
+        return rss
+    for _ in range(input_workers):
+        fct_start_worker()
+    done, recycled = set(), 0 # chunk #s
+    try:
+        while len(done) < len(input_chunks):
+            ### dispatch, with backpressure ###
+            for pid in [pid for pid in workers if pid not in busy]:
+                if not pending or (busy and fct_get_rss() >= input_memory_budget):
+                    break
+                busy[pid] = pending.pop()
+                try:
+                    workers[pid][1].send((busy[pid], input_chunks[busy[pid]]))
+                except OSError: # killed while idle: the chunk never ran, so it goes back, and the worker is replaced below
+                    pending.append(busy.pop(pid))
+            ready = set(multiprocessing.connection.wait([connection for process, sender, results, monitored in workers.values() for connection in (results, process.sentinel)], timeout=input_interval))
+            exited = [pid for pid, (process, sender, results, monitored) in workers.items() if process.exitcode is not None] # before their pipes are read, so no result is lost
+            ### results ###
+            for pid, (process, sender, results, monitored) in list(workers.items()):
+                if results not in ready and pid not in exited:
+                    continue
+                for kind, pid_of_result, index, payload in fct_receive(results):
+                    if kind == 'error':
+                        raise RuntimeError(f'chunk {index} failed in worker {pid}:\n{payload}')
+                    if busy.get(pid) == index:
+                        del busy[pid]
+                    if kind == 'last' and pid in workers: # recycled
+                        fct_stop_worker(pid).join()
+                        recycled += 1
+                        fct_start_worker()
+                    if index not in done: # v. a late result of a retried chunk
+                        done.add(index)
+                        if index in pending:
+                            pending.remove(index)
+                        yield payload
+            ### workers killed mid-chunk ###
+            for pid in [pid for pid in exited if pid in workers]:
+                process = fct_stop_worker(pid)
+                if pid in busy and busy[pid] in done:
+                    del busy[pid]
+                elif pid in busy:
+                    index = busy.pop(pid)
+                    retries[index] += 1
+                    if retries[index] > 1:
+                        raise RuntimeError(f'chunk {index} killed its worker twice, exitcode {process.exitcode}')
+                    pending.append(index)
+                fct_start_worker()
+    finally:
+        for process, sender, results, monitored in workers.values():
+            with contextlib.suppress(OSError):
+                sender.send(None)
+            sender.close()
+            results.close()
+        for process, sender, results, monitored in workers.values():
+            process.join(timeout=input_interval)
+            if process.is_alive():
+                process.terminate()
+    print(f'*** fct_run_in_budget {len(input_chunks)} chunks, {recycled} workers recycled, {sum(retries.values())} chunks retried ***')
+
+### function 4.4.2: fct_work_in_budget() ###
+# a worker of fct_run_in_budget(): chunks from its pipe until None, or until its rss is over input_max_rss (bytes). its results go to its own pipe, input_results.
+def fct_work_in_budget(input_function, input_pipe, input_results, input_max_rss):
+    process = fct_get_process(os.getpid())
+    while True:
+        task = input_pipe.recv()
+        if task is None:
+            return
+        index, chunk = task
+        try:
+            result = input_function(chunk)
+        except Exception:
+            import traceback # format the worker's exception for the parent
+            input_results.send(('error', os.getpid(), index, traceback.format_exc()))
+            return
+        if process.memory_info().rss > input_max_rss: # last chunk
+            input_results.send(('last', os.getpid(), index, result))
+            return
+        input_results.send(('result', os.getpid(), index, result))
+
+### function 4.5: fct_get_hash_of_file() ###
+# the content hash of a paper, so an unchanged paper of a new drop (e.g. 2020-03-20 v. 2020-03-13) keeps its answers, or of an answer file.
+def fct_get_hash_of_file(input_path_to_file):
+    with open(input_path_to_file, 'rb') as open_file:
+        return hashlib.sha1(open_file.read()).hexdigest()
+
+### function 4.5.1: fct_get_shard_of_paper() ###
+# the shard of a paper, by the sha1 of its paper_id (file name), so the same on every node, for any copy of the papers, and in every run.
+def fct_get_shard_of_paper(input_path_to_paper, input_count):
+    paper_id = os.path.basename(input_path_to_paper).split('.')[0]
+    return int(hashlib.sha1(paper_id.encode('utf-8')).hexdigest()[:16], 16) % input_count
+
+### function 4.6: fct_load_manifest() ###
+# the answers manifest, answers.manifest.jsonl in the working dir, has 1 line per written answer file -
+# { "hash": "<sha1 of the paper>", "paper": "<path to the paper>", "parameters": { "task": 0, "min_df": 0.1, "max_df": 0.9, "top": 4 }, "answer": "<sha1 of the answer file>" }
+# lines are appended as papers are done, so an interruption loses at most the papers in progress.
+# the answer hash catches an answer file rewritten before its line was appended.
+# on load, the latest line per paper wins. if some lines were superseded or cut short, the manifest is rewritten without them, v. on every load.
+# this returns the manifest by hash.
+def fct_load_manifest(input_path_of_working=path_of_working):
+    manifest_file = input_path_of_working + '/answers.manifest.jsonl'
+    entries = {}
+    n_lines = 0
+    if os.path.exists(manifest_file):
+        with open(manifest_file) as open_file:
+            for line in open_file:
+                n_lines += 1
+                try:
+                    entry = json.loads(line)
+                except ValueError: # cut short by an interruption
+                    continue
+                entries.pop(entry['paper'], None) # keep the order of the latest lines
+                entries[entry['paper']] = entry
+    os.makedirs(input_path_of_working, exist_ok=True)
+    ### compact, only if there are superseded or cut short lines ###
+    if n_lines != len(entries):
+        with open(manifest_file + '.tmp', 'w') as open_file:
+            for entry in entries.values():
+                open_file.write(json.dumps(entry) + '\n')
+        os.replace(manifest_file + '.tmp', manifest_file)
+    return {entry['hash']: entry for entry in entries.values()}
+# fct_load_manifest(input_path_of_working='/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working') # test
 
-### execute processes in parallel ###
-process_0_write_answers.start()
-# process_1_write_answers.start()
-# process_2_write_answers.start()
-# process_3_write_answers.start()
+### function 4.7: fct_add_to_manifest() ###
+# record the written answer files of papers, by path to the paper: hash of the paper, in the answers manifest, see fct_load_manifest().
+def fct_add_to_manifest(input_manifest, input_papers, input_parameters, input_path_of_working=path_of_working):
+    with open(input_path_of_working + '/answers.manifest.jsonl', 'a') as open_file:
+        for item, hash_of_paper in input_papers.items():
+            entry = {"hash": hash_of_paper, "paper": item, "parameters": input_parameters, "answer": fct_get_hash_of_file(input_path_of_working + item)}
+            input_manifest[hash_of_paper] = entry
+            open_file.write(json.dumps(entry) + '\n')
 
-### join processes back to the parent process (this) ###
-process_0_write_answers.join()
-# process_1_write_answers.join()
-# process_2_write_answers.join()
-# process_3_write_answers.join()
+### function 4.8: fct_get_answer_from_manifest() ###
+# the answers to a paper, if its content and the scoring parameters are unchanged since its answer file was written.
+# an unchanged paper at a new path, e.g. in a new drop, gets a copy of its answer file at the new path.
+# this returns the answers, or None if the paper has to be scored.
+def fct_get_answer_from_manifest(input_manifest, input_path_to_paper, input_hash, input_parameters, input_path_of_working=path_of_working):
+    entry = input_manifest.get(input_hash)
+    if entry is None or json.dumps(entry['parameters']) != json.dumps(input_parameters): # json, so 2 (count) != 2.0 (proportion)
+        return None
+    try:
+        with open(input_path_of_working + entry['paper'], 'rb') as open_file:
+            answer_file = open_file.read()
+    except OSError:
+        return None
+    if hashlib.sha1(answer_file).hexdigest() != entry.get('answer'):
+        return None
+    answer_json = json.loads(answer_file)
+    if entry['paper'] != input_path_to_paper:
+        output_answer_file = input_path_of_working + input_path_to_paper
+        os.makedirs(os.path.dirname(output_answer_file), exist_ok=True)
+        with open(output_answer_file, 'w') as open_answer:
+            json.dump(answer_json, open_answer, indent=2, separators=(',', ': '))
+        fct_add_to_manifest(input_manifest, {input_path_to_paper: input_hash}, input_parameters, input_path_of_working)
+    return answer_json
+
+### function 4.9: fct_get_parameters_of_answers() ###
+# the scoring parameters of an answer file, see fct_load_manifest(). the feature space is only recorded if not the default, count.
+def fct_get_parameters_of_answers(input_task, input_min_df, input_max_df, input_top, input_features='count'):
+    parameters = {"task": input_task, "min_df": input_min_df, "max_df": input_max_df, "top": input_top}
+    if input_features != 'count':
+        parameters['features'] = input_features
+    return parameters
+
+### function 4.10: fct_open_answer_log() ###
+# the answer log, v. 1 answer file per paper in a copy of the papers' dir tree, and the manifest: a dir of a few append-only segments -
+# e.g. answers.log/segment.20200320101500123456.<host>.1234.002.jsonl.gz + segment.20200320101500123456.<host>.1234.002.index.json, by time, host, pid and shard.
+# papers are sharded by their content hash into input_shards segments, so a paper's answers are always in the same shard.
+# each record is 1 compact JSON line - { "paper": "<path to the paper>", "hash": "<sha1 of the paper>", "answers": [ {..., "task": 0, ...}, ... ] } -
+# and, if input_compress, 1 gzip member, so that 1 record can be read without the rest of its segment.
+# a segment is written to a .tmp file, and sealed by a rename when it reaches input_segment_size (bytes) or the log is closed, then its index is written -
+# { "segment": "...", "parameters": { "task": [...], ... }, "paper": [ "...", ... ], "hash": [ "...", ... ], "start": [ 0, ... ], "end": [ 1234, ... ] }
+# a segment without an index, e.g. after an interruption, is ignored, i.e. its papers are answered again.
+# this returns the log for fct_add_to_answer_log() and fct_close_answer_log().
+def fct_open_answer_log(input_path_of_log, input_parameters, input_shards=4, input_compress=True, input_segment_size=2 ** 26):
+    os.makedirs(input_path_of_log, exist_ok=True)
+    return {
+        "path": input_path_of_log,
+        "parameters": input_parameters,
+        "shards": input_shards,
+        "compress": input_compress,
+        "segment_size": input_segment_size,
+        "segments": {} # shard: segment being written
+    }
+
+### function 4.11: fct_add_to_answer_log() ###
+def fct_add_to_answer_log(input_answer_log, input_path_to_paper, input_hash, input_answers):
+    shard = int(input_hash[:8], 16) % input_answer_log['shards']
+    segment = input_answer_log['segments'].get(shard)
+    if segment is None:
+        path_of_segment = os.path.join(input_answer_log['path'], f'segment.{platform.node()}.{os.getpid()}.{shard:03d}.tmp')
+        segment = input_answer_log['segments'][shard] = {"file": open(path_of_segment, 'wb'), "path": path_of_segment, "index": {"paper": [], "hash": [], "start": [], "end": []}, "offset": 0}
+    record = json.dumps({"paper": input_path_to_paper, "hash": input_hash, "answers": input_answers}, separators=(',', ':')).encode('ascii') + b'\n'
+    if input_answer_log['compress']:
+        record = gzip.compress(record, mtime=0)
+    segment['index']['paper'].append(input_path_to_paper)
+    segment['index']['hash'].append(input_hash)
+    segment['index']['start'].append(segment['offset'])
+    segment['offset'] += segment['file'].write(record)
+    segment['index']['end'].append(segment['offset'])
+    if segment['offset'] >= input_answer_log['segment_size']:
+        fct_seal_answer_segment(input_answer_log, shard)
+
+### function 4.12: fct_seal_answer_segment() ###
+# rename a segment being written to its final name, ordered by time, then write its index, each atomically.
+def fct_seal_answer_segment(input_answer_log, input_shard):
+    segment = input_answer_log['segments'].pop(input_shard)
+    segment['file'].flush()
+    os.fsync(segment['file'].fileno())
+    segment['file'].close()
+    name = f'segment.{datetime.now().strftime("%Y%m%d%H%M%S%f")}.{platform.node()}.{os.getpid()}.{input_shard:03d}'
+    name_of_segment = name + ('.jsonl.gz' if input_answer_log['compress'] else '.jsonl')
+    os.replace(segment['path'], os.path.join(input_answer_log['path'], name_of_segment))
+    path_of_index = os.path.join(input_answer_log['path'], name + '.index.json')
+    with open(path_of_index + '.tmp', 'w') as open_file:
+        json.dump(dict({"segment": name_of_segment, "parameters": input_answer_log['parameters']}, **segment['index']), open_file, separators=(',', ':'))
+    os.replace(path_of_index + '.tmp', path_of_index)
+
+### function 4.13: fct_close_answer_log() ###
+def fct_close_answer_log(input_answer_log):
+    for shard in list(input_answer_log['segments']):
+        fct_seal_answer_segment(input_answer_log, shard)
+
+### function 4.14: fct_load_answer_log() ###
+# the indexes of the sealed segments of an answer log, or of several, e.g. 1 per shard, in the order they were sealed, see fct_open_answer_log(). the latest record wins.
+# records are by path to the paper, v. by content hash, so a paper file in 2 subsets, as in CORD-19, keeps a record in each. the hash only tells an unchanged paper, see fct_schedule_answers().
+# this returns the records' locations by (path to the paper, json of the parameters) - { "paper", "hash", "parameters", "log", "segment", "start", "end" }.
+def fct_load_answer_log(input_paths_of_logs):
+    if isinstance(input_paths_of_logs, str):
+        input_paths_of_logs = [input_paths_of_logs]
+    names = sorted((name, path_of_log) for path_of_log in input_paths_of_logs if os.path.isdir(path_of_log) for name in os.listdir(path_of_log) if name.endswith('.index.json'))
+    entries = {}
+    for name, path_of_log in names:
+        with open(os.path.join(path_of_log, name)) as open_file:
+            index = json.load(open_file)
+        parameters = json.dumps(index['parameters'])
+        for item, hash_of_paper, start, end in zip(index['paper'], index['hash'], index['start'], index['end']):
+            entries.pop((item, parameters), None) # keep the order of the latest records
+            entries[(item, parameters)] = {"paper": item, "hash": hash_of_paper, "parameters": parameters, "log": path_of_log, "segment": index['segment'], "start": start, "end": end}
+    return entries
+
+### function 4.15: fct_read_answer_log() ###
+# the records of given entries, see fct_load_answer_log(), with 1 open + 1 seek per record, in segment order.
+# this returns the answers by (log, segment, start), since the logs of shards can have segments of the same name.
+def fct_read_answer_log(input_entries):
+    starts_of_segment = {}
+    for entry in input_entries:
+        starts_of_segment.setdefault((entry['segment'], entry['log']), {})[entry['start']] = entry['end']
+    answers = {}
+    for segment, path_of_log in sorted(starts_of_segment):
+        with open(os.path.join(path_of_log, segment), 'rb') as open_file:
+            for start, end in sorted(starts_of_segment[(segment, path_of_log)].items()):
+                open_file.seek(start)
+                record = open_file.read(end - start)
+                if segment.endswith('.gz'):
+                    record = gzip.decompress(record)
+                answers[(path_of_log, segment, start)] = json.loads(record)['answers']
+    return answers
 
 ### function 5: fct_merge_answers() ###
 # walk given path for answer files.
@@ -516,54 +1673,1078 @@ process_0_write_answers.join()
 # see https://github.com/gisblog/nih-covid19/tree/master/covid19/kaggle/working.
 # e.g. answers.task.0.comm_use_subset.json -
 # [ ... { "paper_id": "fffaed7e9353b7df6c4ca8f66b62e117013cb86d", "task": 0, "abstract": "WHAT IS KNOWN ABOUT TRANSMISSION, INCUBATION, AND ENVIRONMENTAL STABILITY?", "body_text": [ "..." ] } ... ]
-def fct_merge_answers(input_task, input_dir, input_path_of_answers, input_type_of_answers='json'):
-    answer_file = '/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/answers.task.' + str(input_task) + '.' + input_dir + '.json' # todo: f-string
-    os.makedirs(os.path.dirname(answer_file), exist_ok=True)
-    with open(answer_file, 'w') as open_file:
-        open_file.write('[')
-        for dirname, _, filenames in os.walk(input_path_of_answers):
-            for filename in filenames:
-                dir_file = os.path.join(dirname, filename)
-                if (filename).endswith(input_type_of_answers) and re.search('^(?=.*[0-9])(?=.*[a-z])([a-z0-9]+)$', filename.split('.')[0]) and ('/' + input_dir) in dirname:
-                    with open(dir_file) as answer_item:
-                        print('*** ' + dir_file + ' ' + str(datetime.now()) + ' ***')
-                        '''
-                        {
-                          "paper_id": "...",
-                          "task": 0,
-                          "abstract": "...?",
-                          "body_text": ["..."]
-                        }
-                        '''
-                        answer_item_json_load = json.load(answer_item)
-                        try:
-                            if (answer_item_json_load['task'] == input_task):
-                                json.dump(answer_item_json_load, open_file, indent=2, separators=(',', ': '))
-                        except KeyError:
-                            json.dump({}, open_file, indent=2, separators=(',', ': '))
-                        if (filename != filenames[-1]):
-                            open_file.write(',')
-        open_file.write(']')
-    print('*** fct_merge_answers ' + str(datetime.now()) + ' ***')
+# the answers are merged by fct_merge_answers_all_tasks(), for this task and subset only.
+def fct_merge_answers(input_task, input_dir, input_path_of_answers, input_type_of_answers='json', input_path_of_working=path_of_working):
+    fct_merge_answers_all_tasks(input_path_of_answers, [input_task], [input_dir], input_type_of_answers, input_path_of_working=input_path_of_working)
 # fct_merge_answers(input_task=0, input_dir='biorxiv_medrxiv', input_path_of_answers='/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/mnt/g/Users/pie/Downloads/nih/covid19/CORD-19-research-challenge/2020-03-13/biorxiv_medrxiv/biorxiv_medrxiv/', input_type_of_answers='json') # test
 
-### multiprocessing ###
-process_0_merge_answers = multiprocessing.Process(target=fct_merge_answers, args=(0, 'biorxiv_medrxiv', '/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/mnt/g/Users/pie/Downloads/nih/covid19/CORD-19-research-challenge/2020-03-13/biorxiv_medrxiv/biorxiv_medrxiv/', 'json'))
-# process_1_merge_answers = multiprocessing.Process(target=fct_merge_answers, args=(0, 'comm_use_subset', '/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/mnt/g/Users/pie/Downloads/nih/covid19/CORD-19-research-challenge/2020-03-13/comm_use_subset/comm_use_subset/', 'json'))
-# process_2_merge_answers = multiprocessing.Process(target=fct_merge_answers, args=(0, 'noncomm_use_subset', '/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/mnt/g/Users/pie/Downloads/nih/covid19/CORD-19-research-challenge/2020-03-13/noncomm_use_subset/noncomm_use_subset/', 'json'))
-# process_3_merge_answers = multiprocessing.Process(target=fct_merge_answers, args=(0, 'pmc_custom_license', '/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/mnt/g/Users/pie/Downloads/nih/covid19/CORD-19-research-challenge/2020-03-13/pmc_custom_license/pmc_custom_license/', 'json'))
-
-### execute processes in parallel ###
-process_0_merge_answers.start()
-# process_1_merge_answers.start()
-# process_2_merge_answers.start()
-# process_3_merge_answers.start()
-
-### join processes back to the parent process (this) ###
-process_0_merge_answers.join()
-# process_1_merge_answers.join()
-# process_2_merge_answers.join()
-# process_3_merge_answers.join()
+### function 5.1: fct_merge_answers_all_tasks() ###
+# merge all answers on a given path into the main answer files of all tasks and subsets at once.
+# v. 1 walk + 1 parse of every answer file per task and subset.
+# the answer files are found in 1 scan, read in parallel (in order), and each record is routed to its task + subset stream.
+# a separator is written before every record but the 1st of its stream, so skipped files or other tasks' records can't leave a dangling comma.
+# input_indent=None writes compact JSON, v. indent=2.
+# this creates answers.task.N.<subset>.json for each task, for each subset with answer files, with their index, see fct_open_answers_file().
+def fct_merge_answers_all_tasks(input_path_of_answers, input_tasks=range(len(questions)), input_dirs=subsets_of_papers, input_type_of_answers='json', input_indent=2, input_workers=32, input_path_of_working=path_of_working):
+    answer_files = [dir_file for dir_file, size, mtime in fct_scan_tree_of_papers(input_path_of_answers, input_type_of_answers, input_workers)]
+    subset_of_answer = {dir_file: fct_get_subset_of_paper(dir_file, os.path.dirname(os.path.normpath(input_path_of_answers)), input_dirs) for dir_file in answer_files} # incl. the last dir of the given path, e.g. .../biorxiv_medrxiv/
+    answer_files = [dir_file for dir_file in answer_files if subset_of_answer[dir_file] is not None]
+    ### 1 stream per task + subset ###
+    os.makedirs(input_path_of_working, exist_ok=True)
+    streams = {}
+    for input_dir in dict.fromkeys(subset_of_answer[dir_file] for dir_file in answer_files):
+        for task in input_tasks:
+            streams[(task, input_dir)] = fct_open_answers_file(f'{input_path_of_working}/answers.task.{task}.{input_dir}.json', input_indent)
+    with fct_measure_stage('merge') as record:
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=input_workers) as executor:
+                for dir_file, answer_json in zip(answer_files, executor.map(fct_read_answer_file, answer_files)):
+                    for answer in answer_json:
+                        stream = (answer.get('task'), subset_of_answer[dir_file])
+                        if stream in streams:
+                            fct_add_to_answers_file(streams[stream], answer)
+        finally:
+            for stream in streams.values():
+                fct_close_answers_file(stream)
+        record['papers'] = len(answer_files)
+    print('*** fct_merge_answers_all_tasks ' + str(datetime.now()) + ' ***')
+# fct_merge_answers_all_tasks(input_path_of_answers='/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/mnt/g/Users/pie/Downloads/nih/covid19/CORD-19-research-challenge/2020-03-13/', input_indent=None) # test
+
+### function 5.2: fct_read_answer_file() ###
+# 1 answer file of fct_merge_answers_all_tasks().
+#    {
+#      "paper_id": "...",
+#      "task": 0,
+#      "abstract": "...?",
+#      "body_text": ["..."]
+#    }
+# or a list of them, see fct_write_answers_all_tasks(): [{..., "task": 0, ...}, {..., "task": 1, ...}, ...]
+# this returns the answers as a list.
+def fct_read_answer_file(input_path_to_answer):
+    with open(input_path_to_answer) as answer_item:
+        answer_item_json_load = json.load(answer_item)
+    return answer_item_json_load if isinstance(answer_item_json_load, list) else [answer_item_json_load]
+
+### function 5.3: fct_open_answers_file() ###
+# a main answer file being written, record by record, with its index of byte offsets, so that readers can seek to 1 record.
+# see fct_get_answers() and fct_iter_answers().
+# this creates - e.g. answers.task.0.comm_use_subset.json + answers.task.0.comm_use_subset.index.json -
+# { "paper_id": [ "...", ... ], "start": [ 1, ... ], "end": [ 1234, ... ] }, where record # i is bytes start[i]:end[i].
+# records are json.dump()-ed with ensure_ascii, i.e. 1 byte per character.
+# this returns the stream for fct_add_to_answers_file() and fct_close_answers_file().
+def fct_open_answers_file(input_answer_file, input_indent=2):
+    os.makedirs(os.path.dirname(input_answer_file), exist_ok=True)
+    answers_file = {
+        "file": open(input_answer_file, 'wb'),
+        "path": input_answer_file,
+        "indent": input_indent,
+        "separators": (',', ': ') if input_indent is not None else (',', ':'),
+        "index": {"paper_id": [], "start": [], "end": []},
+        "offset": 1
+    }
+    answers_file['file'].write(b'[')
+    return answers_file
+
+### function 5.4: fct_add_to_answers_file() ###
+def fct_add_to_answers_file(input_answers_file, input_answer):
+    index = input_answers_file['index']
+    if index['paper_id']:
+        input_answers_file['offset'] += input_answers_file['file'].write(b',')
+    record = json.dumps(input_answer, indent=input_answers_file['indent'], separators=input_answers_file['separators']).encode('ascii')
+    index['paper_id'].append(input_answer.get('paper_id'))
+    index['start'].append(input_answers_file['offset'])
+    input_answers_file['offset'] += input_answers_file['file'].write(record)
+    index['end'].append(input_answers_file['offset'])
+
+### function 5.5: fct_close_answers_file() ###
+def fct_close_answers_file(input_answers_file):
+    input_answers_file['file'].write(b']')
+    input_answers_file['file'].close()
+    with open(fct_get_path_of_answers_index(input_answers_file['path']), 'w') as open_file:
+        json.dump(input_answers_file['index'], open_file)
+
+### function 5.6: fct_write_answers_file() ###
+# write answers to a main answer file + its index, see fct_open_answers_file().
+def fct_write_answers_file(input_answer_file, input_answers, input_indent=2):
+    with fct_measure_stage('write', input_answer_file) as record:
+        answers_file = fct_open_answers_file(input_answer_file, input_indent)
+        try:
+            for answer in input_answers:
+                fct_add_to_answers_file(answers_file, answer)
+        finally:
+            fct_close_answers_file(answers_file)
+        record['papers'] = len(answers_file['index']['paper_id'])
+
+### function 5.7: fct_get_path_of_answers_index() ###
+def fct_get_path_of_answers_index(input_answer_file):
+    return input_answer_file[:-len('.json')] + '.index.json'
+
+### function 5.8: fct_merge_answers_from_log() ###
+# same as fct_merge_answers_all_tasks(), but from an answer log, see fct_open_answer_log(), v. a walk of the per-paper answer files.
+# or from several, e.g. the logs of the shards of a run on several nodes, see fct_schedule_answers(input_shard=...), each with its own copy of the papers -
+#   papers are matched by subset + paper_id, v. by path, and a paper's latest record wins, so the merged files are the same for any # of shards.
+#   records are by path, see fct_load_answer_log(), so the same paper file in 2 subsets is merged into both, as in a run of 1 node.
+# the papers are in the order of the main papers files, as fct_schedule_answers() writes them, or else in log order, by subset of their path.
+# input_parameters: only the records of these scoring parameters, see fct_get_parameters_of_answers(), but any tasks, v. the latest record of any.
+# this creates answers.task.N.<subset>.json for each task, for each subset with answers, with their index, see fct_open_answers_file().
+def fct_merge_answers_from_log(input_paths_of_logs, input_paths_of_papers=None, input_tasks=range(len(questions)), input_dirs=subsets_of_papers, input_indent=2, input_path_of_working=path_of_working, input_parameters=None):
+    entries = [entry for entry in fct_load_answer_log(input_paths_of_logs).values() if input_parameters is None or json.dumps(dict(json.loads(entry['parameters']), task=None)) == json.dumps(dict(input_parameters, task=None))]
+    with fct_measure_stage('merge') as record:
+        ### the latest answers of each paper, for each task ###
+        answers_of_records = fct_read_answer_log(entries)
+        answers = {}
+        for entry in entries:
+            key = (fct_get_subset_of_paper(entry['paper'], os.sep, input_dirs), os.path.basename(entry['paper']).split('.')[0])
+            answer_of_task = answers.pop(key, {})
+            answers[key] = answer_of_task
+            for answer in answers_of_records[(entry['log'], entry['segment'], entry['start'])]:
+                answer_of_task[answer.get('task')] = answer
+        ### papers by subset ###
+        papers_of_subset = {}
+        if input_paths_of_papers is None:
+            for input_dir, paper_id in answers:
+                if input_dir is not None:
+                    papers_of_subset.setdefault(input_dir, []).append(paper_id)
+        else:
+            for path_of_papers in input_paths_of_papers:
+                with open(path_of_papers) as open_file:
+                    papers_of_subset[os.path.basename(path_of_papers)[len('papers.'):-len('.json')]] = [os.path.basename(item).split('.')[0] for item in json.load(open_file)['paper']] # papers.<subset>.json
+        for input_dir, paper_ids in papers_of_subset.items():
+            for task in input_tasks:
+                fct_write_answers_file(f'{input_path_of_working}/answers.task.{task}.{input_dir}.json', (answers[(input_dir, paper_id)][task] for paper_id in paper_ids if task in answers.get((input_dir, paper_id), {})), input_indent)
+        record['papers'] = len(answers)
+    print('*** fct_merge_answers_from_log ' + str(datetime.now()) + ' ***')
+# fct_merge_answers_from_log('/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/answers.log', ['/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/papers.biorxiv_medrxiv.json']) # test
+# fct_merge_answers_from_log(['/mnt/node0/working/answers.log', '/mnt/node1/working/answers.log'], ['/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/papers.biorxiv_medrxiv.json']) # test: 2 shards
+
+### 1 pass for all tasks + subsets, if per-paper answer files were written otherwise: fct_schedule_answers() already rebuilds answers.task.N.<subset>.json ###
+# fct_merge_answers_all_tasks('/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/mnt/g/Users/pie/Downloads/nih/covid19/CORD-19-research-challenge/2020-03-13/')
+
+### function 6: fct_build_index() ###
+# tokenize all the paragraphs of a main papers file once, into a shared vocabulary and sparse term matrix, and save it.
+# answers can then be queried from the index, i.e. a transform of the QUESTIONS plus a sparse lookup, without refitting CountVectorizer per paper.
+# this creates - e.g. index.comm_use_subset/ -
+#   features.data.npy, features.indices.npy, features.indptr.npy: n-gram counts (csr), 1 row per paragraph.
+#   vocabulary.json: { "n-gram": column, ... }
+#   offsets.npy: the paragraphs of paper # i are the rows offsets[i]:offsets[i + 1].
+#   papers.json: { "paper_id": [ ... ], "paper": [ ... ], "subset": [ ... ] }, subset from the main papers file, papers.<subset>.json.
+#   paragraphs.txt, paragraphs.offsets.npy: the text of paragraph # i is bytes paragraphs.offsets[i]:paragraphs.offsets[i + 1] (utf-8).
+# input_path_of_papers can also be a list of main papers files, e.g. all subsets, see fct_build_ann().
+def fct_build_index(input_path_of_papers, input_path_of_index):
+    vocabulary = {}
+    data, indices, indptr, offsets, paragraph_offsets = array('i'), array('i'), array('q', [0]), array('q', [0]), array('q', [0])
+    dict_of_index = {"paper_id": [], "paper": [], "subset": []}
+    os.makedirs(input_path_of_index, exist_ok=True)
+    with open(os.path.join(input_path_of_index, 'paragraphs.txt'), 'wb') as open_paragraphs:
+        for path_of_papers in ([input_path_of_papers] if isinstance(input_path_of_papers, str) else input_path_of_papers):
+            input_dir = os.path.basename(path_of_papers)[len('papers.'):-len('.json')] # papers.<subset>.json
+            with open(path_of_papers) as open_file:
+                items = json.load(open_file)['paper']
+            for item in items:
+                paper_id, paper = fct_get_paragraphs_from_paper(item)
+                for paragraph in paper:
+                    ### same n-grams as CountVectorizer ###
+                    for column, count in Counter(vocabulary.setdefault(ngram, len(vocabulary)) for ngram in fct_get_ngrams_of_text(paragraph)).items():
+                        indices.append(column)
+                        data.append(count)
+                    indptr.append(len(indices))
+                    paragraph_offsets.append(paragraph_offsets[-1] + open_paragraphs.write(paragraph.encode('utf-8')))
+                offsets.append(len(indptr) - 1)
+                dict_of_index['paper_id'].append(paper_id)
+                dict_of_index['paper'].append(item)
+                dict_of_index['subset'].append(input_dir)
+    np.save(os.path.join(input_path_of_index, 'features.data.npy'), np.frombuffer(data, dtype=np.int32))
+    np.save(os.path.join(input_path_of_index, 'features.indices.npy'), np.frombuffer(indices, dtype=np.int32))
+    np.save(os.path.join(input_path_of_index, 'features.indptr.npy'), np.frombuffer(indptr, dtype=np.int64))
+    np.save(os.path.join(input_path_of_index, 'offsets.npy'), np.frombuffer(offsets, dtype=np.int64))
+    np.save(os.path.join(input_path_of_index, 'paragraphs.offsets.npy'), np.frombuffer(paragraph_offsets, dtype=np.int64))
+    with open(os.path.join(input_path_of_index, 'vocabulary.json'), 'w') as open_file:
+        json.dump(vocabulary, open_file)
+    with open(os.path.join(input_path_of_index, 'papers.json'), 'w') as open_file:
+        json.dump(dict_of_index, open_file, indent=2, separators=(',', ': '))
+    print('*** fct_build_index ' + str(datetime.now()) + ' ***')
+# fct_build_index(input_path_of_papers='/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/papers.comm_use_subset.json', input_path_of_index='/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/index.comm_use_subset') # test
+
+### function 6.1: fct_load_index() ###
+# memory-map an index from fct_build_index(). only the vocabulary and the list of papers are read into memory.
+def fct_load_index(input_path_of_index):
+    def fct_load(name):
+        return np.load(os.path.join(input_path_of_index, name + '.npy'), mmap_mode='r')
+    with open(os.path.join(input_path_of_index, 'vocabulary.json')) as open_file:
+        vocabulary = json.load(open_file)
+    with open(os.path.join(input_path_of_index, 'papers.json')) as open_file:
+        dict_of_index = json.load(open_file)
+    indptr = fct_load('features.indptr')
+    paragraphs_file = os.path.join(input_path_of_index, 'paragraphs.txt')
+    index = {
+        "features": sparse.csr_matrix((fct_load('features.data'), fct_load('features.indices'), indptr), shape=(indptr.shape[0] - 1, len(vocabulary)), copy=False),
+        "vocabulary": vocabulary,
+        "offsets": fct_load('offsets'),
+        "paper_id": dict_of_index['paper_id'],
+        "paper": dict_of_index['paper'],
+        "subset": dict_of_index.get('subset', [None] * len(dict_of_index['paper_id'])), # older indexes
+        "position": {paper_id: position for position, paper_id in enumerate(dict_of_index['paper_id'])},
+        "paragraphs": np.memmap(paragraphs_file, dtype=np.uint8, mode='r') if os.path.getsize(paragraphs_file) else np.zeros(0, dtype=np.uint8),
+        "paragraph_offsets": fct_load('paragraphs.offsets')
+    }
+    print('*** fct_load_index ' + str(datetime.now()) + ' ***')
+    return index
+
+### function 6.2: fct_create_paper_context_from_index() ###
+# same as fct_create_paper_context(), but from an index - a sparse lookup of the paper's rows instead of parsing + vectorizing the paper.
+# the paper's corpus columns are renumbered to its own columns, so min_df/max_df apply to the same document-frequencies as before.
+def fct_create_paper_context_from_index(input_index, input_paper_id, input_min_df=0.1, input_max_df=0.9):
+    position = input_index['position'][input_paper_id]
+    start, end = int(input_index['offsets'][position]), int(input_index['offsets'][position + 1])
+    rows = input_index['features'][start:end]
+    columns, paper_columns = np.unique(rows.indices, return_inverse=True)
+    features = sparse.csr_matrix((rows.data.astype(np.int64), paper_columns, rows.indptr), shape=(end - start, columns.shape[0]))
+    paragraph_offsets = input_index['paragraph_offsets'][start:end + 1]
+    paper_context = {
+        "paper_id": input_paper_id,
+        "paper": [bytes(input_index['paragraphs'][paragraph_offsets[row]:paragraph_offsets[row + 1]]).decode('utf-8') for row in range(end - start)],
+        "vocabulary": input_index['vocabulary'],
+        "columns": columns, # paper column -> corpus column
+        "features": features,
+        "df": np.bincount(paper_columns, minlength=columns.shape[0]),
+        "min_df": input_min_df,
+        "max_df": input_max_df,
+        "matches": {}
+    }
+    return paper_context
+
+### function 6.3: fct_get_answer_from_index() ###
+# same as fct_get_answer_from_matches(), but from an index.
+def fct_get_answer_from_index(input_index, input_paper_id, input_min_df=0.1, input_max_df=0.9, input_task=0, input_top=4):
+    paper_context = fct_create_paper_context_from_index(input_index, input_paper_id, input_min_df, input_max_df)
+    fct_add_matches_to_context(paper_context, fct_get_questions_of_task(input_task), input_top)
+    return fct_get_answer_from_context(paper_context, input_task, input_top)
+# print(fct_get_answer_from_index(fct_load_index('/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/index.biorxiv_medrxiv'), '28b107243576723248ad4053261000311a22f134', input_min_df=0.1, input_max_df=0.9, input_task=0, input_top=4)) # test
+
+### function 6.4: fct_get_matches_from_index() ###
+# rank the paragraphs of every paper in an index for new QUESTIONS, e.g. not in the QUESTION lists, without a rerun over the papers.
+# this yields the paper id and its top matches by QUESTION, for each paper.
+def fct_get_matches_from_index(input_index, input_questions, input_min_df=0.1, input_max_df=0.9, input_top=4):
+    for paper_id in input_index['paper_id']:
+        paper_context = fct_create_paper_context_from_index(input_index, paper_id, input_min_df, input_max_df)
+        yield paper_id, fct_add_matches_to_context(paper_context, input_questions, input_top)['matches']
+# for paper_id, matches in fct_get_matches_from_index(fct_load_index('/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/index.comm_use_subset'), ['WHAT IS KNOWN ABOUT ASYMPTOMATIC TRANSMISSION IN CHILDREN?']): print(paper_id, matches) # test
+
+### function 6.5: fct_build_ann() ###
+# an approximate nearest-neighbour index over all the paragraphs of an index, e.g. of all subsets, for corpus-wide QUESTIONS.
+# v. ranking paragraphs within 1 paper, or a full scan of the corpus.
+# the n-gram counts are randomly projected (sparse random projection) to input_n_components dense dims, where euclidean distances are roughly kept.
+# the projected paragraphs are then grouped into input_n_cells coarse cells (ivf), by k-means on a sample, default 4 x sqrt(# paragraphs) cells.
+# a query only scans the paragraphs of the cells nearest to it, ranked by |x|^2 - 2 x @ q, with x @ q from the projection,
+#   then re-ranks the nearest candidates exactly, see fct_query_ann(). so its cost is ~ # paragraphs x n_probe / n_cells, v. all paragraphs.
+# more components, cells probed or candidates = higher recall, but slower, see fct_evaluate_ann().
+# this creates - e.g. index.all/ann/ -
+#   components.npz: the projection (sparse, n-grams x components).
+#   projections.npy: the projected paragraphs (float32, paragraphs x components).
+#   norms.npy: |x|^2 of each paragraph, for the exact re-ranking.
+#   centroids.npy: the centroid of each cell (float32, cells x components).
+#   rows.npy, cells.npy: the paragraphs of cell # i are the rows rows[cells[i]:cells[i + 1]], in row order.
+def fct_build_ann(input_path_of_index, input_n_components=64, input_seed=0, input_chunksize=65536, input_n_cells=None):
+    from sklearn.random_projection import SparseRandomProjection # project n-gram counts to a few dense dims
+    from sklearn.cluster import MiniBatchKMeans # coarse cells of the projections
+    index = fct_load_index(input_path_of_index)
+    features = index['features']
+    projection = SparseRandomProjection(n_components=input_n_components, dense_output=True, random_state=input_seed).fit(sparse.csr_matrix((1, features.shape[1]))) # only the # of n-grams matters
+    components = projection.components_.T.tocsr().astype(np.float32)
+    path_of_ann = os.path.join(input_path_of_index, 'ann')
+    os.makedirs(path_of_ann, exist_ok=True)
+    sparse.save_npz(os.path.join(path_of_ann, 'components.npz'), components)
+    projections = np.lib.format.open_memmap(os.path.join(path_of_ann, 'projections.npy'), mode='w+', dtype=np.float32, shape=(features.shape[0], input_n_components))
+    norms = np.zeros(features.shape[0], dtype=np.int64)
+    for start in range(0, features.shape[0], input_chunksize): # bounded memory
+        rows = sparse.csr_matrix(features[start:start + input_chunksize], dtype=np.float32)
+        projections[start:start + rows.shape[0]] = (rows @ components).toarray()
+        norms[start:start + rows.shape[0]] = np.asarray(rows.multiply(rows).sum(axis=1)).ravel()
+    projections.flush()
+    np.save(os.path.join(path_of_ann, 'norms.npy'), norms)
+    ### coarse cells: k-means of a sample, then every paragraph in the cell of its nearest centroid ###
+    n_cells = min(input_n_cells or int(4 * np.sqrt(features.shape[0])) or 1, features.shape[0])
+    centroids = np.zeros((n_cells, input_n_components), dtype=np.float32)
+    cell_of_rows = np.zeros(features.shape[0], dtype=np.int64)
+    if n_cells:
+        sample = np.sort(np.random.RandomState(input_seed).choice(features.shape[0], min(features.shape[0], 64 * n_cells), replace=False))
+        kmeans = MiniBatchKMeans(n_clusters=n_cells, n_init=3, batch_size=max(1024, 4 * n_cells), random_state=input_seed).fit(projections[sample])
+        centroids = kmeans.cluster_centers_.astype(np.float32)
+        for start in range(0, features.shape[0], input_chunksize):
+            cell_of_rows[start:start + input_chunksize] = kmeans.predict(projections[start:start + input_chunksize])
+    np.save(os.path.join(path_of_ann, 'centroids.npy'), centroids)
+    np.save(os.path.join(path_of_ann, 'rows.npy'), np.argsort(cell_of_rows, kind='stable'))
+    np.save(os.path.join(path_of_ann, 'cells.npy'), np.concatenate([np.zeros(1, dtype=np.int64), np.cumsum(np.bincount(cell_of_rows, minlength=n_cells))]))
+    print(f'*** fct_build_ann {features.shape[0]} paragraphs, {n_cells} cells ' + str(datetime.now()) + ' ***')
+# fct_build_index(['/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/papers.biorxiv_medrxiv.json', '/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/papers.comm_use_subset.json', '/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/papers.noncomm_use_subset.json', '/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/papers.pmc_custom_license.json'], '/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/index.all'); fct_build_ann('/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/index.all') # test
+
+### function 6.6: fct_load_ann() ###
+# memory-map an ann index from fct_build_ann().
+def fct_load_ann(input_path_of_index):
+    path_of_ann = os.path.join(input_path_of_index, 'ann')
+    projections = np.load(os.path.join(path_of_ann, 'projections.npy'), mmap_mode='r')
+    centroids = np.load(os.path.join(path_of_ann, 'centroids.npy'))
+    ann = {
+        "components": sparse.load_npz(os.path.join(path_of_ann, 'components.npz')).tocsr(),
+        "projections": projections,
+        "norms": np.load(os.path.join(path_of_ann, 'norms.npy'), mmap_mode='r'),
+        "centroids": centroids,
+        "centroid_norms": (centroids * centroids).sum(axis=1),
+        "rows": np.load(os.path.join(path_of_ann, 'rows.npy'), mmap_mode='r'),
+        "cells": np.load(os.path.join(path_of_ann, 'cells.npy'))
+    }
+    return ann
+
+### function 6.7: fct_get_vector_of_question() ###
+# a QUESTION's n-gram counts in the corpus vocabulary of an index, and |q|^2 incl. the n-grams only in the QUESTION.
+def fct_get_vector_of_question(input_index, input_question):
+    columns, counts, question_norm = [], [], 0
+    for ngram, count in fct_get_ngrams_of_question(input_question).items():
+        question_norm += count ** 2
+        if ngram in input_index['vocabulary']:
+            columns.append(input_index['vocabulary'][ngram])
+            counts.append(count)
+    vector = sparse.csr_matrix((np.array(counts, dtype=np.float64), (np.zeros(len(columns), dtype=np.int64), np.array(columns, dtype=np.int64))), shape=(1, input_index['features'].shape[1]))
+    return vector, question_norm
+
+### function 6.8: fct_query_ann() ###
+# the input_top paragraphs nearest to a QUESTION across the whole index, from the ann index, see fct_build_ann().
+# only the paragraphs of the input_n_probe cells nearest to the QUESTION are scanned, in the projection,
+# and their input_n_candidates nearest are re-ranked with exact distances, like euclidean_distances() on the n-gram counts.
+# this returns [[distance, paper_id, subset, text], ...], nearest first.
+def fct_query_ann(input_index, input_ann, input_question, input_top=10, input_n_candidates=1000, input_n_probe=32):
+    vector, question_norm = fct_get_vector_of_question(input_index, input_question)
+    projected = (vector @ input_ann['components']).toarray().ravel().astype(np.float32)
+    ### the nearest cells: |c|^2 - 2 c @ q ###
+    n_probe = min(input_n_probe, input_ann['centroids'].shape[0])
+    probed = np.argpartition(input_ann['centroid_norms'] - 2 * (input_ann['centroids'] @ projected), n_probe - 1)[:n_probe] if n_probe else []
+    rows = np.sort(np.concatenate([np.zeros(0, dtype=np.int64)] + [input_ann['rows'][input_ann['cells'][cell]:input_ann['cells'][cell + 1]] for cell in probed]))
+    approximate = input_ann['norms'][rows] - 2 * (input_ann['projections'][rows] @ projected) # exact |x|^2, approximate x @ q (+ |q|^2, the same for all)
+    n_candidates = min(max(input_n_candidates, input_top), rows.shape[0])
+    candidates = rows[np.sort(np.argpartition(approximate, n_candidates - 1)[:n_candidates])] if n_candidates else rows
+    return fct_rank_rows(input_index, input_ann['norms'], candidates, vector, question_norm, input_top)
+# print(fct_query_ann(fct_load_index('/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/index.all'), fct_load_ann('/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/index.all'), 'WHAT IS KNOWN ABOUT ASYMPTOMATIC TRANSMISSION IN CHILDREN?')) # test
+
+### function 6.9: fct_rank_rows() ###
+# exact distances from a QUESTION to rows of an index, the nearest input_top first (ties in row order).
+def fct_rank_rows(input_index, input_norms, input_rows, input_vector, input_question_norm, input_top):
+    products = np.asarray(input_index['features'][input_rows] @ input_vector.T.toarray()).ravel()
+    distances = np.sqrt(np.maximum(input_norms[input_rows] - 2 * products + input_question_norm, 0))
+    matches = []
+    for position in fct_get_top_matches(distances, list(range(input_rows.shape[0])), input_top):
+        row = int(input_rows[position[1]])
+        paper = int(np.searchsorted(input_index['offsets'], row, side='right')) - 1
+        start, end = input_index['paragraph_offsets'][row], input_index['paragraph_offsets'][row + 1]
+        matches.append([position[0], input_index['paper_id'][paper], input_index['subset'][paper], bytes(input_index['paragraphs'][start:end]).decode('utf-8')])
+    return matches
+
+### function 6.10: fct_evaluate_ann() ###
+# recall and latency of fct_query_ann() v. the exact ranking, euclidean_distances() over every paragraph of the index, for some QUESTIONS.
+# recall@top counts an ann match as found if its exact distance is within the exact top's, so ties don't count as misses.
+# this returns { (n_candidates, n_probe): { "recall", "seconds" (mean per QUESTION) }, ..., "exact": { "seconds" } }.
+def fct_evaluate_ann(input_index, input_ann, input_questions, input_top=10, input_n_candidates=(100, 1000, 10000), input_n_probe=(8, 32, 128)):
+    from sklearn.metrics.pairwise import euclidean_distances # compute distance matrix between each pair of vectors
+    evaluation = {"exact": {"seconds": 0.0}}
+    kth = {}
+    for question in input_questions:
+        vector, question_norm = fct_get_vector_of_question(input_index, question)
+        start = time.perf_counter()
+        distances = euclidean_distances(input_index['features'], vector).ravel()
+        evaluation['exact']['seconds'] += (time.perf_counter() - start) / len(input_questions)
+        kth[question] = np.sort(distances)[min(input_top, distances.shape[0]) - 1] if distances.shape[0] else 0.0
+        kth[question] = np.sqrt(max(kth[question] ** 2 - vector.multiply(vector).sum() + question_norm, 0)) # incl. the n-grams only in the QUESTION
+    for n_candidates in input_n_candidates:
+        for n_probe in input_n_probe:
+            recall, seconds = 0.0, 0.0
+            for question in input_questions:
+                start = time.perf_counter()
+                matches = fct_query_ann(input_index, input_ann, question, input_top, n_candidates, n_probe)
+                seconds += time.perf_counter() - start
+                recall += sum(distance <= kth[question] + 1e-9 for distance, paper_id, subset, text in matches) / max(min(input_top, input_index['features'].shape[0]), 1)
+            evaluation[(n_candidates, n_probe)] = {"recall": recall / len(input_questions), "seconds": seconds / len(input_questions)}
+    print('*** fct_evaluate_ann ' + str(datetime.now()) + ' ***')
+    return evaluation
+# print(fct_evaluate_ann(fct_load_index('/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/index.all'), fct_load_ann('/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/index.all'), questions)) # test
+
+### function 7: fct_build_store() ###
+# extract the paragraphs of all main papers files once, into a columnar paragraph store.
+# v. 1 open + parse per paper per stage, where small-file i/o dominates on network storage.
+# the later stages then read the whole corpus in a few sequential scans of memory-mapped columns.
+# this creates - e.g. store/ -
+#   text.txt, text.offsets.npy: the text of paragraph # i is bytes text.offsets[i]:text.offsets[i + 1] (utf-8).
+#   paragraph.paper.npy: the paper # of each paragraph (int32).
+#   paragraph.section.npy: the section of each paragraph (int8), 0 = abstract, 1 = body_text, see sections_of_paper.
+#   offsets.npy: the paragraphs of paper # i are offsets[i]:offsets[i + 1].
+#   papers.json: { "paper_id": [ ... ], "paper": [ ... ], "subset": [ ... ] }, subset from the main papers file, papers.<subset>.json.
+def fct_build_store(input_paths_of_papers, input_path_of_store):
+    paragraph_paper, paragraph_section, offsets, text_offsets = array('i'), array('b'), array('q', [0]), array('q', [0])
+    dict_of_store = {"paper_id": [], "paper": [], "subset": []}
+    os.makedirs(input_path_of_store, exist_ok=True)
+    with open(os.path.join(input_path_of_store, 'text.txt'), 'wb') as open_text:
+        for path_of_papers in input_paths_of_papers:
+            input_dir = os.path.basename(path_of_papers)[len('papers.'):-len('.json')] # papers.<subset>.json
+            with open(path_of_papers) as open_file:
+                items = json.load(open_file)['paper']
+            for item in items:
+                paper_json = fct_extract_paper(item)
+                for paper_id, section, text in fct_extract_paragraphs(paper_json):
+                    paragraph_paper.append(len(dict_of_store['paper_id']))
+                    paragraph_section.append(sections_of_paper.index(section))
+                    text_offsets.append(text_offsets[-1] + open_text.write(text.encode('utf-8')))
+                offsets.append(len(paragraph_paper))
+                dict_of_store['paper_id'].append(paper_json['paper_id'])
+                dict_of_store['paper'].append(item)
+                dict_of_store['subset'].append(input_dir)
+    np.save(os.path.join(input_path_of_store, 'text.offsets.npy'), np.frombuffer(text_offsets, dtype=np.int64))
+    np.save(os.path.join(input_path_of_store, 'paragraph.paper.npy'), np.frombuffer(paragraph_paper, dtype=np.int32))
+    np.save(os.path.join(input_path_of_store, 'paragraph.section.npy'), np.frombuffer(paragraph_section, dtype=np.int8))
+    np.save(os.path.join(input_path_of_store, 'offsets.npy'), np.frombuffer(offsets, dtype=np.int64))
+    with open(os.path.join(input_path_of_store, 'papers.json'), 'w') as open_file:
+        json.dump(dict_of_store, open_file, indent=2, separators=(',', ': '))
+    print('*** fct_build_store ' + str(datetime.now()) + ' ***')
+# fct_build_store(input_paths_of_papers=['/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/papers.biorxiv_medrxiv.json', '/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/papers.comm_use_subset.json', '/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/papers.noncomm_use_subset.json', '/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/papers.pmc_custom_license.json'], input_path_of_store='/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/store') # test
+
+### function 7.1: fct_load_store() ###
+# memory-map a paragraph store from fct_build_store(). only the list of papers is read into memory.
+def fct_load_store(input_path_of_store):
+    def fct_load(name):
+        return np.load(os.path.join(input_path_of_store, name + '.npy'), mmap_mode='r')
+    with open(os.path.join(input_path_of_store, 'papers.json')) as open_file:
+        dict_of_store = json.load(open_file)
+    text_file = os.path.join(input_path_of_store, 'text.txt')
+    store = {
+        "text": np.memmap(text_file, dtype=np.uint8, mode='r') if os.path.getsize(text_file) else np.zeros(0, dtype=np.uint8),
+        "text_offsets": fct_load('text.offsets'),
+        "paragraph_paper": fct_load('paragraph.paper'),
+        "paragraph_section": fct_load('paragraph.section'),
+        "offsets": fct_load('offsets'),
+        "paper_id": dict_of_store['paper_id'],
+        "paper": dict_of_store['paper'],
+        "subset": dict_of_store['subset'],
+        "position": {paper_id: position for position, paper_id in enumerate(dict_of_store['paper_id'])}
+    }
+    if os.path.exists(os.path.join(input_path_of_store, 'paragraph.exact.npy')): # see fct_build_fingerprints()
+        for name in ('paragraph.exact', 'paragraph.cluster', 'exact.papers', 'cluster.papers'):
+            store[name.replace('.', '_')] = fct_load(name)
+    return store
+
+### function 7.2: fct_get_paragraphs_from_store() ###
+# same as fct_get_paragraphs_from_paper(), but paper # input_position of a paragraph store: 1 slice of the text blob instead of 1 open + parse.
+def fct_get_paragraphs_from_store(input_store, input_position):
+    start, end = int(input_store['offsets'][input_position]), int(input_store['offsets'][input_position + 1])
+    text_offsets = input_store['text_offsets'][start:end + 1]
+    text = bytes(input_store['text'][text_offsets[0]:text_offsets[-1]]) if end > start else b''
+    paper = [text[text_offsets[row] - text_offsets[0]:text_offsets[row + 1] - text_offsets[0]].decode('utf-8') for row in range(end - start)]
+    return input_store['paper_id'][input_position], paper
+
+### function 7.3: fct_write_answers_from_store() ###
+# same as fct_schedule_answers(), but from a paragraph store: the workers read consecutive papers, i.e. sequential scans of the store.
+# the per-subset answer files are written directly, in store order, v. per-paper answer files + fct_merge_answers().
+# this creates answers.task.N.<subset>.json for each task and subset, or only input_subsets.
+# with fingerprints, see fct_build_fingerprints(), the n-grams of a paragraph shared by many papers are counted once per worker.
+# input_boilerplate: suppress the paragraphs found in input_boilerplate or more papers, e.g. licences + funding notes, before scoring.
+def fct_write_answers_from_store(input_path_of_store, input_min_df, input_max_df, input_top, input_tasks=range(len(questions)), input_subsets=None, input_workers=None, input_chunksize=64, input_path_of_working=path_of_working, input_features='count', input_boilerplate=None):
+    input_tasks = list(input_tasks)
+    store = fct_load_store(input_path_of_store)
+    if input_boilerplate is not None and 'paragraph_cluster' not in store:
+        raise ValueError(f'no fingerprints in {input_path_of_store}, see fct_build_fingerprints()')
+    positions = [position for position, subset in enumerate(store['subset']) if input_subsets is None or subset in input_subsets]
+    chunks = [positions[index:index + input_chunksize] for index in range(0, len(positions), input_chunksize)]
+    answers = {}
+    start = time.perf_counter()
+    with multiprocessing.Pool(processes=input_workers or os.cpu_count(), initializer=fct_init_store_of_worker, initargs=(input_path_of_store,)) as pool:
+        for answers_of_chunk in pool.imap_unordered(functools.partial(fct_get_answers_from_store, input_min_df=input_min_df, input_max_df=input_max_df, input_top=input_top, input_tasks=input_tasks, input_features=input_features, input_boilerplate=input_boilerplate), chunks):
+            answers.update(answers_of_chunk)
+            ### progress ###
+            print(f'\r*** fct_write_answers_from_store {len(answers)}/{len(positions)} papers, {len(answers) / (time.perf_counter() - start):.1f} papers/s ***', end='', flush=True)
+    print()
+    ### write the per-subset answer files ###
+    os.makedirs(input_path_of_working, exist_ok=True)
+    for input_dir in dict.fromkeys(store['subset'][position] for position in positions):
+        positions_of_subset = [position for position in positions if store['subset'][position] == input_dir]
+        for index_of_task, task in enumerate(input_tasks):
+            fct_write_answers_file(f'{input_path_of_working}/answers.task.{task}.{input_dir}.json', (answers[position][index_of_task] for position in positions_of_subset))
+    print('*** fct_write_answers_from_store ' + str(datetime.now()) + ' ***')
+# fct_write_answers_from_store(input_path_of_store='/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/store', input_min_df=0.1, input_max_df=0.9, input_top=4) # test
+
+### function 7.4: fct_get_answers_from_store() ###
+# a chunk of papers for 1 worker of fct_write_answers_from_store(), from the worker's store, see fct_init_store_of_worker().
+# this returns the answers by position in the store.
+def fct_get_answers_from_store(input_positions, input_min_df, input_max_df, input_top, input_tasks=range(len(questions)), input_features='count', input_boilerplate=None):
+    answers = {}
+    for position in input_positions:
+        paper_id, paper = fct_get_paragraphs_from_store(store_of_worker, position)
+        ngrams = None
+        if 'paragraph_exact' in store_of_worker:
+            start = int(store_of_worker['offsets'][position])
+            rows = range(start, start + len(paper))
+            if input_boilerplate is not None:
+                kept = [(row, paragraph) for row, paragraph in zip(rows, paper) if store_of_worker['cluster_papers'][store_of_worker['paragraph_cluster'][row]] < input_boilerplate]
+                rows, paper = [row for row, paragraph in kept], [paragraph for row, paragraph in kept]
+            if input_features == 'count':
+                ngrams = [fct_get_ngrams_of_paragraph(int(store_of_worker['paragraph_exact'][row]), paragraph) for row, paragraph in zip(rows, paper)]
+        answers[position] = fct_get_answers_of_tasks(fct_create_paper_context_from_paragraphs(paper_id, paper, input_min_df, input_max_df, input_features, ngrams), input_tasks, input_top)
+    return answers
+
+### function 7.5: fct_init_store_of_worker() ###
+# memory-map the store once per worker, v. once per chunk.
+def fct_init_store_of_worker(input_path_of_store):
+    global store_of_worker
+    store_of_worker = fct_load_store(input_path_of_store)
+store_of_worker = None
+
+### function 7.6: fct_build_fingerprints() ###
+# fingerprint every paragraph of a paragraph store, to find the paragraphs shared by many papers, e.g. licences, funding notes, preprint disclaimers.
+# exact: sha1 of the lowercased text with whitespace collapsed, i.e. paragraphs with the same n-grams get the same fingerprint.
+# input_minhash: also cluster near-duplicates - minhash signatures of word input_shingle-grams, banded (lsh), see fct_get_minhash().
+#   2 paragraphs of jaccard similarity s share a cluster with probability 1 - (1 - s^r)^b, with b = input_n_bands bands of r rows.
+#   near-duplicates are only used for boilerplate, the n-grams counted once are by exact fingerprint, see fct_get_answers_from_store().
+# this creates, in the store -
+#   paragraph.exact.npy, paragraph.cluster.npy: the exact fingerprint # + the (near-duplicate) cluster # of each paragraph (int32).
+#   exact.papers.npy, cluster.papers.npy: the number of papers with each exact fingerprint + each cluster (int32).
+# this returns the counts of paragraphs, fingerprints, clusters, and paragraphs by number of papers.
+def fct_build_fingerprints(input_path_of_store, input_minhash=False, input_n_permutations=64, input_n_bands=16, input_shingle=3, input_seed=0):
+    store = fct_load_store(input_path_of_store)
+    text_offsets = np.asarray(store['text_offsets'])
+    exact_of_fingerprint = {}
+    paragraph_exact = np.empty(text_offsets.shape[0] - 1, dtype=np.int32)
+    normalized_of_exact = [] # 1 text per fingerprint, for minhash
+    for row in range(paragraph_exact.shape[0]):
+        normalized = ' '.join(bytes(store['text'][text_offsets[row]:text_offsets[row + 1]]).decode('utf-8').lower().split())
+        fingerprint = hashlib.sha1(normalized.encode('utf-8')).digest()
+        paragraph_exact[row] = exact = exact_of_fingerprint.setdefault(fingerprint, len(exact_of_fingerprint))
+        if exact == len(normalized_of_exact):
+            normalized_of_exact.append(normalized if input_minhash else None)
+    ### near-duplicate clusters of fingerprints ###
+    cluster_of_exact = np.arange(len(exact_of_fingerprint), dtype=np.int32)
+    if input_minhash:
+        if input_n_permutations % input_n_bands:
+            raise ValueError(f'input_n_permutations must be a multiple of input_n_bands, not {input_n_permutations} and {input_n_bands}')
+        random_state = np.random.RandomState(input_seed)
+        permutations = random_state.randint(1, 2 ** 32, size=(2, input_n_permutations, 1), dtype=np.uint64)
+        signatures = np.array([fct_get_minhash(normalized, permutations, input_shingle) for normalized in normalized_of_exact], dtype=np.uint64).reshape(-1, input_n_permutations)
+        parent = list(range(len(normalized_of_exact)))
+        def fct_find(exact):
+            while parent[exact] != exact:
+                parent[exact] = parent[parent[exact]]
+                exact = parent[exact]
+            return exact
+        for band in np.split(signatures, input_n_bands, axis=1):
+            first_of_band = {}
+            for exact, key in enumerate(map(bytes, np.ascontiguousarray(band))):
+                first = first_of_band.setdefault(key, exact)
+                if first != exact:
+                    parent[fct_find(exact)] = fct_find(first)
+        cluster_of_exact = np.unique([fct_find(exact) for exact in range(len(parent))], return_inverse=True)[1].reshape(-1).astype(np.int32)
+    paragraph_cluster = cluster_of_exact[paragraph_exact]
+    ### number of papers by fingerprint + cluster ###
+    paragraph_paper = np.asarray(store['paragraph_paper'], dtype=np.int64)
+    def fct_count_papers(paragraph_group, n_groups):
+        pairs = np.unique(paragraph_group.astype(np.int64) * len(store['paper_id']) + paragraph_paper)
+        return np.bincount(pairs // len(store['paper_id']), minlength=n_groups).astype(np.int32)
+    exact_papers = fct_count_papers(paragraph_exact, len(exact_of_fingerprint))
+    cluster_papers = fct_count_papers(paragraph_cluster, int(cluster_of_exact.max()) + 1 if cluster_of_exact.shape[0] else 0)
+    for name, column in (('paragraph.exact', paragraph_exact), ('paragraph.cluster', paragraph_cluster), ('exact.papers', exact_papers), ('cluster.papers', cluster_papers)):
+        np.save(os.path.join(input_path_of_store, name + '.npy'), column)
+    counts = {
+        "paragraphs": int(paragraph_exact.shape[0]),
+        "fingerprints": len(exact_of_fingerprint),
+        "clusters": int(cluster_papers.shape[0]),
+        "paragraphs_by_papers": {str(papers): int(count) for papers, count in zip(*np.unique(cluster_papers[paragraph_cluster], return_counts=True))}
+    }
+    print('*** fct_build_fingerprints ' + json.dumps(counts) + ' ***')
+    print('*** fct_build_fingerprints ' + str(datetime.now()) + ' ***')
+    return counts
+# fct_build_fingerprints(input_path_of_store='/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/store', input_minhash=True) # test
+
+### function 7.7: fct_get_minhash() ###
+# the minhash signature of a (normalized) paragraph: by permutation, the min of (a * h + b) mod p over the crc32 h of its word shingles.
+# input_permutations: a and b, shape (2, permutations, 1). paragraphs shorter than input_shingle words are 1 shingle.
+def fct_get_minhash(input_normalized, input_permutations, input_shingle=3):
+    words = input_normalized.split()
+    shingles = {' '.join(words[index:index + input_shingle]) for index in range(max(len(words) - input_shingle + 1, 1))}
+    hashes = np.array([zlib.crc32(shingle.encode('utf-8')) for shingle in shingles], dtype=np.uint64)
+    return ((input_permutations[0] * hashes + input_permutations[1]) % np.uint64(4294967311)).min(axis=1) # p: 1st prime > 2^32
+
+### function 7.8: fct_get_ngrams_of_paragraph() ###
+# the n-gram counts of a paragraph of the worker's store, same analyzer as fct_get_matches_from_papers().
+# the counts of a paragraph found in more than 1 paper are kept by exact fingerprint, i.e. counted once per worker, then shared by every paper with it.
+# at most ngrams_of_worker_size paragraphs are kept, the least recently used out first, so a worker's memory stays bounded, see fct_run_in_budget().
+def fct_get_ngrams_of_paragraph(input_exact, input_paragraph):
+    ngrams = ngrams_of_worker.get(input_exact)
+    if ngrams is not None:
+        ngrams_of_worker.move_to_end(input_exact)
+        return ngrams
+    ngrams = Counter(fct_get_ngrams_of_text(input_paragraph))
+    if store_of_worker['exact_papers'][input_exact] > 1:
+        ngrams_of_worker[input_exact] = ngrams
+        if len(ngrams_of_worker) > ngrams_of_worker_size:
+            ngrams_of_worker.popitem(last=False)
+    return ngrams
+ngrams_of_worker, ngrams_of_worker_size = OrderedDict(), 8192 # e.g. ~100 n-grams a paragraph: ~100 mb
+
+### function 8: fct_load_answers_index() ###
+# the index of a main answer file, see fct_open_answers_file(), cached until the answer file changes.
+# for a main answer file without an index, e.g. from an older run, the index is built in 1 pass over the file, and written.
+# this returns { paper_id: [(start, end), ...] }, in file order.
+def fct_load_answers_index(input_answer_file):
+    stat = os.stat(input_answer_file)
+    return fct_load_answers_index_of_version(input_answer_file, stat.st_size, stat.st_mtime_ns)
+
+@functools.lru_cache(maxsize=64)
+def fct_load_answers_index_of_version(input_answer_file, input_size, input_mtime_ns):
+    index_file = fct_get_path_of_answers_index(input_answer_file)
+    if os.path.exists(index_file) and os.stat(index_file).st_mtime_ns >= input_mtime_ns:
+        with open(index_file) as open_file:
+            index = json.load(open_file)
+    else:
+        index = fct_build_answers_index(input_answer_file)
+    answers_index = {}
+    for paper_id, start, end in zip(index['paper_id'], index['start'], index['end']):
+        answers_index.setdefault(paper_id, []).append((start, end))
+    return answers_index
+
+### function 8.1: fct_build_answers_index() ###
+# index an existing main answer file, decoding 1 record at a time.
+# this writes and returns the index, see fct_open_answers_file().
+def fct_build_answers_index(input_answer_file):
+    index = {"paper_id": [], "start": [], "end": []}
+    with open(input_answer_file, 'rb') as open_file:
+        answer_file = open_file.read().decode('utf-8')
+    position = json_whitespace.match(answer_file, answer_file.index('[') + 1).end()
+    character, offset = 0, 0 # character position -> byte offset, for non-ascii files
+    while answer_file[position] != ']':
+        answer, end = json_decoder.raw_decode(answer_file, position)
+        offset += len(answer_file[character:position].encode('utf-8'))
+        index['paper_id'].append(answer.get('paper_id'))
+        index['start'].append(offset)
+        offset += len(answer_file[position:end].encode('utf-8'))
+        index['end'].append(offset)
+        character = end
+        position = json_whitespace.match(answer_file, end).end()
+        if answer_file[position] == ',':
+            position = json_whitespace.match(answer_file, position + 1).end()
+    with open(fct_get_path_of_answers_index(input_answer_file), 'w') as open_file:
+        json.dump(index, open_file)
+    return index
+
+### function 8.2: fct_get_answers() ###
+# the answers of a paper to a task, from the main answer files of the given subsets: 1 seek + 1 read per answer, v. parsing whole files.
+# this returns the answers, i.e. [] if the paper wasn't answered, or 1 per subset the paper is in.
+def fct_get_answers(input_paper_id, input_task, input_dirs=subsets_of_papers, input_path_of_working=path_of_working):
+    answers = []
+    for input_dir in input_dirs:
+        answer_file = f'{input_path_of_working}/answers.task.{input_task}.{input_dir}.json'
+        if not os.path.exists(answer_file):
+            continue
+        offsets = fct_load_answers_index(answer_file).get(input_paper_id, [])
+        if offsets:
+            with open(answer_file, 'rb') as open_file:
+                for start, end in offsets:
+                    open_file.seek(start)
+                    answers.append(json.loads(open_file.read(end - start)))
+    return answers
+# print(fct_get_answers('3c70c99afc7a38df3c4807857856ea258d378429', 0)) # test
+
+### function 8.3: fct_iter_answers() ###
+# the answers to a task of all the papers of a subset, 1 record at a time, in file order.
+# this yields the answers.
+def fct_iter_answers(input_task, input_dir, input_path_of_working=path_of_working):
+    answer_file = f'{input_path_of_working}/answers.task.{input_task}.{input_dir}.json'
+    offsets = sorted(offset for offsets in fct_load_answers_index(answer_file).values() for offset in offsets)
+    with open(answer_file, 'rb') as open_file:
+        for start, end in offsets:
+            open_file.seek(start)
+            yield json.loads(open_file.read(end - start))
+# for answer in fct_iter_answers(3, 'comm_use_subset'): print(answer['paper_id']) # test
+
+### function 9: fct_create_synthetic_papers() ###
+# write a synthetic corpus in the CORD-19 storage structure and schema, e.g. to benchmark the pipeline without the real dataset.
+# the words are drawn from the QUESTIONS + filler, so that the n-grams of papers and QUESTIONS overlap like in the real papers.
+# paragraph lengths (words) are log-normal, input_words_of_paragraph = (mu, sigma) of log(words), v. uniform, since real paragraphs are skewed.
+# the # of abstract and body_text paragraphs are uniform in the given (min, max) ranges.
+# this creates - e.g. <input_path_of_papers>/2020-03-13/biorxiv_medrxiv/biorxiv_medrxiv/<sha1>.json - and returns the paths to the papers.
+def fct_create_synthetic_papers(input_path_of_papers, input_n_papers=100, input_dirs=subsets_of_papers, input_abstract_paragraphs=(0, 3), input_body_paragraphs=(5, 40), input_words_of_paragraph=(4.0, 0.7), input_seed=0):
+    rnd = random.Random(input_seed)
+    words = sorted({word for question in questions + [question for questions_of_task in questions_detail + questions_specific for question in questions_of_task] for word in re.findall('[a-z0-9-]+', question.lower())})
+    words += ['the', 'of', 'and', 'in', 'to', 'a', 'was', 'were', 'with', 'for', 'patients', 'cells', 'results', 'study', 'data', 'rate', 'model', 'samples', 'sars-cov-2', 'wuhan', 'china']
+    def fct_get_paragraph(section):
+        return {"text": ' '.join(rnd.choice(words) for _ in range(max(1, int(rnd.lognormvariate(*input_words_of_paragraph))))), "cite_spans": [], "ref_spans": [], "section": section}
+    paths_to_papers = []
+    for index in range(input_n_papers):
+        input_dir = input_dirs[index % len(input_dirs)]
+        paper_id = hashlib.sha1(f'{input_seed}.{index}'.encode('ascii')).hexdigest()
+        paper_json = {
+            "paper_id": paper_id,
+            "metadata": {"title": ' '.join(rnd.choice(words) for _ in range(8)), "authors": []},
+            "abstract": [fct_get_paragraph('Abstract') for _ in range(rnd.randint(*input_abstract_paragraphs))],
+            "body_text": [fct_get_paragraph('Introduction') for _ in range(rnd.randint(*input_body_paragraphs))],
+            "bib_entries": {f'BIBREF{bib}': {"ref_id": f'b{bib}', "title": ' '.join(rnd.choice(words) for _ in range(10)), "authors": [], "year": 2019, "venue": "", "volume": "", "issn": "", "pages": "", "other_ids": {}} for bib in range(rnd.randint(0, 40))},
+            "ref_entries": {},
+            "back_matter": []
+        }
+        path_to_paper = os.path.join(input_path_of_papers, '2020-03-13', input_dir, input_dir, paper_id + '.json')
+        os.makedirs(os.path.dirname(path_to_paper), exist_ok=True)
+        with open(path_to_paper, 'w') as open_file:
+            json.dump(paper_json, open_file, indent=4)
+        paths_to_papers.append(path_to_paper)
+    return paths_to_papers
+# fct_create_synthetic_papers(input_path_of_papers='/tmp/CORD-19-synthetic', input_n_papers=1000) # test
+
+### function 9.1: fct_run_benchmarks() ###
+# time the stages of the pipeline on a synthetic corpus, see fct_create_synthetic_papers(), and compare with the stored baselines.
+# each benchmark is the best of input_repeat runs (s), in a fresh working dir, with the stage's prints silenced.
+#   create_dict_of_papers: fct_create_dict_of_papers() of the corpus.
+#   get_matches_from_papers: fct_get_matches_from_papers() of task 0's QUESTION, for input_n_sample papers.
+#   get_answer_from_matches: fct_get_answer_from_matches() of task 0, for input_n_sample papers.
+#   write_answers: fct_write_answers() of task 0, for all the papers of 1 subset.
+#   merge_answers: fct_merge_answers() of task 0, for that subset.
+#   cold_start_query: the query stage of the cli, for 1 paper, in a new python process, i.e. incl. the imports of this module + the stage.
+# a benchmark regresses if it takes more than threshold x its baseline, and baselines only apply to the same corpus config + machine.
+# baselines are local, v. in the repo: input_save=True stores the results as the new baselines of this machine, e.g. before an optimization or a change of any stage.
+# this returns { "benchmark": { "seconds": ..., "baseline": ..., "ratio": ..., "regression": True/False }, ... }.
+def fct_run_benchmarks(input_n_papers=200, input_n_sample=20, input_repeat=3, input_seed=0, input_path_of_baselines=path_of_working + '/benchmarks.json', input_save=False):
+    config = {"n_papers": input_n_papers, "n_sample": input_n_sample, "seed": input_seed}
+    path_of_benchmark = tempfile.mkdtemp(prefix='cord19-benchmark-')
+    try:
+        path_of_papers = os.path.join(path_of_benchmark, 'CORD-19-research-challenge')
+        paths_to_papers = fct_create_synthetic_papers(path_of_papers, input_n_papers, input_seed=input_seed)
+        sample = paths_to_papers[:input_n_sample]
+        input_dir = subsets_of_papers[0]
+        def fct_get_path_of_working(run):
+            return os.path.join(path_of_benchmark, f'working.{run}')
+        benchmarks = {
+            "create_dict_of_papers": lambda run: fct_create_dict_of_papers(path_of_papers, 'json', input_path_of_working=fct_get_path_of_working(run)),
+            "get_matches_from_papers": lambda run: [fct_get_matches_from_papers(item, questions[0], 0.1, 0.9, 4) for item in sample],
+            "get_answer_from_matches": lambda run: [fct_get_answer_from_matches(item, 0.1, 0.9, 0, 4) for item in sample],
+            "write_answers": lambda run: fct_write_answers(f'{fct_get_path_of_working(run)}/papers.{input_dir}.json', 0.1, 0.9, 0, 4, input_path_of_working=fct_get_path_of_working(run)),
+            "merge_answers": lambda run: fct_merge_answers(0, input_dir, fct_get_path_of_working(run) + path_of_papers, 'json', input_path_of_working=fct_get_path_of_working(run)),
+            "cold_start_query": lambda run: subprocess.run([sys.executable, os.path.abspath(__file__), 'query', '--paper', sample[0], '--question', questions[0], '--working', fct_get_path_of_working(run), '--no-telemetry'], stdout=subprocess.DEVNULL, check=True)
+        }
+        seconds = {name: float('inf') for name in benchmarks}
+        for run in range(input_repeat):
+            for name, benchmark in benchmarks.items(): # in pipeline order, so each stage has its input
+                with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                    start = time.perf_counter()
+                    benchmark(run)
+                    seconds[name] = min(seconds[name], time.perf_counter() - start)
+    finally:
+        shutil.rmtree(path_of_benchmark, ignore_errors=True)
+    ### compare ###
+    baselines = {"threshold": 1.5, "config": None, "seconds": {}}
+    if os.path.exists(input_path_of_baselines):
+        with open(input_path_of_baselines) as open_file:
+            baselines = json.load(open_file)
+    machine = {"python": platform.python_version(), "processor": platform.machine(), "cpu_count": os.cpu_count()}
+    baseline_seconds = baselines['seconds'] if (baselines['config'] == config) and (baselines.get('machine') == machine) else {}
+    results = {}
+    for name in benchmarks:
+        baseline = baseline_seconds.get(name)
+        results[name] = {
+            "seconds": round(seconds[name], 4),
+            "baseline": baseline,
+            "ratio": round(seconds[name] / baseline, 2) if baseline else None,
+            "regression": bool(baseline) and seconds[name] > baselines['threshold'] * baseline
+        }
+        print(f"*** fct_run_benchmarks {name}: {results[name]['seconds']} s, baseline {baseline} s, ratio {results[name]['ratio']}{' REGRESSION' if results[name]['regression'] else ''} ***")
+    if not baseline_seconds and not input_save:
+        print(f'*** fct_run_benchmarks no baselines of this config + machine in {input_path_of_baselines}, see input_save=True ***')
+    if input_save:
+        with open(input_path_of_baselines, 'w') as open_file:
+            json.dump({"threshold": baselines['threshold'], "config": config, "machine": machine, "date": str(datetime.now()), "seconds": {name: results[name]['seconds'] for name in benchmarks}}, open_file, indent=2, separators=(',', ': '))
+    print('*** fct_run_benchmarks ' + str(datetime.now()) + ' ***')
+    return results
+# fct_run_benchmarks(input_n_papers=200, input_repeat=3) # test
+# fct_run_benchmarks(input_n_papers=200, input_repeat=3, input_save=True) # test: store new baselines
+
+### function 10: fct_serve() ###
+# a local http service over a warm index, for ad-hoc QUESTIONS v. editing the QUESTION lists + a batch rerun.
+# the index, see fct_build_index(), and its ann index, see fct_build_ann(), if any, are loaded once. the scoring runs in a pool of worker processes,
+# each with the index memory-mapped once, see fct_init_index_of_worker(). the event loop only parses requests + awaits the workers, so concurrent queries overlap.
+# GET with a query string, or POST with a json body, e.g. {"question": ["..."], "top": 4} -
+#   /matches?question=...&task=N&paper_id=...&top=4&min_df=0.1&max_df=0.9: the top matches of each QUESTION in each paper, as fct_get_matches_from_papers().
+#       QUESTIONS by question, and/or by task, see fct_get_questions_of_task(). all papers if no paper_id.
+#   /corpus?question=...&task=N&top=10&n_candidates=1000&n_probe=32: the nearest paragraphs to each QUESTION across the index, see fct_query_ann(). exact if no ann index.
+#   /health: papers, paragraphs, workers, ann.
+# this returns json, e.g. { "matches": { paper_id: { QUESTION: [[distance, text], ...] } } }, or { "error": ... } with status -
+#   400 for a bad request or parameter, 404 for an unknown path, 413 for a body over input_max_body bytes, see ClientError, else 500.
+def fct_serve(input_path_of_index, input_host='127.0.0.1', input_port=8080, input_workers=None, input_chunksize=256, input_max_body=2 ** 20):
+    asyncio.run(fct_run_service(input_path_of_index, input_host, input_port, input_workers, input_chunksize, input_max_body))
+# fct_serve(input_path_of_index='/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/index.all', input_port=8080) # test
+# curl 'http://127.0.0.1:8080/corpus?question=WHAT+IS+KNOWN+ABOUT+ASYMPTOMATIC+TRANSMISSION+IN+CHILDREN%3F&top=10' # test
+
+### function 10.1: fct_run_service() ###
+# the event loop of fct_serve(). the workers are forked after the index is loaded, so they share it, or load it in fct_init_index_of_worker().
+async def fct_run_service(input_path_of_index, input_host='127.0.0.1', input_port=8080, input_workers=None, input_chunksize=256, input_max_body=2 ** 20):
+    fct_init_index_of_worker(input_path_of_index)
+    service = {
+        "index": index_of_worker,
+        "ann": ann_of_worker,
+        "workers": input_workers or os.cpu_count(),
+        "chunksize": input_chunksize,
+        "max_body": input_max_body
+    }
+    with concurrent.futures.ProcessPoolExecutor(max_workers=service['workers'], initializer=fct_init_index_of_worker, initargs=(input_path_of_index,)) as pool:
+        service['pool'] = pool
+        server = await asyncio.start_server(functools.partial(fct_handle_request, input_service=service), input_host, input_port)
+        print(f'*** fct_serve http://{input_host}:{server.sockets[0].getsockname()[1]} {len(service["index"]["paper_id"])} papers ' + str(datetime.now()) + ' ***')
+        stopped = asyncio.get_running_loop().create_future()
+        with contextlib.suppress(NotImplementedError): # e.g. windows
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stopped.set_result, None) # + shut the workers down, v. orphans
+        async with server:
+            await stopped
+
+### function 10.2: fct_handle_request() ###
+# 1 http/1.1 request per connection: parse, answer, close.
+# the request is validated as it is parsed, and its errors raise ClientError. any other error is a bug or a broken service, i.e. a 500.
+# the body is only read up to input_service['max_body'] bytes, v. any content-length, so a client can't make the service buffer gigabytes.
+async def fct_handle_request(input_reader, input_writer, input_service):
+    try:
+        try:
+            request_line = (await input_reader.readline()).decode('latin-1').split()
+            if len(request_line) != 3:
+                raise ClientError('bad request line, e.g. GET /health HTTP/1.1')
+            method, target, version = request_line
+            headers = {}
+            while True:
+                line = await input_reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            content_length = headers.get('content-length', '0')
+            if not content_length.isdigit():
+                raise ClientError(f'bad content-length {content_length[:20]}')
+            if int(content_length) > input_service['max_body']:
+                raise ClientError(f'body over {input_service["max_body"]} bytes', 413)
+            try:
+                body = await input_reader.readexactly(int(content_length))
+            except asyncio.IncompleteReadError as error:
+                raise ClientError(f'body of {len(error.partial)} bytes, v. content-length {content_length}') from error
+            url = urllib.parse.urlsplit(target)
+            parameters = urllib.parse.parse_qs(url.query)
+            if body:
+                try:
+                    body = json.loads(body)
+                except ValueError as error: # incl. not utf-8
+                    raise ClientError(f'bad json body: {error}') from error
+                if not isinstance(body, dict):
+                    raise ClientError('the json body must be an object, e.g. {"question": ["..."], "top": 4}')
+                parameters.update({name: value if isinstance(value, list) else [value] for name, value in body.items()})
+            status, response = 200, await fct_answer_request(input_service, url.path, parameters)
+        except ClientError as error:
+            status, response = error.status, {"error": str(error)}
+        except Exception as error: # e.g. a bug or a broken worker pool: still a response, v. a client waiting on an open connection
+            status, response = 500, {"error": f'{type(error).__name__}: {error}'}
+        payload = json.dumps(response).encode('utf-8')
+        input_writer.write(f'HTTP/1.1 {status} {http_reasons[status]}\r\nContent-Type: application/json\r\nContent-Length: {len(payload)}\r\nConnection: close\r\n\r\n'.encode('latin-1') + payload)
+        await input_writer.drain()
+    finally:
+        input_writer.close()
+http_reasons = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 413: 'Content Too Large', 500: 'Internal Server Error'}
+
+### function 10.3: fct_answer_request() ###
+# the response of a parsed request, from the workers of the service. parameters are lists, as urllib.parse.parse_qs().
+async def fct_answer_request(input_service, input_path, input_parameters):
+    index = input_service['index']
+    if input_path == '/health':
+        return {"papers": len(index['paper_id']), "paragraphs": int(index['features'].shape[0]), "workers": input_service['workers'], "ann": input_service['ann'] is not None}
+    if input_path not in ('/matches', '/corpus'):
+        raise ClientError(f'no {input_path}, see fct_serve()', 404)
+    tasks = fct_get_parameters_of_request(input_parameters, 'task', int, [], 0, len(questions) - 1)
+    input_questions = list(dict.fromkeys([str(question) for question in input_parameters.get('question', [])] + [question for task in tasks for question in fct_get_questions_of_task(task)]))
+    if not input_questions:
+        raise ClientError('question or task required')
+    loop = asyncio.get_running_loop()
+    if input_path == '/matches':
+        paper_ids = [str(paper_id) for paper_id in input_parameters.get('paper_id', [])] or index['paper_id']
+        unknown = [paper_id for paper_id in paper_ids if paper_id not in index['position']]
+        if unknown:
+            raise ClientError(f'unknown paper_id {unknown[:10]}')
+        top = fct_get_parameters_of_request(input_parameters, 'top', int, [4], 1)[0]
+        min_df, max_df = fct_get_parameters_of_request(input_parameters, 'min_df', float, [0.1], 0.0, 1.0)[0], fct_get_parameters_of_request(input_parameters, 'max_df', float, [0.9], 0.0, 1.0)[0]
+        chunks = [paper_ids[start:start + input_service['chunksize']] for start in range(0, len(paper_ids), input_service['chunksize'])]
+        matches = {}
+        for matches_of_chunk in await asyncio.gather(*(loop.run_in_executor(input_service['pool'], fct_get_matches_of_worker, chunk, input_questions, min_df, max_df, top) for chunk in chunks)):
+            matches.update(matches_of_chunk)
+    else:
+        top, n_candidates, n_probe = (fct_get_parameters_of_request(input_parameters, name, int, [default], 1)[0] for name, default in (('top', 10), ('n_candidates', 1000), ('n_probe', 32)))
+        matches = dict(zip(input_questions, await asyncio.gather(*(loop.run_in_executor(input_service['pool'], fct_query_of_worker, question, top, n_candidates, n_probe) for question in input_questions))))
+    return {"matches": matches}
+
+### function 10.4: fct_get_matches_of_worker() ###
+# the top matches by QUESTION of some papers of the worker's index, see fct_get_matches_from_index().
+def fct_get_matches_of_worker(input_paper_ids, input_questions, input_min_df=0.1, input_max_df=0.9, input_top=4):
+    matches = {}
+    for paper_id in input_paper_ids:
+        paper_context = fct_add_matches_to_context(fct_create_paper_context_from_index(index_of_worker, paper_id, input_min_df, input_max_df), input_questions, input_top)
+        matches[paper_id] = {question: [[float(distance), text] for distance, text in paper_context['matches'][question]] for question in input_questions}
+    return matches
+
+### function 10.5: fct_query_of_worker() ###
+# the nearest paragraphs to a QUESTION across the worker's index, see fct_query_ann(), or an exact scan without an ann index.
+def fct_query_of_worker(input_question, input_top=10, input_n_candidates=1000, input_n_probe=32):
+    if ann_of_worker is not None:
+        matches = fct_query_ann(index_of_worker, ann_of_worker, input_question, input_top, input_n_candidates, input_n_probe)
+    else:
+        vector, question_norm = fct_get_vector_of_question(index_of_worker, input_question)
+        matches = fct_rank_rows(index_of_worker, index_of_worker['norms'], np.arange(index_of_worker['features'].shape[0]), vector, question_norm, input_top)
+    return [[float(distance), paper_id, subset, text] for distance, paper_id, subset, text in matches]
+
+### function 10.6: fct_init_index_of_worker() ###
+# load the index + ann index once per process, unless inherited from the service, see fct_run_service().
+def fct_init_index_of_worker(input_path_of_index):
+    global index_of_worker, ann_of_worker, path_of_worker_index
+    if path_of_worker_index != input_path_of_index:
+        with contextlib.redirect_stdout(io.StringIO()):
+            index_of_worker = fct_load_index(input_path_of_index)
+        ann_of_worker = fct_load_ann(input_path_of_index) if os.path.exists(os.path.join(input_path_of_index, 'ann', 'cells.npy')) else None # v. an ann index without cells, to rebuild
+        if ann_of_worker is None: # |x|^2 by row, for exact scans
+            index_of_worker['norms'] = np.asarray(index_of_worker['features'].multiply(index_of_worker['features']).sum(axis=1), dtype=np.float64).ravel()
+        path_of_worker_index = input_path_of_index
+index_of_worker, ann_of_worker, path_of_worker_index = None, None, None
+
+### function 10.7: ClientError ###
+# an error of the request, v. of the service: its status, 400 by default, and message are sent to the client, see fct_handle_request().
+class ClientError(Exception):
+    def __init__(self, input_message, input_status=400):
+        super().__init__(input_message)
+        self.status = input_status
+
+### function 10.8: fct_get_parameters_of_request() ###
+# the values of a parameter of a request, as input_type, or input_default if not given.
+# a value that isn't of input_type, or is out of [input_min, input_max], raises ClientError, v. a TypeError or ValueError in a worker.
+def fct_get_parameters_of_request(input_parameters, input_name, input_type, input_default, input_min=None, input_max=None):
+    if not input_parameters.get(input_name): # v. e.g. "top": [] in a json body
+        return input_default
+    values = []
+    for value in input_parameters[input_name]:
+        try:
+            if isinstance(value, bool) or (input_type is int and isinstance(value, float)): # e.g. true or 4.5 in a json body
+                raise TypeError
+            value = input_type(value)
+        except (TypeError, ValueError) as error:
+            raise ClientError(f'{input_name} must be {input_type.__name__}, not {str(value)[:20]}') from error
+        if (value != value) or (input_min is not None and value < input_min) or (input_max is not None and value > input_max): # value != value: nan
+            raise ClientError(f'{input_name} must be in [{input_min}, {input_max if input_max is not None else ""}], not {value}')
+        values.append(value)
+    return values
+
+### function 11: fct_main() ###
+# the command-line interface: run chosen stages, in the order given, for chosen subsets + tasks, with paths as arguments.
+# importing this module runs nothing, e.g. for tests or fct_serve(), and only imports numpy + scipy.sparse. sklearn + psutil are only imported by the stages that need them.
+# stages -
+#   papers: fct_create_dict_of_papers() over --papers, i.e. papers.<subset>.json in --working.
+#   answers: fct_schedule_answers() over papers.<subset>.json, i.e. answers.task.N.<subset>.json in --working.
+#   merge: fct_merge_answers_all_tasks() of per-paper answer files in --answers, or with --backend log, fct_merge_answers_from_log().
+#   store, fingerprints, store-answers: fct_build_store(), fct_build_fingerprints(), fct_write_answers_from_store() in --store.
+#   index, ann, serve: fct_build_index(), fct_build_ann(), fct_serve() over --index.
+#   query: the top matches of --question (or --tasks) in 1 paper, --paper, as json on stdout.
+#   sweep: fct_sweep_parameters() of every --min-dfs x --max-dfs x --tops over papers.<subset>.json, as json on stdout.
+#   benchmarks, telemetry: fct_run_benchmarks(), fct_summarize_telemetry().
+# e.g. $ python3 kaggle.py papers answers --papers /mnt/g/Users/pie/Downloads/nih/covid19/CORD-19-research-challenge
+#      $ python3 kaggle.py papers answers --papers /data/CORD-19-research-challenge --working /data/working --backend log --shard 0/4 # on each of 4 nodes, 0/4 ... 3/4
+#      $ python3 kaggle.py merge --backend log --logs /mnt/node0/working/answers.log /mnt/node1/working/answers.log ... # then on 1
+#      $ python3 kaggle.py store store-answers --subsets biorxiv_medrxiv --tasks 0 3
+#      $ python3 kaggle.py sweep --subsets biorxiv_medrxiv --min-dfs 0.0 0.05 0.1 0.2 0.3 --max-dfs 0.5 0.9 --tops 4 8
+#      $ python3 kaggle.py query --paper 28b107243576723248ad4053261000311a22f134.json --question 'WHAT IS KNOWN ABOUT ASYMPTOMATIC TRANSMISSION IN CHILDREN?'
+def fct_main(input_arguments=None):
+    parser = argparse.ArgumentParser(description='find closest answers to key questions from a corpus of scientific papers (cord-19).')
+    stages = ['papers', 'answers', 'merge', 'store', 'fingerprints', 'store-answers', 'index', 'ann', 'serve', 'query', 'sweep', 'benchmarks', 'telemetry']
+    parser.add_argument('stages', nargs='*', metavar='stage', help=f'stages to run, in order, from {", ".join(stages)} (default: papers answers)')
+    parser.add_argument('--papers', help='root dir of the papers, e.g. CORD-19-research-challenge (papers)')
+    parser.add_argument('--working', default=path_of_working, help='working dir of papers.<subset>.json + answer files (default: the dir of this file)')
+    parser.add_argument('--answers', help='dir of per-paper answer files (merge, default: --working)')
+    parser.add_argument('--backend', default='files', choices=['files', 'log'], help='per-paper answer files or the answer log in --working/answers.log (answers, merge)')
+    parser.add_argument('--shards', type=int, default=4, help='segments written at once (answers, log)')
+    parser.add_argument('--no-compress', action='store_true', help='uncompressed answer log segments (answers, log)')
+    parser.add_argument('--shard', help='only the papers of shard i of n, as i/n, e.g. 0/4 on the 1st of 4 nodes (answers, log)')
+    parser.add_argument('--logs', nargs='+', help='answer logs to merge, e.g. 1 per shard (merge, log, default: --working/answers.log)')
+    parser.add_argument('--store', help='paragraph store dir (default: --working/store)')
+    parser.add_argument('--index', help='index dir (default: --working/index.all)')
+    parser.add_argument('--subsets', nargs='+', default=list(subsets_of_papers), help='subsets of papers (default: all)')
+    parser.add_argument('--tasks', nargs='+', type=int, default=list(range(len(questions))), help='task #s (default: all)')
+    parser.add_argument('--min-df', type=float, default=0.1)
+    parser.add_argument('--max-df', type=float, default=0.9)
+    parser.add_argument('--top', type=int, default=4)
+    parser.add_argument('--min-dfs', nargs='+', type=float, help='min_df of each configuration (sweep, default: --min-df)')
+    parser.add_argument('--max-dfs', nargs='+', type=float, help='max_df of each configuration (sweep, default: --max-df)')
+    parser.add_argument('--tops', nargs='+', type=int, help='top of each configuration (sweep, default: --top)')
+    parser.add_argument('--features', default='count', choices=['count', 'hashing'], help='feature space, hashing: no vocabulary, approximate, not faster (default: count)')
+    parser.add_argument('--workers', type=int, help='worker processes (default: # of cpus)')
+    parser.add_argument('--memory-budget', type=int, help='max rss of all workers, in mb (answers), see fct_run_in_budget()')
+    parser.add_argument('--boilerplate', type=int, help='suppress paragraphs found in this many papers or more (store-answers)')
+    parser.add_argument('--minhash', action='store_true', help='also cluster near-duplicate paragraphs (fingerprints)')
+    parser.add_argument('--paper', help='paper file (query)')
+    parser.add_argument('--question', action='append', default=[], help='QUESTION (query), repeatable, v. --tasks')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--no-telemetry', action='store_true', help='no telemetry.jsonl in --working')
+    parser.add_argument('--save-baselines', action='store_true', help='store the results as the baselines of this machine in --working/benchmarks.json (benchmarks)')
+    arguments = parser.parse_args(input_arguments)
+    arguments.stages = arguments.stages or ['papers', 'answers'] # as the batch run
+    for stage in arguments.stages:
+        if stage not in stages:
+            parser.error(f'invalid stage {stage}, choose from {", ".join(stages)}')
+    if arguments.shard is not None:
+        if not re.fullmatch(r'\d+/\d+', arguments.shard) or not int(arguments.shard.split('/')[0]) < int(arguments.shard.split('/')[1]):
+            parser.error(f'invalid shard {arguments.shard}, e.g. 0/4')
+        if arguments.backend != 'log':
+            parser.error('--shard requires --backend log')
+        arguments.shard = tuple(int(item) for item in arguments.shard.split('/'))
+    path_of_store = arguments.store or os.path.join(arguments.working, 'store')
+    path_of_index = arguments.index or os.path.join(arguments.working, 'index.all')
+    paths_of_papers = [os.path.join(arguments.working, f'papers.{input_dir}.json') for input_dir in arguments.subsets]
+    if not arguments.no_telemetry and set(arguments.stages) & {'papers', 'answers', 'merge', 'store-answers'}:
+        ### telemetry: telemetry.jsonl in the working dir, + a live summary ###
+        fct_start_telemetry(os.path.join(arguments.working, 'telemetry.jsonl'), input_live=True)
+    for stage in arguments.stages:
+        if stage == 'papers':
+            if arguments.papers is None:
+                parser.error('papers requires --papers')
+            fct_create_dict_of_papers(arguments.papers, 'json', input_dirs=tuple(arguments.subsets), input_path_of_working=arguments.working)
+        elif stage == 'answers':
+            fct_schedule_answers(paths_of_papers, arguments.min_df, arguments.max_df, arguments.top, arguments.tasks, arguments.workers, input_path_of_working=arguments.working, input_features=arguments.features, input_memory_budget=arguments.memory_budget and arguments.memory_budget * 2 ** 20, input_backend=arguments.backend, input_shards=arguments.shards, input_compress=not arguments.no_compress, input_shard=arguments.shard)
+        elif stage == 'merge' and arguments.backend == 'log':
+            fct_merge_answers_from_log(arguments.logs or os.path.join(arguments.working, 'answers.log'), [item for item in paths_of_papers if os.path.exists(item)], arguments.tasks, tuple(arguments.subsets), input_path_of_working=arguments.working, input_parameters=fct_get_parameters_of_answers(arguments.tasks, arguments.min_df, arguments.max_df, arguments.top, arguments.features))
+        elif stage == 'merge':
+            fct_merge_answers_all_tasks(arguments.answers or arguments.working, arguments.tasks, tuple(arguments.subsets), input_path_of_working=arguments.working)
+        elif stage == 'store':
+            fct_build_store(paths_of_papers, path_of_store)
+        elif stage == 'fingerprints':
+            fct_build_fingerprints(path_of_store, input_minhash=arguments.minhash)
+        elif stage == 'store-answers':
+            fct_write_answers_from_store(path_of_store, arguments.min_df, arguments.max_df, arguments.top, arguments.tasks, arguments.subsets, arguments.workers, input_path_of_working=arguments.working, input_features=arguments.features, input_boilerplate=arguments.boilerplate)
+        elif stage == 'index':
+            fct_build_index(paths_of_papers, path_of_index)
+        elif stage == 'ann':
+            fct_build_ann(path_of_index)
+        elif stage == 'serve':
+            fct_serve(path_of_index, arguments.host, arguments.port, arguments.workers)
+        elif stage == 'query':
+            if arguments.paper is None:
+                parser.error('query requires --paper')
+            input_questions = arguments.question or [question for task in arguments.tasks for question in fct_get_questions_of_task(task)]
+            paper_context = fct_add_matches_to_context(fct_create_paper_context(arguments.paper, arguments.min_df, arguments.max_df, arguments.features), input_questions, arguments.top)
+            json.dump({"paper_id": paper_context['paper_id'], "matches": {question: [[float(distance), text] for distance, text in paper_context['matches'][question]] for question in input_questions}}, sys.stdout, indent=2)
+            print()
+        elif stage == 'sweep':
+            input_configurations = [(min_df, max_df, top) for min_df in arguments.min_dfs or [arguments.min_df] for max_df in arguments.max_dfs or [arguments.max_df] for top in arguments.tops or [arguments.top]]
+            paths_to_papers = []
+            for path_of_papers in paths_of_papers:
+                with open(path_of_papers) as open_file:
+                    paths_to_papers.extend(json.load(open_file)['paper'])
+            with contextlib.redirect_stdout(sys.stderr):
+                sweep = fct_sweep_parameters(paths_to_papers, input_configurations, arguments.tasks, arguments.workers)
+            json.dump(sweep, sys.stdout, indent=2)
+            print()
+        elif stage == 'benchmarks':
+            fct_run_benchmarks(input_path_of_baselines=os.path.join(arguments.working, 'benchmarks.json'), input_save=arguments.save_baselines)
+        elif stage == 'telemetry':
+            pprint.PrettyPrinter().pprint(fct_summarize_telemetry(os.path.join(arguments.working, 'telemetry.jsonl')))
+
+if __name__ == '__main__':
+    fct_main()
 
 ### conclusion ###
 # see files at https://github.com/gisblog/nih-covid19.
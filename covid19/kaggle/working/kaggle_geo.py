@@ -0,0 +1,434 @@
+'''
+###
+# problem statement - geoparse and geocode extracted nlp answers
+###
+
+goal:
+visualize extracted nlp answers
+
+steps:
+#. geoparse.
+#. geocode.
+#. map.
+
+    +-----------+
+    |lorem ipsum|    +--------+
+    |New York   +--->+New York|
+    +-----------+    +---+----+
+                         |
+                         v
+      XXXXXX        +----+----+
+     XX    XX<------+ 40.7° n |
+     XX    XX       | 74.0° w |
+      XXXXXX        +---------+
+
+dataset used:
+geoparsing data (CC BY 4.0) from https://www.geonames.org/, geocoding data (ODbL) from https://www.openstreetmap.org/, and extracted answers from the covid-19 open research dataset (cord-19) initially released by the white house and its coalition of leading research groups that comprised of 13,202 scientific papers broken down into 4 subsets by source type -
+biorxiv_medrxiv, comm_use_subset, noncomm_use_subset and pmc_custom_license.
+
+$ python3 /mnt/g/Users/pie/Downloads/nih/covid19/kaggle_geo.py geoparse geocode --task 3
+$ python3 /mnt/g/Users/pie/Downloads/nih/covid19/kaggle_geo.py --help
+$ python3 -m trace --trace --ignore-dir=$(python -c 'import sys ; print(":".join(sys.path)[1:])') /mnt/g/Users/pie/Downloads/nih/covid19/kaggle_geo.py
+'''
+
+### from packages, import required modules ###
+# heavy packages - numpy, geopandas + matplotlib (map), geopy (remote geocoding only) - are imported by the stages that need them, so that importing this module does no work, see fct_main().
+from datetime import datetime # timestamps
+import os # misc os interfaces
+import json # json encoder + decoder
+import argparse # command-line interface, see fct_main()
+import re # regex
+import functools # higher-order functions, e.g. partial
+import io # in-memory streams, e.g. a downloaded zip
+from collections import Counter # dict subclass for counting hashable obj
+import concurrent.futures # asynchronously execute callables with threads or processes
+
+# import numpy as np # linear algebra - [arrays] and [[matrices]] + math functions()
+# import pandas as pd # data processing, csv file i/o (e.g. pd.read_csv)
+# import matplotlib.pyplot as pp # plotting lib.interactive plots
+# %matplotlib inline # sets the backend to inline so output is displayed inline within kaggle/jupyter notebook etc
+# %matplotlib notebook # sets the backend to nbagg for interactivity
+# import geopandas as gpd # to allow spatial operations on geom types
+# from urllib import request # for opening, reading and parsing urls
+# from geotext import GeoText # to extract places from text, see fct_load_gazetteer()
+# from geopy.geocoders import Nominatim # to geocode using osm's nominatim geocoder
+# from geopy.exc import GeocoderTimedOut # to abort call if no response is received within the specified timeout
+# from shapely.geometry import Point, Polygon # to manipulate and analyze planar geom obj, convert to POINT(), etc
+# import descartes # to use geom obj as matplotlib paths and patches
+
+### answers: main answer files of kaggle.py, answers.task.N.<subset>.json ###
+path_of_answers = 'https://raw.githubusercontent.com/gisblog/nih-covid19/master/covid19/kaggle/working' # or a local dir, see fct_main() --answers
+subsets_of_papers = ('biorxiv_medrxiv', 'comm_use_subset', 'noncomm_use_subset', 'pmc_custom_license')
+
+### geonames: https://download.geonames.org/export/dump/ - cities15000.zip (cities15000.txt) + countryInfo.txt, see fct_download_geonames() ###
+url_of_geonames = 'https://download.geonames.org/export/dump/'
+path_of_geonames = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'geonames') # see fct_main() --geonames
+path_of_countries = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Countries_WGS84', 'Countries_WGS84.shp') # basemap, e.g. /mnt/c/data/polygon/Countries_WGS84/Countries_WGS84.shp, see fct_main() --countries
+# capitalized english words that are also geonames cities, e.g. false hits of GeoText in cities.answers.task.3.*.json.
+# only words whose english sense is the usual one in the answers, v. names of known places, e.g. Florence or Cork, which are kept.
+# the default of --stop-words, see fct_load_stop_words(), e.g. a list from fct_derive_stop_words(), reviewed.
+stop_words_of_places = ('Of', 'Most', 'University', 'March', 'May', 'Central', 'Eagle', 'Green', 'Along', 'Mobile', 'Male', 'Hope', 'Deal', 'Orange', 'Union', 'Police', 'Date', 'Gap', 'Bra', 'Man', 'Young', 'Mission')
+word_pattern = re.compile(r'\w+') # words of the answers + of the place names
+
+### function 1: fct_load_gazetteer() ###
+# compile the geonames city + country tables into 1 word trie, v. GeoText's regex of capitalized words + a lookup per table.
+# names are matched on whole words, lowercase, longest first, e.g. "Hong Kong" v. "Hong". a name shared by several cities is the most populous one.
+# input_stop_words: names never matched, see stop_words_of_places.
+# this returns { "places": { name (lowercase): { "name", "type": "city" or "country", "country": iso code, "latitude", "longitude", "population" } }, "trie": { word: { word: ..., "": name } } }.
+# it raises FileNotFoundError, with where to get them, if the geonames tables aren't in input_path_of_geonames, e.g. in a fresh checkout.
+def fct_load_gazetteer(input_path_of_geonames=path_of_geonames, input_stop_words=stop_words_of_places):
+    missing = [name for name in ('countryInfo.txt', 'cities15000.txt') if not os.path.exists(os.path.join(input_path_of_geonames, name))]
+    if missing:
+        raise FileNotFoundError(f'no {" + ".join(missing)} in {input_path_of_geonames}: download countryInfo.txt + cities15000.zip from {url_of_geonames}, e.g. $ python3 kaggle_geo.py download --geonames {input_path_of_geonames}')
+    places = {}
+    with open(os.path.join(input_path_of_geonames, 'countryInfo.txt'), encoding='utf8') as open_file:
+        for line in open_file:
+            if line.startswith('#') or not line.strip():
+                continue
+            columns = line.rstrip('\n').split('\t') # ISO, ISO3, ISO-Numeric, fips, Country, Capital, Area, Population, ...
+            places[columns[4].lower()] = {"name": columns[4], "type": "country", "country": columns[0], "latitude": None, "longitude": None, "population": int(columns[7] or 0)}
+    with open(os.path.join(input_path_of_geonames, 'cities15000.txt'), encoding='utf8') as open_file:
+        for line in open_file:
+            columns = line.rstrip('\n').split('\t') # geonameid, name, asciiname, alternatenames, latitude, longitude, feature class, feature code, country code, cc2, admin1-4, population, ...
+            city = {"name": columns[1], "type": "city", "country": columns[8], "latitude": float(columns[4]), "longitude": float(columns[5]), "population": int(columns[14] or 0)}
+            for name in {columns[1].lower(), columns[2].lower()}:
+                place = places.get(name)
+                if place is None or (place['type'] == 'city' and place['population'] < city['population']): # countries first
+                    places[name] = city
+    for name in input_stop_words:
+        places.pop(name.lower(), None)
+    trie = {}
+    for name in places:
+        node = trie
+        for word in word_pattern.findall(name):
+            node = node.setdefault(word, {})
+        node[''] = name
+    print('*** fct_load_gazetteer ' + str(datetime.now()) + ' ***')
+    return {"places": places, "trie": trie}
+
+### function 1.0.1: fct_download_geonames() ###
+# download the geonames tables of fct_load_gazetteer() into input_path_of_geonames: countryInfo.txt, and cities15000.txt from cities15000.zip.
+# tables already there are kept, v. downloaded again. each is written to a .tmp file first, v. a truncated table.
+def fct_download_geonames(input_path_of_geonames=path_of_geonames, input_url=url_of_geonames):
+    from urllib import request # for opening, reading and parsing urls
+    import zipfile # cities15000.zip
+    os.makedirs(input_path_of_geonames, exist_ok=True)
+    for name, file_of_url in (('countryInfo.txt', 'countryInfo.txt'), ('cities15000.txt', 'cities15000.zip')):
+        path_of_table = os.path.join(input_path_of_geonames, name)
+        if os.path.exists(path_of_table):
+            continue
+        with request.urlopen(input_url.rstrip('/') + '/' + file_of_url) as response:
+            table = response.read()
+        if file_of_url.endswith('.zip'):
+            with zipfile.ZipFile(io.BytesIO(table)) as zip_file:
+                table = zip_file.read(name)
+        with open(path_of_table + '.tmp', 'wb') as open_file:
+            open_file.write(table)
+        os.replace(path_of_table + '.tmp', path_of_table)
+    print('*** fct_download_geonames ' + str(datetime.now()) + ' ***')
+# fct_download_geonames(input_path_of_geonames='/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/geonames') # test
+
+### function 1.0.2: fct_load_stop_words() ###
+# the stop words of a file, 1 name per line, e.g. of fct_derive_stop_words(). blank lines and lines from # are skipped.
+# this returns the names, for fct_load_gazetteer(input_stop_words=...).
+def fct_load_stop_words(input_path_of_stop_words):
+    with open(input_path_of_stop_words, encoding='utf8') as open_file:
+        return tuple(name for name in (line.split('#')[0].strip() for line in open_file) if name)
+
+### function 1.0.3: fct_derive_stop_words() ###
+# candidate stop words: the cities whose name is a lowercase word of a word list, e.g. /usr/share/dict/words, i.e. a common word, v. a proper noun, e.g. Florence.
+# countries, and cities of input_min_population or more, are kept as places. the candidates are coarser than stop_words_of_places, e.g. Cork, so review them.
+# this returns the names, sorted, e.g. to write to a file for --stop-words.
+def fct_derive_stop_words(input_path_of_words, input_path_of_geonames=path_of_geonames, input_min_population=1000000):
+    with open(input_path_of_words, encoding='utf8') as open_file:
+        words = {line.strip() for line in open_file if line.strip().islower()}
+    places = fct_load_gazetteer(input_path_of_geonames, ())['places']
+    return sorted({place['name'] for name, place in places.items() if name in words and place['type'] == 'city' and place['population'] < input_min_population})
+# print(fct_derive_stop_words('/usr/share/dict/words')) # test
+
+### function 1.1: fct_find_places() ###
+# the places of a text, in 1 pass over its words: from each capitalized word, the longest name of the trie, then on after it.
+# this returns [place, ...], in text order, see fct_load_gazetteer().
+def fct_find_places(input_text, input_gazetteer):
+    words = word_pattern.findall(input_text)
+    lowercase = [word.lower() for word in words]
+    trie, places = input_gazetteer['trie'], []
+    index = 0
+    while index < len(words):
+        match = None
+        if words[index][0].isupper():
+            node, position = trie, index
+            while position < len(words) and lowercase[position] in node:
+                node = node[lowercase[position]]
+                position += 1
+                if '' in node:
+                    match = (node[''], position)
+        if match:
+            places.append(input_gazetteer['places'][match[0]])
+            index = match[1]
+        else:
+            index += 1
+    return places
+
+### function 2: fct_geoparse() ###
+# geoparse the answers of a main answer file - only the body_text strings, v. the raw json incl. keys + QUESTIONS (abstract).
+# input_url: a main answer file, by url or local path.
+# this creates cities.<answer file> (city mentions, in order) and country_mentions.<answer file> (country code: count, most first) in input_path_of_working (default: the current dir).
+# a country is mentioned by its name or by 1 of its cities, as GeoText's country_mentions.
+def fct_geoparse(input_url, input_path_of_working=None, input_gazetteer=None):
+    input_gazetteer = input_gazetteer or gazetteer_of_worker or fct_load_gazetteer()
+    if os.path.exists(input_url):
+        with open(input_url, encoding='utf8') as open_file:
+            merge_answers = json.load(open_file)
+    else:
+        from urllib import request # for opening, reading and parsing urls
+        response = request.urlopen(input_url)
+        merge_answers = json.loads(response.read().decode('utf8'))
+    
+    cities, country_mentions = [], Counter()
+    for answer in merge_answers:
+        for text in answer['body_text']:
+            for place in fct_find_places(text, input_gazetteer):
+                if place['type'] == 'city':
+                    cities.append(place['name'])
+                country_mentions[place['country']] += 1
+    country_mentions = dict(country_mentions.most_common())
+    geo_file = input_url.replace('\\', '/').split('/')[-1]
+    
+    cities_file = f'{input_path_of_working or os.getcwd()}/cities.{geo_file}'
+    os.makedirs(os.path.dirname(cities_file), exist_ok=True)
+    with open(cities_file, 'w') as open_file:
+        json.dump(cities, open_file, indent=2, separators=(',', ': '))
+    
+    country_mentions_file = f'{input_path_of_working or os.getcwd()}/country_mentions.{geo_file}'
+    os.makedirs(os.path.dirname(country_mentions_file), exist_ok=True)
+    with open(country_mentions_file, 'w') as open_file:
+        json.dump(country_mentions, open_file, indent=2, separators=(',', ': '))
+    
+    print('*** fct_geoparse ' + str(datetime.now()) + ' ***')
+    return cities, country_mentions
+# cities = fct_geoparse(input_url='https://raw.githubusercontent.com/gisblog/nih-covid19/master/covid19/kaggle/working/answers.task.3.biorxiv_medrxiv.json')[0] # test
+
+### function 2.1: fct_geoparse_all() ###
+# fct_geoparse() of several main answer files, e.g. the 4 subsets of a task, in parallel. the gazetteer is compiled once, and shared by the workers.
+# this returns [(cities, country_mentions), ...], in the order of input_urls.
+def fct_geoparse_all(input_urls, input_path_of_working=None, input_path_of_geonames=path_of_geonames, input_workers=None, input_stop_words=stop_words_of_places):
+    gazetteer = fct_load_gazetteer(input_path_of_geonames, input_stop_words)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=input_workers or min(len(input_urls), os.cpu_count()) or 1, initializer=fct_init_gazetteer_of_worker, initargs=(gazetteer,)) as pool:
+        geoparsed = list(pool.map(functools.partial(fct_geoparse, input_path_of_working=input_path_of_working), input_urls))
+    print('*** fct_geoparse_all ' + str(datetime.now()) + ' ***')
+    return geoparsed
+# fct_geoparse_all([f'/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/answers.task.3.{input_dir}.json' for input_dir in subsets_of_papers]) # test
+
+### function 2.2: fct_init_gazetteer_of_worker() ###
+def fct_init_gazetteer_of_worker(input_gazetteer):
+    global gazetteer_of_worker
+    gazetteer_of_worker = input_gazetteer
+gazetteer_of_worker = None
+
+### function 3: fct_geocode() ###
+# geocode place mentions in bulk, offline: each distinct name once, from the gazetteer, see fct_load_gazetteer(), v. 1 nominatim request per mention.
+# names not in the gazetteer go to input_geocoder, if any, e.g. fct_get_nominatim_geocoder(), or a stub in tests, see fct_get_stub_geocoder().
+# its answers, incl. names not found, are kept in a persistent cache, input_path_of_cache, so a name is only ever sent once.
+#   a failed request (OSError, e.g. a timeout) isn't an answer: it isn't cached, so the name is sent again in the next run.
+#   the cache is written every input_flush names sent, and at the end, also on an interruption, v. losing every remote answer of a bulk run.
+# this returns [[name, latitude, longitude], ...], 1 per mention, in order, with None for names not found.
+def fct_geocode(input_places, input_gazetteer=None, input_path_of_cache=None, input_geocoder=None, input_flush=100):
+    input_gazetteer = input_gazetteer or gazetteer_of_worker or fct_load_gazetteer()
+    cache = {}
+    if input_path_of_cache is not None and os.path.exists(input_path_of_cache):
+        with open(input_path_of_cache, encoding='utf8') as open_file:
+            cache = json.load(open_file)
+    lat_lon_of_name, misses = {}, []
+    for name in dict.fromkeys(input_places):
+        place = input_gazetteer['places'].get(name.lower())
+        if place is not None and place['latitude'] is not None:
+            lat_lon_of_name[name] = [place['latitude'], place['longitude']]
+        elif name in cache:
+            lat_lon_of_name[name] = cache[name]
+        else:
+            misses.append(name)
+    def fct_save_cache(): # atomic, v. a truncated cache
+        os.makedirs(os.path.dirname(os.path.abspath(input_path_of_cache)), exist_ok=True)
+        with open(input_path_of_cache + '.tmp', 'w', encoding='utf8') as open_file:
+            json.dump(cache, open_file, indent=2, separators=(',', ': '))
+        os.replace(input_path_of_cache + '.tmp', input_path_of_cache)
+    failed = 0
+    if misses and input_geocoder is not None:
+        try:
+            for position, name in enumerate(misses, 1):
+                try:
+                    lat_lon_of_name[name] = cache[name] = input_geocoder(name)
+                except OSError as error: # e.g. a timeout: retried in the next run
+                    print(f'Error: geocoder failed on input {name} with message {error}')
+                    failed += 1
+                if input_path_of_cache is not None and position % input_flush == 0:
+                    fct_save_cache()
+        finally:
+            if input_path_of_cache is not None:
+                fct_save_cache()
+    lat_lon = [[name] + (lat_lon_of_name.get(name) or [None, None]) for name in input_places]
+    print(f'*** fct_geocode {len(input_places)} mentions, {len(dict.fromkeys(input_places))} names, {len(misses)} not in the gazetteer or cache, {failed} failed ' + str(datetime.now()) + ' ***')
+    return lat_lon
+# fct_geocode(['Wuhan', 'Waltham', 'Wuhan'], input_path_of_cache='/mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working/geocode.cache.json', input_geocoder=fct_get_nominatim_geocoder()) # test
+
+### function 3.1: fct_get_nominatim_geocoder() ###
+# a remote geocoder for fct_geocode(): https://nominatim.openstreetmap.org/, at most 1 request/s, as its usage policy.
+# errors are raised, v. swallowed by RateLimiter as None, so that fct_geocode() can tell them from names not found.
+# this returns a callable: name -> [latitude, longitude], or None if not found. it raises OSError if the request failed, e.g. timed out.
+def fct_get_nominatim_geocoder(input_timeout=2):
+    from geopy.geocoders import Nominatim # to geocode using osm's nominatim geocoder
+    from geopy.exc import GeopyError # e.g. GeocoderTimedOut, to abort call if no response is received within the specified timeout
+    from geopy.extra.rate_limiter import RateLimiter # to delay calls, per usage policy
+    geocode = RateLimiter(Nominatim(timeout=input_timeout, user_agent="app-covid19").geocode, min_delay_seconds=1, swallow_exceptions=False) # timeout in sec
+    def fct_geocode_name(input_name):
+        try:
+            geolocation = geocode(input_name)
+        except GeopyError as err:
+            raise OSError(f'{type(err).__name__}: {err}') from err
+        return [geolocation.latitude, geolocation.longitude] if geolocation else None # Location(Waltham, Middlesex County, Massachusetts, United States of America, (42.3756401, -71.2358004, 0.0))
+    return fct_geocode_name
+
+### function 3.2: fct_get_stub_geocoder() ###
+# a local stand-in for fct_get_nominatim_geocoder(), e.g. in tests: { name: [latitude, longitude], or an OSError to raise, e.g. TimeoutError() }.
+# the names it was asked for are kept in .calls.
+def fct_get_stub_geocoder(input_lat_lon_of_name):
+    def fct_geocode_name(input_name):
+        fct_geocode_name.calls.append(input_name)
+        lat_lon = input_lat_lon_of_name.get(input_name)
+        if isinstance(lat_lon, OSError):
+            raise lat_lon
+        return lat_lon
+    fct_geocode_name.calls = []
+    return fct_geocode_name
+
+### function 4: fct_count_mentions() ###
+# the geocoded mentions of several lat_lon files, see fct_geocode(), as distinct points + counts, v. 1 point per mention.
+# files are read 1 at a time, and only distinct coordinates are kept, so memory is bounded by the gazetteer, not by the # of mentions.
+# this returns { "longitude", "latitude", "count" } (numpy arrays), without the names not found.
+def fct_count_mentions(input_paths_of_lat_lon):
+    import numpy as np # linear algebra
+    points, counts = np.zeros((0, 2)), np.zeros(0, dtype=np.int64)
+    for path_of_lat_lon in input_paths_of_lat_lon:
+        with open(path_of_lat_lon, encoding='utf8') as open_file:
+            lat_lon = np.array([row[2:0:-1] for row in json.load(open_file)], dtype=np.float64).reshape(-1, 2) # [longitude, latitude], None -> nan
+        lat_lon = lat_lon[~np.isnan(lat_lon).any(axis=1)]
+        points, inverse = np.unique(np.concatenate([points, lat_lon]), axis=0, return_inverse=True)
+        counts = np.bincount(inverse.reshape(-1), weights=np.concatenate([counts, np.ones(lat_lon.shape[0], dtype=np.int64)]), minlength=points.shape[0]).astype(np.int64)
+    return {"longitude": points[:, 0], "latitude": points[:, 1], "count": counts}
+
+### function 4.1: fct_aggregate_by_country() ###
+# the mentions by country: the points are joined to the country polygons with a spatial index (sjoin), built in 1 vectorized call (points_from_xy).
+# input_path_of_countries: country polygons, e.g. Countries_WGS84.shp, reprojected to EPSG:4326 if needed. input_column: the country name.
+# this returns the countries (GeoDataFrame) with a "count" column, for a choropleth, see fct_map_mentions().
+def fct_aggregate_by_country(input_points, input_path_of_countries, input_column='CNTRY_NAME'):
+    import geopandas as gpd # to allow spatial operations on geom types
+    countries = gpd.read_file(input_path_of_countries)[[input_column, 'geometry']].to_crs('EPSG:4326')
+    points = gpd.GeoDataFrame({"count": input_points['count']}, geometry=gpd.points_from_xy(input_points['longitude'], input_points['latitude']), crs='EPSG:4326')
+    joined = gpd.sjoin(points, countries, how='inner', predicate='within') # rtree of the countries, v. each point x each polygon
+    counts = joined.groupby(input_column)['count'].sum()
+    countries['count'] = countries[input_column].map(counts).fillna(0).astype('int64')
+    return countries
+
+### function 4.2: fct_aggregate_by_cell() ###
+# the mentions by grid cell of input_cell degrees, as 1 weighted 2d histogram. memory is bounded by the grid.
+# this returns an array of counts, latitude (rows, south first) x longitude (columns, west first).
+def fct_aggregate_by_cell(input_points, input_cell=1.0):
+    import numpy as np # linear algebra
+    grid, _, _ = np.histogram2d(input_points['latitude'], input_points['longitude'], bins=[int(round(180 / input_cell)), int(round(360 / input_cell))], range=[[-90, 90], [-180, 180]], weights=input_points['count'])
+    return grid
+
+### function 4.3: fct_map_mentions() ###
+# a heat map of the mentions by grid cell (log scale), over a choropleth of the mentions by country, v. 1 marker per mention.
+# this creates input_path_of_map, e.g. map.answers.task.3.png.
+def fct_map_mentions(input_countries, input_grid, input_path_of_map, input_title=None):
+    import numpy as np # linear algebra
+    import matplotlib
+    matplotlib.use('Agg') # to files, v. a display
+    import matplotlib.pyplot as pp # plotting lib.interactive plots
+    from matplotlib.colors import LogNorm # log color scale, as counts are skewed, e.g. Wuhan
+    f, ax = pp.subplots(figsize=(16, 8))
+    input_countries.plot(ax=ax, column='count', cmap='Greys', edgecolor='white', linewidth=0.2, alpha=0.5) # basemap + choropleth
+    grid = np.ma.masked_equal(input_grid, 0) # empty cells are transparent
+    if grid.count():
+        image = ax.imshow(grid, extent=(-180, 180, -90, 90), origin='lower', cmap='inferno_r', norm=LogNorm(vmin=1, vmax=grid.max()), alpha=0.8, interpolation='nearest')
+        f.colorbar(image, ax=ax, shrink=0.6, label='mentions per cell')
+    ax.set_xlim(-180, 180)
+    ax.set_ylim(-90, 90)
+    ax.set_title(input_title or os.path.basename(input_path_of_map))
+    f.savefig(input_path_of_map, dpi=150, bbox_inches='tight')
+    pp.close(f)
+    print('*** fct_map_mentions ' + str(datetime.now()) + ' ***')
+
+### cli ###
+# run chosen stages, in order, for chosen subsets of a task's main answer files. importing this module runs nothing.
+# stages -
+#   download: fct_download_geonames() into --geonames, once.
+#   stop-words: fct_derive_stop_words() from --words, i.e. stop_words.txt in --working, to review, then to use with --stop-words.
+#   geoparse: fct_geoparse_all() of answers.task.N.<subset>.json in --answers (url or dir), with the geonames tables in --geonames, i.e. cities.* + country_mentions.* in --working.
+#   geocode: fct_geocode() of the cities of each subset, i.e. lat_lon.answers.task.N.<subset>.json in --working, [[name, latitude, longitude], ...].
+#       offline, unless --remote, with the answers of nominatim kept in geocode.cache.json in --working.
+#   map: the mentions of all subsets by country + by grid cell of --cell degrees, i.e. countries.answers.task.N.json, cells.answers.task.N.json + map.answers.task.N.png in --working.
+# e.g. $ python3 kaggle_geo.py geoparse --answers /mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working --subsets biorxiv_medrxiv
+#      $ python3 kaggle_geo.py download stop-words --words /usr/share/dict/words # then review stop_words.txt
+#      $ python3 kaggle_geo.py geoparse geocode --stop-words stop_words.txt
+def fct_main(input_arguments=None):
+    parser = argparse.ArgumentParser(description='geoparse and geocode extracted nlp answers.')
+    stages = ['download', 'stop-words', 'geoparse', 'geocode', 'map']
+    parser.add_argument('stages', nargs='*', metavar='stage', help=f'stages to run, in order, from {", ".join(stages)} (default: geoparse geocode)')
+    parser.add_argument('--answers', default=path_of_answers, help='url or dir of the main answer files (default: github)')
+    parser.add_argument('--working', default=os.getcwd(), help='dir of cities.* + country_mentions.* (default: the current dir)')
+    parser.add_argument('--task', type=int, default=3, help='task # (default: 3, geography)')
+    parser.add_argument('--subsets', nargs='+', default=list(subsets_of_papers), help='subsets of papers (default: all)')
+    parser.add_argument('--geonames', default=path_of_geonames, help='dir of cities15000.txt + countryInfo.txt (default: geonames/ next to this file)')
+    parser.add_argument('--stop-words', help='file of names never matched, 1 per line (geoparse, geocode, default: stop_words_of_places)')
+    parser.add_argument('--words', help='word list, e.g. /usr/share/dict/words (stop-words)')
+    parser.add_argument('--min-population', type=int, default=1000000, help='cities of this population or more are never stop words (stop-words)')
+    parser.add_argument('--workers', type=int, help='worker processes (default: 1 per subset)')
+    parser.add_argument('--countries', default=path_of_countries, help='country polygons, e.g. Countries_WGS84.shp (map)')
+    parser.add_argument('--column', default='CNTRY_NAME', help='country name column of --countries (map)')
+    parser.add_argument('--cell', type=float, default=1.0, help='grid cell, in degrees (map)')
+    parser.add_argument('--remote', action='store_true', help='geocode names not in the gazetteer with nominatim (geocode)')
+    arguments = parser.parse_args(input_arguments)
+    arguments.stages = arguments.stages or ['geoparse', 'geocode'] # as the original run
+    for stage in arguments.stages:
+        if stage not in stages:
+            parser.error(f'invalid stage {stage}, choose from {", ".join(stages)}')
+    if 'stop-words' in arguments.stages and arguments.words is None:
+        parser.error('stop-words requires --words, e.g. /usr/share/dict/words')
+    stop_words = fct_load_stop_words(arguments.stop_words) if arguments.stop_words else stop_words_of_places
+    for stage in arguments.stages:
+        if stage == 'download':
+            fct_download_geonames(arguments.geonames)
+        elif stage == 'stop-words':
+            os.makedirs(arguments.working, exist_ok=True)
+            with open(f'{arguments.working}/stop_words.txt', 'w', encoding='utf8') as open_file:
+                open_file.write(f'# cities that are also lowercase words of {arguments.words}, under {arguments.min_population} people, see fct_derive_stop_words(): review, then --stop-words\n')
+                open_file.writelines(name + '\n' for name in fct_derive_stop_words(arguments.words, arguments.geonames, arguments.min_population))
+        elif stage == 'geoparse':
+            fct_geoparse_all([f'{arguments.answers.rstrip("/")}/answers.task.{arguments.task}.{input_dir}.json' for input_dir in arguments.subsets], arguments.working, arguments.geonames, arguments.workers, stop_words)
+        elif stage == 'geocode':
+            gazetteer = fct_load_gazetteer(arguments.geonames, stop_words)
+            geocoder = fct_get_nominatim_geocoder() if arguments.remote else None
+            for input_dir in arguments.subsets:
+                geo_file = f'answers.task.{arguments.task}.{input_dir}.json'
+                with open(f'{arguments.working}/cities.{geo_file}', encoding='utf8') as open_file: # from geoparse
+                    cities = json.load(open_file)
+                lat_lon = fct_geocode(cities, gazetteer, f'{arguments.working}/geocode.cache.json', geocoder)
+                with open(f'{arguments.working}/lat_lon.{geo_file}', 'w') as open_file:
+                    json.dump(lat_lon, open_file, separators=(',', ':'))
+        elif stage == 'map':
+            points = fct_count_mentions([f'{arguments.working}/lat_lon.answers.task.{arguments.task}.{input_dir}.json' for input_dir in arguments.subsets]) # from geocode
+            countries = fct_aggregate_by_country(points, arguments.countries, arguments.column)
+            grid = fct_aggregate_by_cell(points, arguments.cell)
+            with open(f'{arguments.working}/countries.answers.task.{arguments.task}.json', 'w') as open_file:
+                json.dump({name: int(count) for name, count in countries.loc[countries['count'] > 0].sort_values('count', ascending=False)[[arguments.column, 'count']].itertuples(index=False, name=None)}, open_file, indent=2, separators=(',', ': '))
+            with open(f'{arguments.working}/cells.answers.task.{arguments.task}.json', 'w') as open_file: # [[west, south, count], ...]
+                json.dump([[-180 + int(column) * arguments.cell, -90 + int(row) * arguments.cell, int(grid[row, column])] for row, column in zip(*grid.nonzero())], open_file, separators=(',', ':'))
+            fct_map_mentions(countries, grid, f'{arguments.working}/map.answers.task.{arguments.task}.png', f'task {arguments.task} - mentions of places in answers')
+
+if __name__ == '__main__':
+    fct_main()
+
+### conclusion: map ###
+# see fct_map_mentions(), e.g. $ python3 kaggle_geo.py geoparse geocode map --answers /mnt/g/Users/pie/Downloads/nih/covid19/kaggle/working --countries /mnt/c/data/polygon/Countries_WGS84/Countries_WGS84.shp
@@ -0,0 +1,582 @@
+### tests of kaggle.py ###
+# $ python3 -m pytest -q covid19/kaggle/working
+# on a small synthetic corpus, see fct_create_synthetic_papers(), v. the CORD-19 dataset.
+
+import os # misc os interfaces
+import json # json encoder + decoder
+import glob # all papers of the corpus
+import time # sleep
+import struct # header of a pipe message
+import signal # SIGKILL
+import shutil # move files
+import hashlib # paper_id of an added paper
+import asyncio # event loop of the service
+import functools # partial
+import contextlib # suppress
+import concurrent.futures # executor of the service
+from concurrent.futures.process import BrokenProcessPool # a worker of the service died
+
+import pytest # test runner
+
+import kaggle # the pipeline
+
+def fct_add_paper(input_path_of_papers, input_dir, input_abstract, input_body_text):
+    paper_id = hashlib.sha1(repr((input_dir, input_abstract, input_body_text)).encode('utf-8')).hexdigest()
+    path_to_paper = os.path.join(input_path_of_papers, '2020-03-13', input_dir, input_dir, paper_id + '.json')
+    os.makedirs(os.path.dirname(path_to_paper), exist_ok=True)
+    with open(path_to_paper, 'w', encoding='utf-8') as open_file:
+        json.dump({"paper_id": paper_id, "metadata": {"title": "", "authors": []}, "abstract": [{"text": text} for text in input_abstract], "body_text": [{"text": text} for text in input_body_text], "bib_entries": {}, "ref_entries": {}, "back_matter": []}, open_file, ensure_ascii=False, indent=1)
+    return path_to_paper
+
+@pytest.fixture(autouse=True)
+def fct_reset_telemetry():
+    yield
+    kaggle.telemetry.update({"path": None, "live": False, "file": None, "pid": None, "stages": {}})
+
+@pytest.fixture
+def path_of_papers(tmp_path):
+    path_of_papers = str(tmp_path / 'CORD-19-research-challenge')
+    kaggle.fct_create_synthetic_papers(path_of_papers, input_n_papers=8, input_body_paragraphs=(5, 15))
+    return path_of_papers
+
+### function 1: test_matches_same_as_count_vectorizer() ###
+# the scorer of a paper context for a batch of QUESTIONS, see fct_get_distances_of_limits(), v. the CountVectorizer + euclidean_distances() of fct_get_matches_from_papers(), i.e. a fit on [QUESTION] + paper per QUESTION:
+# the same matches, in the same order, at the same distances, for float + integer min_df/max_df, the fallback of min_df > max_df, an empty vocabulary and ties.
+def fct_get_matches_of_count_vectorizer(input_paper, input_question, input_min_df, input_max_df):
+    from sklearn.feature_extraction.text import CountVectorizer # convert collection of txt docs to matrix of token counts
+    from sklearn.metrics.pairwise import euclidean_distances # compute distance matrix between each pair of vectors
+    paper = [input_question] + input_paper
+    try:
+        features = CountVectorizer(min_df=input_min_df, max_df=input_max_df, analyzer='word', ngram_range=(2, 3)).fit_transform(paper)
+    except ValueError: # eg papers may req diff min_df or max_df
+        try:
+            features = CountVectorizer(min_df=0.0, max_df=1.0, analyzer='word', ngram_range=(2, 3)).fit_transform(paper)
+        except ValueError: # empty vocabulary: no match but the QUESTION itself
+            return [[0.0, input_question]]
+    distances = euclidean_distances(features[0], features).ravel()
+    return sorted([[distance, text] for distance, text in zip(distances, paper)], key=lambda k: k[0])
+
+@pytest.mark.parametrize('min_df, max_df', [(0.1, 0.9), (0.0, 1.0), (0.3, 0.5), (1, 3), (2, 1.0), (0.9, 0.1), (5, 2)])
+def test_matches_same_as_count_vectorizer(path_of_papers, min_df, max_df):
+    input_questions = kaggle.fct_get_questions_of_task(0) + kaggle.fct_get_questions_of_task(3)
+    paths_to_papers = sorted(glob.glob(os.path.join(path_of_papers, '**', '*.json'), recursive=True))
+    paths_to_papers.append(fct_add_paper(path_of_papers, 'biorxiv_medrxiv', ['known about transmission'], ['incubation and environmental', 'known about transmission', 'rate of covid-19 spread', 'geographic variations in the rate']))
+    for path_to_paper in paths_to_papers:
+        paper_id, paper = kaggle.fct_get_paragraphs_from_paper(path_to_paper)
+        paper_context = kaggle.fct_add_matches_to_context(kaggle.fct_create_paper_context(path_to_paper, min_df, max_df), input_questions)
+        for question in input_questions:
+            assert paper_context['matches'][question] == fct_get_matches_of_count_vectorizer(paper, question, min_df, max_df)
+    ### empty vocabulary: only the QUESTION without n-grams has no match, and with every QUESTION, ValueError as CountVectorizer ###
+    paper = ['Transmission.', 'Incubation.', 'Stability.']
+    paper_context = kaggle.fct_add_matches_to_context(kaggle.fct_create_paper_context_from_paragraphs('empty', paper, min_df, max_df), ['TRANSMISSION?', kaggle.questions[0]])
+    for question in ['TRANSMISSION?', kaggle.questions[0]]:
+        assert paper_context['matches'][question] == fct_get_matches_of_count_vectorizer(paper, question, min_df, max_df)
+    with pytest.raises(ValueError):
+        kaggle.fct_add_matches_to_context(kaggle.fct_create_paper_context_from_paragraphs('empty', paper, min_df, max_df), ['TRANSMISSION?'])
+
+### function 2: test_index_same_as_papers() ###
+# an index, see fct_build_index(), answers as the papers themselves: the same paragraphs, matches and answers, incl. a paper with non-ascii text.
+non_ascii_paragraphs = ['Transmission, incubation, and environmental stability in Wuhan (武汉) – a résumé.', 'Die Übertragung: what is known about transmission ≈ 5 days.']
+
+def test_index_same_as_papers(tmp_path, path_of_papers):
+    path_to_paper = fct_add_paper(path_of_papers, 'biorxiv_medrxiv', non_ascii_paragraphs[:1], non_ascii_paragraphs[1:])
+    items = sorted(glob.glob(os.path.join(path_of_papers, '**', '*.json'), recursive=True))
+    with open(tmp_path / 'papers.json', 'w') as open_file:
+        json.dump({"paper": items}, open_file)
+    kaggle.fct_build_index(str(tmp_path / 'papers.json'), str(tmp_path / 'index'))
+    index = kaggle.fct_load_index(str(tmp_path / 'index'))
+    assert index['paper'] == items
+    input_questions = kaggle.fct_get_questions_of_task(0)
+    for (paper_id, matches), item in zip(kaggle.fct_get_matches_from_index(index, input_questions), items):
+        assert kaggle.fct_create_paper_context_from_index(index, paper_id)['paper'] == kaggle.fct_get_paragraphs_from_paper(item)[1]
+        for question in input_questions:
+            assert matches[question] == kaggle.fct_get_matches_from_papers(item, question, 0.1, 0.9, 4)
+        assert kaggle.fct_get_answer_from_index(index, paper_id, 0.1, 0.9, 0, 4) == kaggle.fct_get_answer_from_matches(item, 0.1, 0.9, 0, 4)
+    assert non_ascii_paragraphs[0] in kaggle.fct_get_answer_from_index(index, os.path.basename(path_to_paper).split('.')[0], 0.1, 0.9, 0, 4)
+
+### function 3: test_manifest_skips_unchanged_papers() ###
+# fct_write_answers() + the answers manifest: an unchanged paper is skipped, an edited paper is scored again, new parameters score every paper again,
+# and a paper moved to a new path, e.g. a new drop, reuses its answer. the manifest is only rewritten if it has superseded lines.
+def fct_write_papers_file(input_path_of_papers, input_path_of_working, input_dir='biorxiv_medrxiv'):
+    items = sorted(glob.glob(os.path.join(input_path_of_papers, '2020-03-13', input_dir, '**', '*.json'), recursive=True))
+    os.makedirs(input_path_of_working, exist_ok=True)
+    with open(f'{input_path_of_working}/papers.{input_dir}.json', 'w') as open_file:
+        json.dump({"paper": items}, open_file)
+    return items
+
+def fct_read_json(input_path):
+    with open(input_path) as open_file:
+        return json.load(open_file)
+
+def test_manifest_skips_unchanged_papers(tmp_path, path_of_papers, monkeypatch):
+    path_of_working = str(tmp_path / 'working')
+    items = fct_write_papers_file(path_of_papers, path_of_working)
+    get_answer_from_matches, scored = kaggle.fct_get_answer_from_matches, []
+    def fct_get_answer_from_matches(input_path_to_paper, *arguments):
+        scored.append(input_path_to_paper)
+        return get_answer_from_matches(input_path_to_paper, *arguments)
+    monkeypatch.setattr(kaggle, 'fct_get_answer_from_matches', fct_get_answer_from_matches)
+    def fct_write_answers(input_top=4):
+        scored.clear()
+        kaggle.fct_write_answers(f'{path_of_working}/papers.biorxiv_medrxiv.json', 0.1, 0.9, 0, input_top, input_path_of_working=path_of_working)
+        return sorted(scored)
+    manifest_file = f'{path_of_working}/answers.manifest.jsonl'
+    assert fct_write_answers() == items
+    inode = os.stat(manifest_file).st_ino
+    assert fct_write_answers() == []
+    assert os.stat(manifest_file).st_ino == inode # not rewritten
+    ### edited ###
+    paper_json = fct_read_json(items[0])
+    paper_json['body_text'].append({"text": "what is known about transmission, incubation, and environmental stability"})
+    with open(items[0], 'w') as open_file:
+        json.dump(paper_json, open_file)
+    assert fct_write_answers() == [items[0]]
+    assert fct_read_json(path_of_working + items[0])['body_text'] == get_answer_from_matches(items[0], 0.1, 0.9, 0, 4)
+    ### new parameters ###
+    assert fct_write_answers(input_top=2) == items
+    assert fct_write_answers(input_top=2) == []
+    with open(manifest_file) as open_file:
+        assert len(open_file.readlines()) == len(items) # compacted
+    ### moved ###
+    path_of_moved = str(tmp_path / 'moved')
+    shutil.move(path_of_papers, path_of_moved)
+    fct_write_papers_file(path_of_moved, path_of_working)
+    assert fct_write_answers(input_top=2) == []
+    for item in items:
+        assert fct_read_json(path_of_working + item.replace(path_of_papers, path_of_moved)) == fct_read_json(path_of_working + item)
+
+### function 4: test_extract_paper() ###
+# fct_extract_paper() v. json.load(): a missing abstract or body_text, keys in another order than CORD-19's, and extra whitespace.
+# each paragraph is extracted exactly once, abstract first, v. the body once per abstract paragraph.
+@pytest.mark.parametrize('paper_file', [
+    '{"paper_id": "aaaa1", "metadata": {"title": "t"}, "body_text": [{"text": "b 1"}, {"text": "b 2"}], "bib_entries": {}}',
+    '{"paper_id": "aaaa2", "metadata": {"title": "t"}, "abstract": [{"text": "a 1"}, {"text": "a 2"}], "bib_entries": {}}',
+    '{"bib_entries": {"BIBREF0": {"title": "a } in \\"a\\" title", "other_ids": {"DOI": ["x"]}}}, "body_text": [{"text": "b 1"}, {"text": "b 2"}], "metadata": {}, "abstract": [{"text": "a 1"}, {"text": "a 2"}], "paper_id": "aaaa3"}',
+    '\n\t{ \r\n  "paper_id"  :\n"aaaa4" ,\n\n  "abstract"   :   [ { "text" : "a 1" } ,{"text":"a 2"}]\t,"body_text":[\n{"text": "b  1 "}, {"text": "b 2"}\n]  ,  "back_matter" : [ ] \n}\n  ',
+    '{"paper_id": "aaaa5", "abstract": [], "body_text": []}'
+])
+def test_extract_paper(tmp_path, paper_file):
+    path_to_paper = str(tmp_path / 'paper.json')
+    with open(path_to_paper, 'w') as open_file:
+        open_file.write(paper_file)
+    paper_json = json.loads(paper_file)
+    assert kaggle.fct_extract_paper(path_to_paper) == {"paper_id": paper_json['paper_id'], "abstract": paper_json.get('abstract', []), "body_text": paper_json.get('body_text', [])}
+    paragraphs = [(paper_json['paper_id'], section, paragraph['text']) for section in ('abstract', 'body_text') for paragraph in paper_json.get(section, [])]
+    assert list(kaggle.fct_extract_paragraphs(path_to_paper)) == paragraphs
+    assert kaggle.fct_get_paragraphs_from_paper(path_to_paper) == (paper_json['paper_id'], [text for paper_id, section, text in paragraphs])
+
+### function 5: test_store_same_as_papers() ###
+# a paragraph store, see fct_build_store(), answers as the papers themselves: the same paragraphs, and the same answer files, byte for byte, incl. a paper with non-ascii text.
+def fct_read_answers_files(input_path_of_working):
+    answers_files = {}
+    for name in sorted(os.listdir(input_path_of_working)):
+        if name.startswith('answers.task.') and name.endswith('.json'):
+            with open(os.path.join(input_path_of_working, name), 'rb') as open_file:
+                answers_files[name] = open_file.read()
+    return answers_files
+
+def test_store_same_as_papers(tmp_path, path_of_papers):
+    fct_add_paper(path_of_papers, 'comm_use_subset', non_ascii_paragraphs[:1], non_ascii_paragraphs[1:])
+    fct_add_paper(path_of_papers, 'pmc_custom_license', [], [])
+    for input_dir in kaggle.subsets_of_papers:
+        fct_write_papers_file(path_of_papers, str(tmp_path), input_dir)
+    paths_of_papers = [str(tmp_path / f'papers.{input_dir}.json') for input_dir in kaggle.subsets_of_papers]
+    kaggle.fct_schedule_answers(paths_of_papers, 0.1, 0.9, 4, [0, 1], input_workers=1, input_path_of_working=str(tmp_path / 'files'))
+    kaggle.fct_build_store(paths_of_papers, str(tmp_path / 'store' / 'store'))
+    kaggle.fct_write_answers_from_store(str(tmp_path / 'store' / 'store'), 0.1, 0.9, 4, [0, 1], input_workers=1, input_path_of_working=str(tmp_path / 'store'))
+    store = kaggle.fct_load_store(str(tmp_path / 'store' / 'store'))
+    assert len(store['paper']) == 10
+    for position, item in enumerate(store['paper']):
+        assert kaggle.fct_get_paragraphs_from_store(store, position) == kaggle.fct_get_paragraphs_from_paper(item)
+        assert item in fct_read_json(str(tmp_path / f'papers.{store["subset"][position]}.json'))['paper']
+    assert len(fct_read_answers_files(tmp_path / 'files')) == 16 # 2 tasks, 4 subsets, + their indexes, see fct_build_answers_index()
+    assert fct_read_answers_files(tmp_path / 'store') == fct_read_answers_files(tmp_path / 'files')
+
+### function 6: test_papers_same_as_glob() ###
+# fct_create_dict_of_papers() v. 1 glob of the tree: the same papers, sizes and mtimes in each papers.<subset>.json, in path order.
+# incl. nested dirs, e.g. pdf_json, a subset whose name is in another's, and files that are not papers.
+def test_papers_same_as_glob(tmp_path, path_of_papers):
+    path_of_drop = os.path.join(path_of_papers, '2020-03-13')
+    os.makedirs(os.path.join(path_of_drop, 'comm_use_subset', 'comm_use_subset', 'pdf_json'))
+    os.makedirs(os.path.join(path_of_drop, 'noncomm_use_subset', 'noncomm_use_subset', 'pmc_json', 'comm_use_subset'))
+    paper_file = json.dumps({"paper_id": "x", "abstract": [], "body_text": []})
+    for dir_file in ('comm_use_subset/comm_use_subset/pdf_json/0a1b2c.json', 'noncomm_use_subset/noncomm_use_subset/pmc_json/comm_use_subset/3d4e5f.xml.json', 'metadata.json', 'comm_use_subset/README.json', 'comm_use_subset/comm_use_subset/ABC123.json', 'comm_use_subset/comm_use_subset/abcdef.json', 'biorxiv_medrxiv/biorxiv_medrxiv/123456.json', 'pmc_custom_license/7a8b9c.txt'):
+        with open(os.path.join(path_of_drop, dir_file), 'w') as open_file:
+            open_file.write(paper_file)
+    kaggle.fct_create_dict_of_papers(path_of_papers, 'json', input_workers=4, input_path_of_working=str(tmp_path))
+    for input_dir in kaggle.subsets_of_papers:
+        items = []
+        for dir_file in sorted(glob.glob(os.path.join(path_of_papers, '**', '*.json'), recursive=True)):
+            dirnames = [dirname for dirname in os.path.relpath(dir_file, path_of_papers).split(os.sep)[:-1] if dirname in kaggle.subsets_of_papers]
+            if dirnames[:1] == [input_dir] and kaggle.name_of_paper.fullmatch(os.path.basename(dir_file).split('.')[0]):
+                items.append(dir_file)
+        with open(str(tmp_path / f'papers.{input_dir}.json')) as open_file:
+            assert json.load(open_file) == {"paper": items, "size": [os.stat(item).st_size for item in items], "mtime": [os.stat(item).st_mtime for item in items]}
+        assert len(items) == {"biorxiv_medrxiv": 2, "comm_use_subset": 3, "noncomm_use_subset": 3, "pmc_custom_license": 2}[input_dir]
+
+### function 7: test_merge_same_as_glob() ###
+# fct_merge_answers_all_tasks() v. 1 glob + json.load() of every answer file: the same answers in each answers.task.N.<subset>.json, in path order.
+# incl. answer files of 1 task, see fct_write_answers(), next to answer files of all tasks, see fct_write_answers_all_tasks(), compact or indented.
+@pytest.mark.parametrize('indent', [2, None])
+def test_merge_same_as_glob(tmp_path, path_of_papers, indent):
+    path_of_working = str(tmp_path / 'working')
+    kaggle.fct_create_dict_of_papers(path_of_papers, 'json', input_path_of_working=path_of_working)
+    for input_dir in kaggle.subsets_of_papers[:3]:
+        kaggle.fct_write_answers_all_tasks(f'{path_of_working}/papers.{input_dir}.json', 0.1, 0.9, 4, [0, 1], input_path_of_working=path_of_working)
+    kaggle.fct_write_answers(f'{path_of_working}/papers.biorxiv_medrxiv.json', 0.1, 0.9, 2, 4, input_path_of_working=str(tmp_path / 'task.2'))
+    path_of_answers = path_of_working + path_of_papers
+    for dir_file in glob.glob(str(tmp_path / 'task.2') + path_of_papers + '/**/*.json', recursive=True):
+        shutil.copy(dir_file, dir_file.replace(str(tmp_path / 'task.2'), path_of_working)[:-len('.json')] + '0.json') # same dir, another paper
+    kaggle.fct_merge_answers_all_tasks(path_of_answers, [0, 1, 2], input_indent=indent, input_workers=4, input_path_of_working=str(tmp_path / 'merge'))
+    for task in [0, 1, 2]:
+        for input_dir in kaggle.subsets_of_papers:
+            answers = []
+            for dir_file in sorted(glob.glob(os.path.join(path_of_answers, '**', '*.json'), recursive=True)):
+                if kaggle.fct_get_subset_of_paper(dir_file, path_of_answers) == input_dir:
+                    with open(dir_file) as open_file:
+                        answer_json = json.load(open_file)
+                    answers.extend(answer for answer in (answer_json if isinstance(answer_json, list) else [answer_json]) if answer['task'] == task)
+            answer_file = str(tmp_path / 'merge' / f'answers.task.{task}.{input_dir}.json')
+            if input_dir == 'pmc_custom_license':
+                assert not os.path.exists(answer_file)
+                continue
+            with open(answer_file) as open_file:
+                assert json.load(open_file) == answers
+            assert list(kaggle.fct_iter_answers(task, input_dir, str(tmp_path / 'merge'))) == answers
+            assert len(answers) == {0: 2, 1: 2, 2: 2 if input_dir == 'biorxiv_medrxiv' else 0}[task]
+
+### function 8: test_answers_index_non_ascii() ###
+# a main answer file without an index, e.g. of an earlier run, with non-ascii text written as is, v. ensure_ascii: the index is by byte, v. by character.
+def test_answers_index_non_ascii(tmp_path):
+    answers = [{"paper_id": f'{paper_id:040x}', "task": 0, "abstract": kaggle.questions[0], "body_text": non_ascii_paragraphs[paper_id % 2:] * paper_id} for paper_id in range(1, 6)]
+    answer_file = str(tmp_path / 'answers.task.0.comm_use_subset.json')
+    with open(answer_file, 'w', encoding='utf-8') as open_file:
+        open_file.write(' [\n' + ' ,\n\t'.join(json.dumps(answer, ensure_ascii=False, indent=2) for answer in answers) + '\n]\n')
+    index = kaggle.fct_build_answers_index(answer_file)
+    with open(answer_file, 'rb') as open_file:
+        answer_bytes = open_file.read()
+    assert [json.loads(answer_bytes[start:end]) for start, end in zip(index['start'], index['end'])] == answers
+    assert list(kaggle.fct_iter_answers(0, 'comm_use_subset', str(tmp_path))) == answers
+    for answer in answers:
+        assert kaggle.fct_get_answers(answer['paper_id'], 0, input_path_of_working=str(tmp_path)) == [answer]
+
+### function 9: test_telemetry_one_record_per_stage() ###
+# 1 paper scored with telemetry: 1 json line per stage, with the fields of fct_measure_stage(). without telemetry, nothing is measured or written.
+def test_telemetry_one_record_per_stage(tmp_path, path_of_papers):
+    path_to_paper = kaggle.fct_scan_tree_of_papers(path_of_papers)[0][0]
+    input_questions = kaggle.fct_get_questions_of_task(0)
+    ### off ###
+    with kaggle.fct_measure_stage('extraction', path_to_paper) as record:
+        record['papers'] = 1
+    assert record == {'papers': 1}
+    kaggle.fct_add_matches_to_context(kaggle.fct_create_paper_context(path_to_paper, 0.1, 0.9), input_questions, 4)
+    assert kaggle.telemetry['stages'] == {} and kaggle.telemetry['file'] is None
+    ### on ###
+    paper_id, paper = kaggle.fct_get_paragraphs_from_paper(path_to_paper)
+    path_of_telemetry = str(tmp_path / 'new' / 'telemetry.jsonl')
+    kaggle.fct_start_telemetry(path_of_telemetry)
+    kaggle.fct_add_matches_to_context(kaggle.fct_create_paper_context(path_to_paper, 0.1, 0.9), input_questions, 4)
+    kaggle.telemetry['file'].close()
+    with open(path_of_telemetry) as open_file:
+        records = [json.loads(line) for line in open_file]
+    fields = {'stage', 'paper', 'pid', 'papers', 'paragraphs', 'wall', 'cpu', 'papers_per_s', 'paragraphs_per_s', 'rss', 'peak_rss', 'time'}
+    assert [record['stage'] for record in records] == ['extraction', 'vectorization', 'distance', 'selection']
+    for record in records:
+        assert set(record) == fields | {"vectorization": {'vocabulary'}, "distance": {'questions'}, "selection": {'questions'}}.get(record['stage'], set())
+        assert (record['paper'], record['pid'], record['papers']) == (paper_id, os.getpid(), 1)
+        assert record['wall'] >= 0 and record['peak_rss'] >= record['rss'] > 0
+    assert records[0]['paragraphs'] == len(paper)
+    assert records[2]['questions'] == len(input_questions)
+    summary = kaggle.fct_summarize_telemetry(path_of_telemetry)
+    assert {stage: summary['stages'][stage]['calls'] for stage in summary['stages']} == {'extraction': 1, 'vectorization': 1, 'distance': 1, 'selection': 1}
+    assert summary['stages']['vectorization']['max_vocabulary'] == records[1]['vocabulary'] > 0
+    assert [paper for paper, wall in summary['slowest_papers']] == [paper_id]
+
+### function 10: test_ann_recall() ###
+# the ann index, see fct_build_ann(), finds the exact top paragraphs of task 0's QUESTIONS, see fct_evaluate_ann(): most of them on a few cells + candidates, all of them on all.
+# each QUESTION has a paper of paragraphs close to it, v. the synthetic paragraphs alone, whose distances to it mostly tie.
+def test_ann_recall(tmp_path):
+    path_of_papers = str(tmp_path / 'CORD-19-research-challenge')
+    kaggle.fct_create_synthetic_papers(path_of_papers, input_n_papers=40)
+    input_questions = kaggle.fct_get_questions_of_task(0)
+    for index, question in enumerate(input_questions):
+        words = question.lower().rstrip('?').split()
+        fct_add_paper(path_of_papers, kaggle.subsets_of_papers[index % 4], [], [' '.join(words[:len(words) - n_words]) for n_words in range(len(words) // 2)])
+    kaggle.fct_create_dict_of_papers(path_of_papers, 'json', input_path_of_working=str(tmp_path))
+    kaggle.fct_build_index([str(tmp_path / f'papers.{input_dir}.json') for input_dir in kaggle.subsets_of_papers], str(tmp_path / 'index'))
+    kaggle.fct_build_ann(str(tmp_path / 'index'), input_n_cells=16)
+    evaluation = kaggle.fct_evaluate_ann(kaggle.fct_load_index(str(tmp_path / 'index')), kaggle.fct_load_ann(str(tmp_path / 'index')), input_questions, 5, (20, 10 ** 6), (4, 16))
+    assert evaluation[(20, 4)]['recall'] >= 0.9
+    assert evaluation[(10 ** 6, 16)]['recall'] == 1.0 # exact
+
+### function 11: test_ngrams_of_paragraph_bounded() ###
+# the n-grams of shared paragraphs are kept in a bounded lru, v. 1 per shared paragraph for the life of the worker.
+def test_ngrams_of_paragraph_bounded(monkeypatch):
+    monkeypatch.setattr(kaggle, 'store_of_worker', {"exact_papers": [2, 2, 2, 1]})
+    monkeypatch.setattr(kaggle, 'ngrams_of_worker', kaggle.OrderedDict())
+    monkeypatch.setattr(kaggle, 'ngrams_of_worker_size', 2)
+    for exact in [0, 1, 0, 2, 3]:
+        assert kaggle.fct_get_ngrams_of_paragraph(exact, f'shared paragraph {exact}') == kaggle.Counter(kaggle.fct_get_ngrams_of_text(f'shared paragraph {exact}'))
+    assert list(kaggle.ngrams_of_worker) == [0, 2] # 1 least recently used, 3 in 1 paper only
+
+### function 12: test_boilerplate_suppressed() ###
+# a paragraph planted in 3 papers, in another case + whitespace each time, and a near-duplicate of it, 1 word changed, in a 4th, see fct_build_fingerprints().
+# exact fingerprints cluster the 3 copies, minhash also the near-duplicate. input_boilerplate=3 drops their cluster from the answers.
+# without input_boilerplate, the answer files are the same, byte for byte, as those of a store without fingerprints.
+boilerplate_paragraph = 'What is known about transmission, incubation, and environmental stability? All rights reserved. No reuse allowed without permission. The copyright holder for this preprint is the author/funder, who has granted medRxiv a license to display the preprint in perpetuity.'
+
+@pytest.mark.parametrize('minhash', [False, True])
+def test_boilerplate_suppressed(tmp_path, path_of_papers, minhash):
+    paths_to_papers = [dir_file for dir_file, size, mtime in kaggle.fct_scan_tree_of_papers(path_of_papers)]
+    near_duplicate = boilerplate_paragraph.replace('display', 'show')
+    paragraphs = [boilerplate_paragraph, boilerplate_paragraph.upper(), '  ' + boilerplate_paragraph.replace(' ', ' \n '), near_duplicate]
+    for path_to_paper, paragraph in zip(paths_to_papers, paragraphs):
+        with open(path_to_paper) as open_file:
+            paper_json = json.load(open_file)
+        paper_json['body_text'].insert(1, {"text": paragraph})
+        with open(path_to_paper, 'w') as open_file:
+            json.dump(paper_json, open_file)
+    kaggle.fct_create_dict_of_papers(path_of_papers, 'json', input_path_of_working=str(tmp_path))
+    path_of_store = str(tmp_path / 'store')
+    kaggle.fct_build_store([str(tmp_path / f'papers.{input_dir}.json') for input_dir in kaggle.subsets_of_papers], path_of_store)
+    def fct_write_answers_from_store(input_path_of_working, input_boilerplate=None):
+        kaggle.fct_write_answers_from_store(path_of_store, 0.0, 1.0, 4, [0], input_workers=1, input_path_of_working=str(tmp_path / input_path_of_working), input_boilerplate=input_boilerplate)
+        answers = fct_read_answers_files(tmp_path / input_path_of_working)
+        return answers, {' '.join(text.lower().split()) for name in answers if not name.endswith('.index.json') for answer in json.loads(answers[name]) for text in answer['body_text']}
+    answers, texts = fct_write_answers_from_store('answers')
+    assert {' '.join(boilerplate_paragraph.lower().split()), ' '.join(near_duplicate.lower().split())} <= texts
+    ### fingerprints ###
+    counts = kaggle.fct_build_fingerprints(path_of_store, input_minhash=minhash)
+    store = kaggle.fct_load_store(path_of_store)
+    rows = [int(store['offsets'][position]) + kaggle.fct_get_paragraphs_from_store(store, position)[1].index(paragraph) for position, paragraph in zip(map(store['paper'].index, paths_to_papers), paragraphs)]
+    assert len({int(store['paragraph_exact'][row]) for row in rows[:3]} - {int(store['paragraph_exact'][rows[3]])}) == 1
+    assert [int(store['exact_papers'][store['paragraph_exact'][row]]) for row in rows] == [3, 3, 3, 1]
+    assert [int(store['cluster_papers'][store['paragraph_cluster'][row]]) for row in rows] == ([4, 4, 4, 4] if minhash else [3, 3, 3, 1])
+    assert counts['paragraphs_by_papers'][str(4 if minhash else 3)] == (4 if minhash else 3)
+    ### suppressed ###
+    assert fct_write_answers_from_store('fingerprints')[0] == answers
+    texts_of_boilerplate = fct_write_answers_from_store('boilerplate', input_boilerplate=3)[1]
+    assert ' '.join(boilerplate_paragraph.lower().split()) not in texts_of_boilerplate
+    assert (' '.join(near_duplicate.lower().split()) in texts_of_boilerplate) != minhash
+
+### function 13: test_batch_with_empty_question() ###
+# a paper without (2,3)-grams + a QUESTION without (2,3)-grams: only that QUESTION has no match, v. the whole batch.
+def test_batch_with_empty_question():
+    paper_context = kaggle.fct_create_paper_context_from_paragraphs('cccc', ['Transmission.', 'Incubation.', 'Stability.'])
+    kaggle.fct_add_matches_to_context(paper_context, ['TRANSMISSION?', 'WHAT IS KNOWN ABOUT TRANSMISSION?'], input_top=4)
+    assert paper_context['matches']['TRANSMISSION?'] == [[0.0, 'TRANSMISSION?']]
+    assert [text for distance, text in paper_context['matches']['WHAT IS KNOWN ABOUT TRANSMISSION?']] == ['WHAT IS KNOWN ABOUT TRANSMISSION?', 'Transmission.', 'Incubation.', 'Stability.']
+    with pytest.raises(ValueError): # every QUESTION
+        kaggle.fct_add_matches_to_context(paper_context, ['INCUBATION?'])
+
+### function 14: test_handle_request_errors() ###
+# every request gets a response, and its connection is closed: 400 for a bad request or parameter, 404 for an unknown path, 413 for a body too large,
+# 500 for e.g. a broken worker pool, or a bug, v. a 400 that blames the client.
+class fct_broken_pool(concurrent.futures.Executor):
+    def __init__(self, input_error=None):
+        self.error = input_error or BrokenProcessPool('a worker died')
+    def submit(self, *arguments, **keywords):
+        raise self.error
+
+def fct_request(input_service, input_body, input_target='/matches', input_content_length=None):
+    async def fct_request():
+        server = await asyncio.start_server(functools.partial(kaggle.fct_handle_request, input_service=input_service), '127.0.0.1', 0)
+        async with server:
+            reader, writer = await asyncio.open_connection('127.0.0.1', server.sockets[0].getsockname()[1])
+            writer.write(f'POST {input_target} HTTP/1.1\r\nContent-Length: {len(input_body) if input_content_length is None else input_content_length}\r\n\r\n'.encode('latin-1') + input_body)
+            writer.write_eof() # e.g. a body shorter than its content-length, v. waiting for the rest
+            response = await asyncio.wait_for(reader.read(), timeout=5) # until closed
+            writer.close()
+        return int(response.split()[1]), json.loads(response.partition(b'\r\n\r\n')[2])
+    return asyncio.run(fct_request())
+
+def test_handle_request_errors():
+    service = {"index": {"paper_id": ['aaaa'], "position": {'aaaa': 0}}, "ann": None, "workers": 1, "chunksize": 256, "max_body": 1024, "pool": fct_broken_pool()}
+    for body in (b'[1]', b'{', b'\xff', b'{}', b'{"question": ["WHAT?"], "top": 0}', b'{"question": ["WHAT?"], "top": "four"}', b'{"question": ["WHAT?"], "top": 4.5}', b'{"question": ["WHAT?"], "max_df": 2}', b'{"task": [99]}', b'{"task": ["x"]}', b'{"question": ["WHAT?"], "paper_id": ["bbbb"]}'):
+        assert fct_request(service, body)[0] == 400, body
+    assert fct_request(service, b'{"question": ["WHAT?"]}', '/nothing')[0] == 404
+    assert fct_request(service, b'{"question": ["WHAT?"]}', input_content_length='12abc')[0] == 400
+    assert fct_request(service, b'{"question": ["WHAT?"]}', input_content_length=100)[0] == 400 # shorter than its content-length
+    assert fct_request(service, b'{"question": ["' + b'WHAT?' * 300 + b'"]}')[0] == 413
+    assert fct_request(service, b'', input_content_length=10 ** 12)[0] == 413 # not read
+    status, response = fct_request(service, b'{"question": ["WHAT?"], "top": [], "task": [0]}')
+    assert status == 500 and 'BrokenProcessPool' in response['error']
+    service['pool'] = fct_broken_pool(KeyError('features'))
+    status, response = fct_request(service, b'{"question": ["WHAT?"]}')
+    assert status == 500 and 'KeyError' in response['error']
+
+### function 15: test_main_creates_working() ###
+# the cli, with telemetry, into a --working dir that doesn't exist yet.
+def test_main_creates_working(tmp_path, path_of_papers):
+    path_of_working = str(tmp_path / 'new' / 'working')
+    kaggle.fct_main(['papers', 'answers', '--papers', path_of_papers, '--working', path_of_working, '--tasks', '0', '--workers', '1'])
+    assert os.path.exists(os.path.join(path_of_working, 'telemetry.jsonl'))
+    with open(os.path.join(path_of_working, 'answers.task.0.biorxiv_medrxiv.json')) as open_file:
+        assert len(json.load(open_file)) == 2 # 8 papers, round-robin over 4 subsets
+
+### function 16: test_run_in_budget_late_result() ###
+# a worker killed before its result is written, by a process that outlives it: the chunk is retried, and the late result is not yielded twice.
+def fct_work_then_die(input_function, input_pipe, input_results, input_max_rss):
+    index, chunk = input_pipe.recv()
+    if os.fork() == 0: # the result is written after the worker's death, while the retry runs
+        time.sleep(0.3)
+        with contextlib.suppress(BrokenPipeError): # the pipe of the dead worker is closed by then
+            input_results.send(('result', os.getppid(), index, input_function(chunk)))
+        os._exit(0)
+    os._exit(1)
+
+def fct_double(input_chunk):
+    time.sleep(0.2)
+    return 2 * input_chunk
+
+def test_run_in_budget_late_result(monkeypatch, tmp_path):
+    work_in_budget = kaggle.fct_work_in_budget
+    def fct_work(*arguments):
+        try: # the 1st worker dies, the others work
+            os.close(os.open(tmp_path / 'died', os.O_CREAT | os.O_EXCL))
+        except FileExistsError:
+            return work_in_budget(*arguments)
+        fct_work_then_die(*arguments)
+    monkeypatch.setattr(kaggle, 'fct_work_in_budget', fct_work)
+    results = list(kaggle.fct_run_in_budget(fct_double, [1, 2, 3], input_workers=1, input_memory_budget=2 ** 40, input_interval=0.05))
+    assert sorted(results) == [2, 4, 6]
+
+### function 16.1: test_run_in_budget_idle_death() ###
+# workers that die while idle, i.e. their pipe is closed when their next chunk is sent: that chunk is dispatched again, v. charged a retry it never ran.
+def fct_work_then_die_idle(input_function, input_pipe, input_results, input_max_rss):
+    index, chunk = input_pipe.recv()
+    input_pipe.close() # the next send fails
+    input_results.send(('result', os.getpid(), index, input_function(chunk)))
+    time.sleep(0.3)
+    os._exit(1)
+
+def test_run_in_budget_idle_death(monkeypatch, tmp_path, capsys):
+    work_in_budget = kaggle.fct_work_in_budget
+    def fct_work(*arguments):
+        for died in range(2): # the 1st 2 workers die, the others work
+            try:
+                os.close(os.open(tmp_path / f'died.{died}', os.O_CREAT | os.O_EXCL))
+            except FileExistsError:
+                continue
+            return fct_work_then_die_idle(*arguments)
+        return work_in_budget(*arguments)
+    monkeypatch.setattr(kaggle, 'fct_work_in_budget', fct_work)
+    results = list(kaggle.fct_run_in_budget(fct_double, [1, 2, 3], input_workers=1, input_memory_budget=2 ** 40, input_interval=0.05))
+    assert sorted(results) == [2, 4, 6]
+    assert '0 chunks retried' in capsys.readouterr().out
+
+### function 16.2: test_run_in_budget_killed_mid_write() ###
+# a worker killed mid-write of its result: only its own pipe is cut short, v. a queue shared by all workers. the chunk is retried on a fresh worker.
+def fct_work_then_die_mid_write(input_function, input_pipe, input_results, input_max_rss):
+    index, chunk = input_pipe.recv()
+    os.write(input_results.fileno(), struct.pack('!i', 1024) + b'cut short') # the header of a 1 kb message, then the 1st bytes only
+    os.kill(os.getpid(), signal.SIGKILL)
+
+def test_run_in_budget_killed_mid_write(monkeypatch, tmp_path, capsys):
+    work_in_budget = kaggle.fct_work_in_budget
+    def fct_work(*arguments):
+        try: # the 1st worker dies, the others work
+            os.close(os.open(tmp_path / 'died', os.O_CREAT | os.O_EXCL))
+        except FileExistsError:
+            return work_in_budget(*arguments)
+        fct_work_then_die_mid_write(*arguments)
+    monkeypatch.setattr(kaggle, 'fct_work_in_budget', fct_work)
+    results = list(kaggle.fct_run_in_budget(fct_double, [1, 2, 3, 4], input_workers=2, input_memory_budget=2 ** 40, input_interval=0.05))
+    assert sorted(results) == [2, 4, 6, 8]
+    assert '1 chunks retried' in capsys.readouterr().out
+
+### function 17: test_blocks_same_as_paper_context() ###
+# fct_create_paper_context_in_blocks(), for oversized papers, v. the whole paper at once: the same matches, with blocks of 1, 2 or 3 paragraphs, incl. ties.
+@pytest.mark.parametrize('input_block', [1, 2, 3])
+def test_blocks_same_as_paper_context(path_of_papers, input_block):
+    path_to_ties = fct_add_paper(path_of_papers, 'biorxiv_medrxiv', ['transmission of the virus'], ['transmission of the virus', 'incubation period of the virus', 'transmission of the virus', 'environmental stability'])
+    input_questions = [question for task in (0, 1) for question in kaggle.fct_get_questions_of_task(task)]
+    for path_to_paper in [dir_file for dir_file, size, mtime in kaggle.fct_scan_tree_of_papers(path_of_papers)][:4] + [path_to_ties]:
+        for min_df, max_df in ((0.1, 0.9), (0.0, 1.0), (2, 1.0)):
+            paper_context = kaggle.fct_add_matches_to_context(kaggle.fct_create_paper_context(path_to_paper, min_df, max_df), input_questions, 4)
+            assert kaggle.fct_create_paper_context_in_blocks(path_to_paper, input_questions, min_df, max_df, 4, input_block)['matches'] == paper_context['matches']
+
+### function 18: test_merge_logs_same_segment_name() ###
+# the logs of 2 shards whose segments have the same name, e.g. same time + host + pid on 2 nodes, merge without overwriting each other.
+def test_merge_logs_same_segment_name(tmp_path):
+    parameters = kaggle.fct_get_parameters_of_answers([0], 0.1, 0.9, 4)
+    paths_of_logs = []
+    for shard, paper_id in enumerate(['aaaa', 'bbbb']):
+        path_of_log = str(tmp_path / f'node{shard}' / 'answers.log')
+        answer_log = kaggle.fct_open_answer_log(path_of_log, parameters, input_shards=1)
+        kaggle.fct_add_to_answer_log(answer_log, f'/node{shard}/2020-03-13/biorxiv_medrxiv/biorxiv_medrxiv/{paper_id}.json', paper_id * 10, [{"paper_id": paper_id, "task": 0, "abstract": "?", "body_text": [paper_id]}])
+        kaggle.fct_close_answer_log(answer_log)
+        ### the same names in both logs ###
+        for name in os.listdir(path_of_log):
+            suffix = '.jsonl.gz' if name.endswith('.jsonl.gz') else '.index.json'
+            os.replace(os.path.join(path_of_log, name), os.path.join(path_of_log, 'segment.0.node.1.000' + suffix))
+        with open(os.path.join(path_of_log, 'segment.0.node.1.000.index.json')) as open_file:
+            index = json.load(open_file)
+        index['segment'] = 'segment.0.node.1.000.jsonl.gz'
+        with open(os.path.join(path_of_log, 'segment.0.node.1.000.index.json'), 'w') as open_file:
+            json.dump(index, open_file)
+        paths_of_logs.append(path_of_log)
+    kaggle.fct_merge_answers_from_log(paths_of_logs, input_tasks=[0], input_path_of_working=str(tmp_path))
+    with open(tmp_path / 'answers.task.0.biorxiv_medrxiv.json') as open_file:
+        assert sorted(answer['body_text'][0] for answer in json.load(open_file)) == ['aaaa', 'bbbb']
+
+
+### function 19: test_log_duplicate_paper_across_subsets() ###
+# the same paper file in 2 subsets, as in CORD-19: the answer log keeps both, so its merge is the same as the files backend.
+def fct_copy_paper_to_subset(input_path_of_papers, input_from='biorxiv_medrxiv', input_to='comm_use_subset'):
+    path_of_subset = os.path.join(input_path_of_papers, '2020-03-13', input_from, input_from)
+    shutil.copy(os.path.join(path_of_subset, sorted(os.listdir(path_of_subset))[0]), os.path.join(input_path_of_papers, '2020-03-13', input_to, input_to))
+
+def test_log_duplicate_paper_across_subsets(tmp_path, path_of_papers):
+    fct_copy_paper_to_subset(path_of_papers)
+    arguments = ['--papers', path_of_papers, '--tasks', '0', '--workers', '1', '--no-telemetry']
+    kaggle.fct_main(['papers', 'answers', '--working', str(tmp_path / 'files')] + arguments)
+    kaggle.fct_main(['papers', 'answers', 'merge', '--working', str(tmp_path / 'log'), '--backend', 'log'] + arguments)
+    answers_files = fct_read_answers_files(tmp_path / 'files')
+    assert len(json.loads(answers_files['answers.task.0.comm_use_subset.json'])) == 3 # 2 + the copy
+    assert fct_read_answers_files(tmp_path / 'log') == answers_files
+
+### function 20: test_sweep_same_ranking_any_top() ###
+# configurations that only differ by top rank the paragraphs the same, so they match the 1st configuration on the common top.
+def test_sweep_same_ranking_any_top(path_of_papers):
+    paths_to_papers = [dir_file for dir_file, size, mtime in kaggle.fct_scan_tree_of_papers(path_of_papers)]
+    sweep = kaggle.fct_sweep_parameters(paths_to_papers, [(0.1, 0.9, 4), (0.1, 0.9, 2), (0.1, 0.9, 8)], input_tasks=[0], input_workers=1)
+    for configuration in sweep['configurations']:
+        assert configuration['same_matches'] == 1.0
+        assert configuration['overlap'] == 1.0
+    assert sweep['papers'] == 8
+
+### function 21: test_sharded_merge_same_as_single_run() ###
+# n nodes, each with --shard i/n, then 1 merge of their logs: the same answer files, byte for byte, as 1 machine, incl. a paper in 2 subsets.
+@pytest.mark.parametrize('n_shards', [2, 3])
+def test_sharded_merge_same_as_single_run(tmp_path, path_of_papers, n_shards):
+    fct_copy_paper_to_subset(path_of_papers)
+    arguments = ['--papers', path_of_papers, '--tasks', '0', '1', '--workers', '1', '--no-telemetry']
+    kaggle.fct_main(['papers', 'answers', '--working', str(tmp_path / 'single')] + arguments)
+    paths_of_logs = []
+    for shard in range(n_shards):
+        kaggle.fct_main(['papers', 'answers', '--working', str(tmp_path / f'node{shard}'), '--backend', 'log', '--shard', f'{shard}/{n_shards}'] + arguments)
+        paths_of_logs.append(str(tmp_path / f'node{shard}' / 'answers.log'))
+    kaggle.fct_main(['papers', 'merge', '--working', str(tmp_path / 'merge'), '--backend', 'log', '--logs'] + paths_of_logs + arguments)
+    assert fct_read_answers_files(tmp_path / 'merge') == fct_read_answers_files(tmp_path / 'single')
+
+### function 22: test_sweep_no_papers() ###
+# no QUESTION scored: the rates are None, and reported as n/a.
+def test_sweep_no_papers(capsys):
+    sweep = kaggle.fct_sweep_parameters([], [(0.0, 1.0, 4)], input_workers=1)
+    assert sweep['papers'] == 0
+    assert sweep['configurations'][0]['same_matches'] is None
+    assert 'same n/a, overlap n/a, fallback n/a' in capsys.readouterr().out
+
+### function 23: test_dict_of_papers_old_call() ###
+# the old call of fct_create_dict_of_papers() for 1 subset, by position or with input_dir=..., warns, and writes the same papers file as the new one.
+def test_dict_of_papers_old_call(tmp_path, path_of_papers):
+    kaggle.fct_create_dict_of_papers(path_of_papers, 'json', input_path_of_working=str(tmp_path / 'new'))
+    with pytest.warns(DeprecationWarning):
+        kaggle.fct_create_dict_of_papers('comm_use_subset', path_of_papers, 'json', input_path_of_working=str(tmp_path / 'old'))
+    with pytest.warns(DeprecationWarning):
+        kaggle.fct_create_dict_of_papers(input_dir='noncomm_use_subset', input_path_of_papers=path_of_papers, input_path_of_working=str(tmp_path / 'old'))
+    assert sorted(os.listdir(tmp_path / 'old')) == ['papers.comm_use_subset.json', 'papers.noncomm_use_subset.json']
+    for name in os.listdir(tmp_path / 'old'):
+        with open(tmp_path / 'old' / name) as old_file, open(tmp_path / 'new' / name) as new_file:
+            assert json.load(old_file) == json.load(new_file)
@@ -0,0 +1,103 @@
+### tests of kaggle_geo.py ###
+# $ python3 -m pytest -q covid19/kaggle/working
+# on a small geonames gazetteer, see gazetteer(), v. the full cities15000.txt + countryInfo.txt.
+
+import os # misc os interfaces
+import json # json encoder + decoder
+import shutil # copy files
+import pathlib # file urls
+import zipfile # cities15000.zip
+
+import pytest # test runner
+
+import kaggle_geo # geoparse + geocode
+
+@pytest.fixture
+def path_of_geonames(tmp_path):
+    with open(tmp_path / 'countryInfo.txt', 'w', encoding='utf8') as open_file:
+        open_file.write('#ISO\tISO3\tISO-Numeric\tfips\tCountry\tCapital\tArea(in sq km)\tPopulation\n')
+        for iso, country, population in [('IT', 'Italy', 60000000), ('IE', 'Ireland', 4900000), ('US', 'United States', 327000000)]:
+            open_file.write(f'{iso}\t\t\t\t{country}\t\t\t{population}\n')
+    with open(tmp_path / 'cities15000.txt', 'w', encoding='utf8') as open_file:
+        for name, latitude, longitude, country, population in [('Florence', 43.77, 11.25, 'IT', 382258), ('Cork', 51.9, -8.47, 'IE', 190384), ('Mobile', 30.69, -88.04, 'US', 195111)]:
+            open_file.write('\t'.join([str(population), name, name, '', str(latitude), str(longitude), 'P', 'PPL', country, '', '', '', '', '', str(population)]) + '\n')
+    return str(tmp_path)
+
+@pytest.fixture
+def gazetteer(path_of_geonames):
+    return kaggle_geo.fct_load_gazetteer(path_of_geonames)
+
+### function 1: test_aggregate_mentions() ###
+# known points - in 1 of 2 square countries, in none, or not found - from 2 lat_lon files: their counts by country, incl. countries in another crs, and by grid cell.
+@pytest.mark.parametrize('countries_file, crs', [('countries.geojson', 'EPSG:4326'), ('countries.gpkg', 'EPSG:3857')])
+def test_aggregate_mentions(tmp_path, countries_file, crs):
+    gpd = pytest.importorskip('geopandas')
+    from shapely.geometry import box
+    paths_of_lat_lon = [str(tmp_path / 'lat_lon.0.json'), str(tmp_path / 'lat_lon.1.json')]
+    for path_of_lat_lon, lat_lon in zip(paths_of_lat_lon, [[['a', 5.0, 5.0], ['b', 5.0, 25.0], ['a', 5.0, 5.0], ['Atlantis', None, None]], [['a', 5.0, 5.0], ['c', 50.0, 50.0]]]):
+        with open(path_of_lat_lon, 'w', encoding='utf8') as open_file:
+            json.dump(lat_lon, open_file)
+    points = kaggle_geo.fct_count_mentions(paths_of_lat_lon)
+    assert sorted(zip(points['longitude'].tolist(), points['latitude'].tolist(), points['count'].tolist())) == [(5.0, 5.0, 3), (25.0, 5.0, 1), (50.0, 50.0, 1)]
+    gpd.GeoDataFrame({"CNTRY_NAME": ['A', 'B', 'C']}, geometry=[box(0, 0, 10, 10), box(20, 0, 30, 10), box(-30, -30, -20, -20)], crs='EPSG:4326').to_crs(crs).to_file(str(tmp_path / countries_file))
+    countries = kaggle_geo.fct_aggregate_by_country(points, str(tmp_path / countries_file))
+    assert dict(zip(countries['CNTRY_NAME'], countries['count'])) == {"A": 3, "B": 1, "C": 0} # v. (50, 50) in none
+    grid = kaggle_geo.fct_aggregate_by_cell(points, 10.0)
+    assert grid.shape == (18, 36)
+    assert {(int(row), int(column)): int(grid[row, column]) for row, column in zip(*grid.nonzero())} == {(9, 18): 3, (9, 20): 1, (14, 23): 1} # (latitude + 90) / 10, (longitude + 180) / 10
+
+### function 2: test_find_places_stop_words() ###
+# a city that is also an english word, e.g. Mobile, is dropped, but a real place, e.g. Florence, is found.
+def test_find_places_stop_words(gazetteer):
+    text = 'Mobile units were sent from Florence and Cork to Italy.'
+    assert [place['name'] for place in kaggle_geo.fct_find_places(text, gazetteer)] == ['Florence', 'Cork', 'Italy']
+
+### function 3: test_geocode_cache() ###
+# names not found are cached, failed requests aren't, and the answers so far are kept on an interruption.
+def test_geocode_cache(gazetteer, tmp_path):
+    path_of_cache = str(tmp_path / 'geocode.cache.json')
+    geocoder = kaggle_geo.fct_get_stub_geocoder({"Waltham": [42.38, -71.24], "Atlantis": None, "Boston": TimeoutError('timed out')})
+    lat_lon = kaggle_geo.fct_geocode(['Florence', 'Waltham', 'Atlantis', 'Boston'], gazetteer, path_of_cache, geocoder)
+    assert lat_lon == [['Florence', 43.77, 11.25], ['Waltham', 42.38, -71.24], ['Atlantis', None, None], ['Boston', None, None]]
+    with open(path_of_cache) as open_file:
+        assert json.load(open_file) == {"Waltham": [42.38, -71.24], "Atlantis": None}
+    geocoder = kaggle_geo.fct_get_stub_geocoder({"Boston": [42.36, -71.06]})
+    assert kaggle_geo.fct_geocode(['Waltham', 'Atlantis', 'Boston'], gazetteer, path_of_cache, geocoder)[2] == ['Boston', 42.36, -71.06]
+    assert geocoder.calls == ['Boston']
+    ### interrupted after 1 name ###
+    def fct_interrupted_geocoder(input_name):
+        if input_name == 'Cambridge':
+            raise KeyboardInterrupt
+        return [0.0, 0.0]
+    with pytest.raises(KeyboardInterrupt):
+        kaggle_geo.fct_geocode(['Lowell', 'Cambridge'], gazetteer, path_of_cache, fct_interrupted_geocoder)
+    with open(path_of_cache) as open_file:
+        assert json.load(open_file)['Lowell'] == [0.0, 0.0]
+
+### function 4: test_geonames_download() ###
+# a fresh checkout, without the geonames tables: a clear error, with the url, then the download stage, here from a local copy of the url.
+def test_geonames_download(path_of_geonames, tmp_path):
+    path_of_download = str(tmp_path / 'download')
+    with pytest.raises(FileNotFoundError, match=kaggle_geo.url_of_geonames):
+        kaggle_geo.fct_load_gazetteer(path_of_download)
+    os.makedirs(tmp_path / 'dump')
+    shutil.copy(os.path.join(path_of_geonames, 'countryInfo.txt'), tmp_path / 'dump')
+    with zipfile.ZipFile(tmp_path / 'dump' / 'cities15000.zip', 'w') as zip_file:
+        zip_file.write(os.path.join(path_of_geonames, 'cities15000.txt'), 'cities15000.txt')
+    kaggle_geo.fct_download_geonames(path_of_download, pathlib.Path(tmp_path / 'dump').as_uri())
+    assert kaggle_geo.fct_load_gazetteer(path_of_download) == kaggle_geo.fct_load_gazetteer(path_of_geonames)
+    assert sorted(os.listdir(path_of_download)) == ['cities15000.txt', 'countryInfo.txt']
+
+### function 5: test_stop_words_of_file() ###
+# stop words derived from a word list - cities that are common, lowercase words, v. proper nouns - written by the stop-words stage, then read back with --stop-words.
+def test_stop_words_of_file(path_of_geonames, tmp_path):
+    with open(tmp_path / 'words', 'w', encoding='utf8') as open_file:
+        open_file.write('Florence\ncork\nitaly\nmobile\nunits\n')
+    assert kaggle_geo.fct_derive_stop_words(str(tmp_path / 'words'), path_of_geonames) == ['Cork', 'Mobile']
+    assert kaggle_geo.fct_derive_stop_words(str(tmp_path / 'words'), path_of_geonames, input_min_population=192000) == ['Cork']
+    kaggle_geo.fct_main(['stop-words', '--words', str(tmp_path / 'words'), '--geonames', path_of_geonames, '--working', str(tmp_path / 'working')])
+    stop_words = kaggle_geo.fct_load_stop_words(str(tmp_path / 'working' / 'stop_words.txt'))
+    assert stop_words == ('Cork', 'Mobile')
+    text = 'Mobile units were sent from Florence and Cork to Italy.'
+    assert [place['name'] for place in kaggle_geo.fct_find_places(text, kaggle_geo.fct_load_gazetteer(path_of_geonames, stop_words))] == ['Florence', 'Italy']
+    assert [place['name'] for place in kaggle_geo.fct_find_places(text, kaggle_geo.fct_load_gazetteer(path_of_geonames, ()))] == ['Mobile', 'Florence', 'Cork', 'Italy']